@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+
+import argparse
+import os
+import sys
+
+
+if 'PAGURE_CONFIG' not in os.environ \
+        and os.path.exists('/etc/pagure/pagure.cfg'):
+    print 'Using configuration file `/etc/pagure/pagure.cfg`'
+    os.environ['PAGURE_CONFIG'] = '/etc/pagure/pagure.cfg'
+
+import pagure
+import pagure.lib.remotes
+
+
+def main(days=None, debug=False):
+    """
+    Logic:
+    - Go through the local mirrors of the remote git repositories used by
+      the remote pull-requests
+    - Remove the ones which were not fetched for some time, they are
+      fetched again if needed
+    """
+    max_age = None
+    if days is not None:
+        max_age = days * 24 * 3600
+
+    removed = pagure.lib.remotes.clean_mirrors(max_age=max_age)
+    if debug:
+        for repopath in removed:
+            print 'Removed %s' % repopath
+        print '%s mirrors removed' % len(removed)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Script removing the local mirrors of remote git '
+        'repositories which were not fetched for some time.'
+    )
+    parser.add_argument(
+        '--days', dest='days', type=int, default=None,
+        help='Number of days without fetch after which mirrors are '
+        'removed, defaults to the REMOTE_GIT_MAX_AGE configuration key')
+    parser.add_argument(
+        '--debug', dest='debug', action='store_true', default=False,
+        help='Print the debugging output')
+
+    args = parser.parse_args()
+    main(days=args.days, debug=args.debug)
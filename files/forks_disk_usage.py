@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+
+import argparse
+import os
+import sys
+
+
+if 'PAGURE_CONFIG' not in os.environ \
+        and os.path.exists('/etc/pagure/pagure.cfg'):
+    print 'Using configuration file `/etc/pagure/pagure.cfg`'
+    os.environ['PAGURE_CONFIG'] = '/etc/pagure/pagure.cfg'
+
+import pagure
+import pagure.exceptions
+import pagure.lib
+import pagure.lib.git
+from pagure.lib import model
+
+
+def _format_size(size):
+    """ Return the given number of bytes in a human readable form. """
+    for unit in ['B', 'KiB', 'MiB', 'GiB']:
+        if size < 1024:
+            break
+        size /= 1024.0
+    else:
+        unit = 'TiB'
+    return '%.1f %s' % (size, unit)
+
+
+def main(projects=None, dissociate=False, debug=False):
+    """
+    Logic:
+    - Retrieve the forks of the specified projects, or all the forks
+    - For each fork, report the disk space used by its git repo and the one
+      saved by sharing the objects of its parent via git alternates
+    - If asked, copy in the git repo of the forks the objects they share
+    """
+    query = pagure.SESSION.query(model.Project).filter(
+        model.Project.parent_id != None
+    ).order_by(model.Project.id)
+    if projects:
+        query = query.filter(model.Project.name.in_(projects))
+
+    errors = 0
+    total_own = total_shared = 0
+    for project in query.all():
+        repopath = os.path.join(
+            pagure.APP.config['GIT_FOLDER'], project.path)
+        if not os.path.exists(repopath):
+            continue
+
+        usage = pagure.lib.git.get_disk_usage(repopath)
+        total_own += usage['own']
+        total_shared += usage['shared']
+        if debug or usage['shared']:
+            print '%s: %s used, %s shared' % (
+                project.fullname, _format_size(usage['own']),
+                _format_size(usage['shared']))
+
+        if dissociate and usage['shared']:
+            try:
+                pagure.lib.git.dissociate_repo(repopath)
+            except pagure.exceptions.PagureException as err:
+                errors += 1
+                print 'ERROR with the git repo of %s' % project.fullname
+                print err
+                continue
+            if debug:
+                print '  -> %s used' % _format_size(
+                    pagure.lib.git.get_disk_usage(repopath)['own'])
+
+    print 'Total: %s used by the forks, %s saved by git alternates' % (
+        _format_size(total_own), _format_size(total_shared))
+
+    return errors
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Script reporting the disk space saved by the forks '
+        'sharing the objects of their parent via git alternates.'
+    )
+    parser.add_argument(
+        'projects', nargs='*',
+        help='Name of the projects whose forks to check, defaults to all '
+        'of them')
+    parser.add_argument(
+        '--dissociate', dest='dissociate', action='store_true',
+        default=False,
+        help='Copy in the git repo of the forks the objects they share')
+    parser.add_argument(
+        '--debug', dest='debug', action='store_true', default=False,
+        help='Print the debugging output')
+
+    args = parser.parse_args()
+
+    sys.exit(1 if main(
+        projects=args.projects, dissociate=args.dissociate,
+        debug=args.debug) else 0)
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+
+import argparse
+import os
+import sys
+
+import pygit2
+
+
+if 'PAGURE_CONFIG' not in os.environ \
+        and os.path.exists('/etc/pagure/pagure.cfg'):
+    print 'Using configuration file `/etc/pagure/pagure.cfg`'
+    os.environ['PAGURE_CONFIG'] = '/etc/pagure/pagure.cfg'
+
+import pagure
+import pagure.exceptions
+import pagure.lib
+import pagure.lib.git
+from pagure.lib import model
+
+
+def main(kinds, projects=None, debug=False):
+    """
+    Logic:
+    - Retrieve the specified projects, or all the projects
+    - For each project, write all its issues and/or pull-requests in its
+      tickets and/or requests git repo, in a single commit
+    """
+    query = pagure.SESSION.query(model.Project).order_by(model.Project.id)
+    if projects:
+        query = query.filter(model.Project.name.in_(projects))
+
+    errors = 0
+    for project in query.all():
+        for kind in kinds:
+            if debug:
+                print 'Regenerating the %s git repo of %s' % (
+                    kind, project.fullname)
+
+            def progress(done, total):
+                if debug and (done % 100 == 0 or done == total):
+                    print '  %s/%s' % (done, total)
+
+            try:
+                commit = pagure.lib.git.regenerate_git(
+                    project, kind, progress=progress)
+            except (pagure.exceptions.PagureException, pygit2.GitError,
+                    KeyError) as err:
+                errors += 1
+                print 'ERROR with the %s git repo of %s' % (
+                    kind, project.fullname)
+                print err
+                continue
+
+            if debug:
+                print '  -> %s' % (commit.hex if commit else 'no change')
+
+    return errors
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Script writing in their git repos all the issues and/or '
+        'pull-requests of the projects, in a single commit per repo.'
+    )
+    parser.add_argument(
+        'projects', nargs='*',
+        help='Name of the projects to regenerate, defaults to all of them')
+    parser.add_argument(
+        '--tickets', dest='kinds', action='append_const', const='tickets',
+        help='Regenerate the tickets git repos')
+    parser.add_argument(
+        '--requests', dest='kinds', action='append_const', const='requests',
+        help='Regenerate the requests git repos')
+    parser.add_argument(
+        '--debug', dest='debug', action='store_true', default=False,
+        help='Print the debugging output')
+
+    args = parser.parse_args()
+
+    sys.exit(1 if main(
+        args.kinds or ['tickets', 'requests'], projects=args.projects,
+        debug=args.debug) else 0)
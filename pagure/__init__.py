@@ -17,6 +17,7 @@ __api_version__ = '0.7'
 
 
 import datetime
+import hashlib
 import logging
 import os
 import subprocess
@@ -24,6 +25,7 @@ import urlparse
 from logging.handlers import SMTPHandler
 
 import flask
+import kitchen.text.converters as ktc
 import pygit2
 import werkzeug
 from functools import wraps
@@ -96,6 +98,8 @@ import pagure.doc_utils
 import pagure.forms
 import pagure.lib
 import pagure.lib.git
+import pagure.lib.remotes
+import pagure.lib.repo
 import pagure.login_forms
 import pagure.mail_logging
 import pagure.proxy
@@ -334,6 +338,131 @@ def login_required(function):
     return decorated_function
 
 
+def _get_refs_etag_parts(repo_obj):
+    """ Return the parts of the ETag of the pages showing the content of
+    the specified git repository: the target of its HEAD and of all its
+    references.
+    """
+    parts = []
+    if not repo_obj.head_is_unborn:
+        parts.append(repo_obj.head.target.hex)
+    for refname in sorted(repo_obj.listall_references()):
+        try:
+            target = repo_obj.lookup_reference(refname).resolve().target
+        except (KeyError, ValueError):
+            continue
+        parts.append('%s %s' % (refname, target.hex))
+    return parts
+
+
+def _get_git_etag(kwargs):
+    """ Return the ETag of a page showing the content of the git repository
+    of the project specified in the provided arguments of a view, and
+    whether this page is immutable, i.e. addressed by a commit identifier.
+
+    The ETag is made of the targets of all the references of the git
+    repository, and of its parent's for forks, or only of the commit, and
+    of the information about the project stored in the database, including
+    its contributors and the number of its open tickets, open
+    pull-requests and forks.
+    Returns (None, False) if there is no such project or git repository.
+    """
+    repo = pagure.lib.get_project(
+        SESSION, kwargs.get('repo'), user=kwargs.get('username'))
+    if repo is None:
+        return None, False
+    repopath = os.path.join(APP.config['GIT_FOLDER'], repo.path)
+    if not os.path.exists(repopath):
+        return None, False
+    repo_obj = pagure.lib.repo.get_repo(repopath)
+
+    # What the pages show about the project, beside the git content:
+    # its information, its contributors and the number of its open
+    # tickets, open pull-requests and forks
+    parts = [
+        __version__, repo.fullname, repo.description, repo.url,
+        repo.avatar_email, repo._settings, repo.user.updated_on,
+        ' '.join(sorted(user.user for user in repo.users)),
+        ' '.join(sorted(group.group_name for group in repo.groups)),
+        repo.open_tickets_public, repo.open_requests, len(repo.forks),
+    ]
+
+    immutable = False
+    commitid = kwargs.get('commitid') or kwargs.get('identifier')
+    if commitid and len(commitid) == 40 and commitid not in \
+            repo_obj.listall_branches():
+        try:
+            immutable = isinstance(repo_obj.get(commitid), pygit2.Commit)
+        except ValueError:
+            pass
+
+    if immutable:
+        parts.append(commitid)
+    else:
+        parts.extend(_get_refs_etag_parts(repo_obj))
+        # The pages of a fork also show how it differs from its parent
+        if repo.is_fork and repo.parent:
+            parentpath = os.path.join(
+                APP.config['GIT_FOLDER'], repo.parent.path)
+            if os.path.exists(parentpath):
+                parts.append(repo.parent.fullname)
+                parts.extend(_get_refs_etag_parts(
+                    pagure.lib.repo.get_repo(parentpath)))
+
+    etag = hashlib.sha1('\n'.join(
+        [ktc.to_bytes(part) for part in parts])).hexdigest()
+    return etag, immutable
+
+
+def conditional_get(user_dependent=True):
+    """ Flask decorator answering ``304 Not Modified`` to requests already
+    having the current version of a page showing the content of a git
+    repository, without running the view.
+
+    The page is identified by an ETag computed from the references of the
+    git repository and the project information in the database. Pages
+    addressed by a commit identifier can in addition be cached by the
+    clients for ``COMMIT_PAGE_MAX_AGE`` seconds.
+
+    :kwarg user_dependent: whether the page depends on the user viewing
+        it, if so only the pages seen by anonymous users are considered
+
+    """
+    def decorator(function):
+        """ The decorator itself. """
+
+        @wraps(function)
+        def decorated_function(*args, **kwargs):
+            """ Decorated function, actually does the work. """
+            if flask.request.method != 'GET' or (
+                    user_dependent and (
+                        authenticated() or '_flashes' in flask.session)):
+                return function(*args, **kwargs)
+
+            etag, immutable = _get_git_etag(kwargs)
+            if etag is None:
+                return function(*args, **kwargs)
+
+            if flask.request.if_none_match.contains(etag):
+                response = flask.Response(status=304)
+            else:
+                response = flask.make_response(function(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag)
+            if user_dependent:
+                response.vary.add('Cookie')
+            if immutable:
+                response.headers['Cache-Control'] = 'public, max-age=%s' % (
+                    APP.config.get('COMMIT_PAGE_MAX_AGE', 300))
+            else:
+                response.headers['Cache-Control'] = 'no-cache'
+            return response
+        return decorated_function
+    return decorator
+
+
 @APP.context_processor
 def inject_variables():
     """ With this decorator we can set some variables to all templates.
@@ -496,33 +625,25 @@ def get_repo_path(repo):
     return repopath
 
 
-def get_remote_repo_path(remote_git, branch_from, loop=False):
+def get_remote_repo_path(remote_git, branch_from, loop=False, fresh=False):
     """ Return the path of the remote git repository corresponding to the
     provided information.
-    """
-    repopath = os.path.join(
-        APP.config['REMOTE_GIT_FOLDER'],
-        werkzeug.secure_filename('%s_%s' % (remote_git, branch_from))
-    )
-
-    if not os.path.exists(repopath):
-        try:
-            pygit2.clone_repository(
-                remote_git, repopath, checkout_branch=branch_from)
-        except Exception as err:
-            LOG.debug(err)
-            LOG.exception(err)
-            flask.abort(500, 'Could not clone the remote git repository')
-    else:
-        repo = pagure.lib.repo.PagureRepo(repopath)
-        try:
-            repo.pull(branch=branch_from, force=True)
-        except pagure.exceptions.PagureException as err:
-            LOG.debug(err)
-            LOG.exception(err)
-            flask.abort(500, err.message)
 
-    return repopath
+    The branch is mirrored locally, see ``pagure.lib.remotes.get_mirror``,
+    set ``fresh`` to fetch it even if the mirror is recent.
+    """
+    try:
+        pagure.lib.remotes.check_remote_git(remote_git)
+    except pagure.exceptions.PagureException as err:
+        flask.abort(400, err.message)
+
+    try:
+        return pagure.lib.remotes.get_mirror(
+            remote_git, branch_from, fresh=fresh)
+    except pagure.exceptions.PagureException as err:
+        LOG.debug(err)
+        LOG.exception(err)
+        flask.abort(500, 'Could not fetch the remote git repository')
 
 
 # Import the application
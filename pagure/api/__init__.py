@@ -74,6 +74,8 @@ class APIERROR(enum.Enum):
     ENOCOMMENT = 'Comment not found'
     ENEWPROJECTDISABLED = 'Creating project have been disabled for this '\
         'instance'
+    ENOCOMMIT = 'Commit not found'
+    ENODIFFFILE = 'File not found in this diff'
 
 
 def check_api_acls(acls, optional=False):
@@ -424,6 +426,8 @@ def api_error_codes():
 def api():
     ''' Display the api information page. '''
     api_git_tags_doc = load_doc(project.api_git_tags)
+    api_commit_diff_doc = load_doc(project.api_commit_diff)
+    api_commit_diff_file_doc = load_doc(project.api_commit_diff_file)
     api_projects_doc = load_doc(project.api_projects)
 
     issues = []
@@ -441,6 +445,11 @@ def api():
     api_pull_request_add_comment_doc = load_doc(
         fork.api_pull_request_add_comment)
     api_pull_request_add_flag_doc = load_doc(fork.api_pull_request_add_flag)
+    api_pull_request_diff_doc = load_doc(fork.api_pull_request_diff)
+    api_pull_request_diff_file_doc = load_doc(
+        fork.api_pull_request_diff_file)
+    api_pull_request_inline_comments_doc = load_doc(
+        fork.api_pull_request_inline_comments)
 
     api_new_project_doc = load_doc(project.api_new_project)
 
@@ -467,6 +476,8 @@ def api():
         projects=[
             api_new_project_doc,
             api_git_tags_doc,
+            api_commit_diff_doc,
+            api_commit_diff_file_doc,
             api_projects_doc,
         ],
         issues=issues,
@@ -477,6 +488,9 @@ def api():
             api_pull_request_close_doc,
             api_pull_request_add_comment_doc,
             api_pull_request_add_flag_doc,
+            api_pull_request_diff_doc,
+            api_pull_request_diff_file_doc,
+            api_pull_request_inline_comments_doc,
         ],
         users=[
             api_users_doc,
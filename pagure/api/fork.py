@@ -15,6 +15,8 @@ from sqlalchemy.exc import SQLAlchemyError
 import pagure
 import pagure.exceptions
 import pagure.lib
+import pagure.lib.git
+import pagure.lib.repo
 from pagure import APP, SESSION, is_repo_admin
 from pagure.api import API, api_method, api_login_required, APIERROR
 
@@ -257,6 +259,280 @@ def api_pull_request_view(repo, requestid, username=None):
     return jsonout
 
 
+def _get_pull_request(repo, requestid, username=None, refresh=False):
+    """ Returns the specified pull-request and the git repository its
+    commits are in, raises an APIError if it cannot be found.
+
+    The commits of open pull-requests are refreshed first if ``refresh`` is
+    True or if they were never computed.
+
+    """
+    repo = pagure.lib.get_project(SESSION, repo, user=username)
+
+    if repo is None:
+        raise pagure.exceptions.APIError(404, error_code=APIERROR.ENOPROJECT)
+
+    if not repo.settings.get('pull_requests', True):
+        raise pagure.exceptions.APIError(
+            404, error_code=APIERROR.EPULLREQUESTSDISABLED)
+
+    request = pagure.lib.search_pull_requests(
+        SESSION, project_id=repo.id, requestid=requestid)
+
+    if not request:
+        raise pagure.exceptions.APIError(404, error_code=APIERROR.ENOREQ)
+
+    if request.remote:
+        repopath = pagure.get_remote_repo_path(
+            request.remote_git, request.branch_from)
+    else:
+        repopath = pagure.get_repo_path(request.project_from)
+    repo_obj = pagure.lib.repo.get_repo(repopath)
+
+    if request.status == 'Open' and (refresh or not request.commit_stop):
+        orig_repo = pagure.lib.repo.get_repo(
+            pagure.get_repo_path(request.project))
+        try:
+            pagure.lib.git.diff_pull_request(
+                SESSION, request, repo_obj, orig_repo,
+                requestfolder=APP.config['REQUESTS_FOLDER'],
+                with_diff=False)
+        except pagure.exceptions.PagureException as err:
+            raise pagure.exceptions.APIError(
+                400, error_code=APIERROR.ENOCODE, error=str(err))
+        except SQLAlchemyError as err:  # pragma: no cover
+            SESSION.rollback()
+            APP.logger.exception(err)
+            raise pagure.exceptions.APIError(400, error_code=APIERROR.EDBERROR)
+
+    return request, repo_obj
+
+
+@API.route('/<repo>/pull-request/<int:requestid>/diff')
+@API.route('/fork/<username>/<repo>/pull-request/<int:requestid>/diff')
+@api_method
+def api_pull_request_diff(repo, requestid, username=None):
+    """
+    Files changed by a pull-request
+    -------------------------------
+    List the files changed by a pull-request with the number of lines added
+    and removed in each of them, without their diff.
+
+    ::
+
+        GET /api/0/<repo>/pull-request/<request id>/diff
+
+    ::
+
+        GET /api/0/fork/<username>/<repo>/pull-request/<request id>/diff
+
+    Sample response
+    ^^^^^^^^^^^^^^^
+
+    ::
+
+        {
+          "total_files": 1,
+          "files": [
+            {
+              "binary": false,
+              "fileid": 1,
+              "lines_added": 3,
+              "lines_removed": 1,
+              "new_id": "e3b3b3ad0a0fa8a1ae7e66c1ccd4b0c5ef9d6a57",
+              "new_path": "README.rst",
+              "old_id": "fd7ef1b0fe7ac2fbb4d8ae31b2e1a20e77ed5a0b",
+              "old_path": "README.rst",
+              "status": "M"
+            }
+          ]
+        }
+
+    """
+    request, repo_obj = _get_pull_request(
+        repo, requestid, username=username, refresh=True)
+    files = pagure.lib.git.get_pull_request_diff_stats(
+        request, repo_obj=repo_obj) or []
+
+    jsonout = flask.jsonify({
+        'total_files': len(files),
+        'files': files,
+    })
+    return jsonout
+
+
+@API.route('/<repo>/pull-request/<int:requestid>/diff/<int:fileid>')
+@API.route(
+    '/fork/<username>/<repo>/pull-request/<int:requestid>/diff/<int:fileid>')
+@api_method
+def api_pull_request_diff_file(repo, requestid, fileid, username=None):
+    """
+    Diff of a file changed by a pull-request
+    ----------------------------------------
+    Retrieve the diff of one of the files changed by a pull-request,
+    identified by its ``fileid`` in the list of the files changed by the
+    pull-request.
+
+    ::
+
+        GET /api/0/<repo>/pull-request/<request id>/diff/<fileid>
+
+    ::
+
+        GET /api/0/fork/<username>/<repo>/pull-request/<request id>/diff/<fileid>
+
+    Sample response
+    ^^^^^^^^^^^^^^^
+
+    ::
+
+        {
+          "diff": "@@ -1,3 +1,5 @@\n ...",
+          "file": {
+            "binary": false,
+            "fileid": 1,
+            "lines_added": 3,
+            "lines_removed": 1,
+            "new_id": "e3b3b3ad0a0fa8a1ae7e66c1ccd4b0c5ef9d6a57",
+            "new_path": "README.rst",
+            "old_id": "fd7ef1b0fe7ac2fbb4d8ae31b2e1a20e77ed5a0b",
+            "old_path": "README.rst",
+            "status": "M"
+          }
+        }
+
+    """
+    request, repo_obj = _get_pull_request(
+        repo, requestid, username=username)
+    diff = pagure.lib.git.get_pull_request_diff(repo_obj, request)
+    patch = pagure.lib.git.get_diff_file(diff, fileid)
+    if patch is None:
+        raise pagure.exceptions.APIError(
+            404, error_code=APIERROR.ENODIFFFILE)
+
+    info = pagure.lib.git.get_patch_info(patch)
+    info['fileid'] = fileid
+
+    jsonout = flask.jsonify({
+        'file': info,
+        'diff': '' if info['binary'] else pagure.lib.git.patch_to_text(
+            patch),
+    })
+    return jsonout
+
+
+@API.route('/<repo>/pull-request/<int:requestid>/comments/inline')
+@API.route(
+    '/fork/<username>/<repo>/pull-request/<int:requestid>/comments/inline')
+@api_method
+def api_pull_request_inline_comments(repo, requestid, username=None):
+    """
+    Inline comments of a pull-request
+    ---------------------------------
+    Retrieve the comments made on the lines of the files changed by a pull
+    request, grouped by commit and file.
+
+    ::
+
+        GET /api/0/<repo>/pull-request/<request id>/comments/inline
+
+    ::
+
+        GET /api/0/fork/<username>/<repo>/pull-request/<request id>/comments/inline
+
+    Parameters
+    ^^^^^^^^^^
+
+    +---------------+----------+--------------+----------------------------+
+    | Key           | Type     | Optionality  | Description                |
+    +===============+==========+==============+============================+
+    | ``filename``  | string   | Optional     | | Filter the comments by   |
+    |               |          |              |   the file they were made  |
+    |               |          |              |   on                       |
+    +---------------+----------+--------------+----------------------------+
+    | ``commit``    | string   | Optional     | | Filter the comments by   |
+    |               |          |              |   the commit they were     |
+    |               |          |              |   made on                  |
+    +---------------+----------+--------------+----------------------------+
+
+    Sample response
+    ^^^^^^^^^^^^^^^
+
+    ::
+
+        {
+          "total_comments": 1,
+          "files": [
+            {
+              "commit": "fa72f315373ec5f98f2b08c8ffae3645c97aaad2",
+              "filename": "sources",
+              "comments": [
+                {
+                  "comment": "Does this build?",
+                  "commit": "fa72f315373ec5f98f2b08c8ffae3645c97aaad2",
+                  "date_created": "1431414800",
+                  "edited_on": null,
+                  "editor": null,
+                  "filename": "sources",
+                  "id": 1,
+                  "line": 2,
+                  "notification": false,
+                  "parent": null,
+                  "tree": "60f7480092c6de98c8b8b1ee3d1f4fbc88f4a7b1",
+                  "user": {
+                    "fullname": "PY C",
+                    "name": "pingou"
+                  }
+                }
+              ]
+            }
+          ]
+        }
+
+    """
+    repo = pagure.lib.get_project(SESSION, repo, user=username)
+
+    if repo is None:
+        raise pagure.exceptions.APIError(404, error_code=APIERROR.ENOPROJECT)
+
+    if not repo.settings.get('pull_requests', True):
+        raise pagure.exceptions.APIError(
+            404, error_code=APIERROR.EPULLREQUESTSDISABLED)
+
+    request = pagure.lib.search_pull_requests(
+        SESSION, project_id=repo.id, requestid=requestid)
+
+    if not request:
+        raise pagure.exceptions.APIError(404, error_code=APIERROR.ENOREQ)
+
+    filename = flask.request.args.get('filename', None)
+    commit = flask.request.args.get('commit', None)
+
+    files = []
+    total = 0
+    index = pagure.lib.get_inline_comments_index(request)
+    for (commitid, path), lines in sorted(index.items()):
+        if (filename and path != filename) or (commit and commitid != commit):
+            continue
+        comments = [
+            comment.to_json(public=True)
+            for line in sorted(lines)
+            for comment in lines[line]
+        ]
+        total += len(comments)
+        files.append({
+            'commit': commitid,
+            'filename': path,
+            'comments': comments,
+        })
+
+    jsonout = flask.jsonify({
+        'total_comments': total,
+        'files': files,
+    })
+    return jsonout
+
+
 @API.route('/<repo>/pull-request/<int:requestid>/merge', methods=['POST'])
 @API.route('/fork/<username>/<repo>/pull-request/<int:requestid>/merge',
            methods=['POST'])
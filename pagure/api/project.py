@@ -15,6 +15,8 @@ from sqlalchemy.exc import SQLAlchemyError
 import pagure
 import pagure.exceptions
 import pagure.lib
+import pagure.lib.git
+import pagure.lib.repo
 from pagure import SESSION, APP
 from pagure.api import API, api_method, APIERROR, api_login_required
 
@@ -22,6 +24,7 @@ from pagure.api import API, api_method, APIERROR, api_login_required
 @API.route('/<repo>/git/tags')
 @API.route('/fork/<username>/<repo>/git/tags')
 @api_method
+@pagure.conditional_get(user_dependent=False)
 def api_git_tags(repo, username=None):
     """
     Project git tags
@@ -61,6 +64,137 @@ def api_git_tags(repo, username=None):
     return jsonout
 
 
+def _get_commit(repo, commitid, username=None):
+    """ Returns the git repository of the project and the specified commit
+    in it, raises an APIError if either of them cannot be found.
+    """
+    repo = pagure.lib.get_project(SESSION, repo, user=username)
+
+    if repo is None:
+        raise pagure.exceptions.APIError(404, error_code=APIERROR.ENOPROJECT)
+
+    repo_obj = pagure.lib.repo.get_repo(pagure.get_repo_path(repo))
+
+    try:
+        commit = repo_obj.get(commitid)
+    except ValueError:
+        commit = None
+    if commit is None:
+        raise pagure.exceptions.APIError(404, error_code=APIERROR.ENOCOMMIT)
+
+    return repo_obj, commit
+
+
+@API.route('/<repo>/c/<commitid>/diff')
+@API.route('/fork/<username>/<repo>/c/<commitid>/diff')
+@api_method
+@pagure.conditional_get(user_dependent=False)
+def api_commit_diff(repo, commitid, username=None):
+    """
+    Files changed by a commit
+    -------------------------
+    List the files changed by a commit with the number of lines added and
+    removed in each of them, without their diff.
+
+    ::
+
+        GET /api/0/<repo>/c/<commit hash>/diff
+
+    ::
+
+        GET /api/0/fork/<username>/<repo>/c/<commit hash>/diff
+
+    Sample response
+    ^^^^^^^^^^^^^^^
+
+    ::
+
+        {
+          "total_files": 1,
+          "files": [
+            {
+              "binary": false,
+              "fileid": 1,
+              "lines_added": 3,
+              "lines_removed": 1,
+              "new_id": "e3b3b3ad0a0fa8a1ae7e66c1ccd4b0c5ef9d6a57",
+              "new_path": "README.rst",
+              "old_id": "fd7ef1b0fe7ac2fbb4d8ae31b2e1a20e77ed5a0b",
+              "old_path": "README.rst",
+              "status": "M"
+            }
+          ]
+        }
+
+    """
+    repo_obj, commit = _get_commit(repo, commitid, username=username)
+    files = pagure.lib.git.get_commit_diff_stats(repo_obj, commit)
+
+    jsonout = flask.jsonify({
+        'total_files': len(files),
+        'files': files,
+    })
+    return jsonout
+
+
+@API.route('/<repo>/c/<commitid>/diff/<int:fileid>')
+@API.route('/fork/<username>/<repo>/c/<commitid>/diff/<int:fileid>')
+@api_method
+@pagure.conditional_get(user_dependent=False)
+def api_commit_diff_file(repo, commitid, fileid, username=None):
+    """
+    Diff of a file changed by a commit
+    ----------------------------------
+    Retrieve the diff of one of the files changed by a commit, identified
+    by its ``fileid`` in the list of the files changed by the commit.
+
+    ::
+
+        GET /api/0/<repo>/c/<commit hash>/diff/<fileid>
+
+    ::
+
+        GET /api/0/fork/<username>/<repo>/c/<commit hash>/diff/<fileid>
+
+    Sample response
+    ^^^^^^^^^^^^^^^
+
+    ::
+
+        {
+          "diff": "@@ -1,3 +1,5 @@\n ...",
+          "file": {
+            "binary": false,
+            "fileid": 1,
+            "lines_added": 3,
+            "lines_removed": 1,
+            "new_id": "e3b3b3ad0a0fa8a1ae7e66c1ccd4b0c5ef9d6a57",
+            "new_path": "README.rst",
+            "old_id": "fd7ef1b0fe7ac2fbb4d8ae31b2e1a20e77ed5a0b",
+            "old_path": "README.rst",
+            "status": "M"
+          }
+        }
+
+    """
+    repo_obj, commit = _get_commit(repo, commitid, username=username)
+    diff = pagure.lib.git.get_commit_diff(repo_obj, commit)
+    patch = pagure.lib.git.get_diff_file(diff, fileid)
+    if patch is None:
+        raise pagure.exceptions.APIError(
+            404, error_code=APIERROR.ENODIFFFILE)
+
+    info = pagure.lib.git.get_patch_info(patch)
+    info['fileid'] = fileid
+
+    jsonout = flask.jsonify({
+        'file': info,
+        'diff': '' if info['binary'] else pagure.lib.git.patch_to_text(
+            patch),
+    })
+    return jsonout
+
+
 @API.route('/projects')
 @api_method
 def api_projects():
@@ -326,6 +460,7 @@ def api_fork_project():
                 docfolder=APP.config['DOCS_FOLDER'],
                 ticketfolder=APP.config['TICKETS_FOLDER'],
                 requestfolder=APP.config['REQUESTS_FOLDER'],
+                alternates=APP.config.get('FORK_WITH_ALTERNATES', False),
             )
             SESSION.commit()
             pagure.lib.git.generate_gitolite_acls()
@@ -70,6 +70,85 @@ ITEM_PER_PAGE = 48
 # Maximum size of the uploaded content
 MAX_CONTENT_LENGTH = 4 * 1024 * 1024  # 4 megabytes
 
+# Number of project overviews (front page of the projects) kept in memory
+OVERVIEW_CACHE_SIZE = 100
+
+# Number of rendered documents (README, docs...) kept in memory and the time
+# (in seconds) they are kept in redis, if redis is configured
+RENDER_CACHE_SIZE = 500
+RENDER_CACHE_REDIS_TTL = 7 * 24 * 3600
+
+# Number of syntax highlighted files kept in memory, they are kept in redis
+# as long as the rendered documents
+HIGHLIGHT_CACHE_SIZE = 200
+
+# Files larger than this (in bytes) are not syntax highlighted, only their
+# beginning is shown with a link to their raw version
+MAX_HIGHLIGHT_SIZE = 512 * 1024
+
+# Number of patches of commits or pull-requests kept in memory, they are
+# kept in redis as long as the rendered documents. Patches larger than
+# MAX_CACHED_PATCH_SIZE bytes are not cached
+PATCH_CACHE_SIZE = 50
+MAX_CACHED_PATCH_SIZE = 1024 * 1024
+
+# Number of pull-requests whose index of the inline comments, used to render
+# their diff, is kept in memory
+COMMENTS_INDEX_CACHE_SIZE = 100
+
+# Number of lists of the files changed, with their statistics, by a commit
+# or a pull-request kept in memory, they are kept in redis as long as the
+# rendered documents
+DIFFSTAT_CACHE_SIZE = 500
+
+# Number of files whose diff is rendered in the pages of the commits and the
+# pull-requests, and number of lines changed in a file above which its diff
+# is not rendered. The diff of the other files is only loaded on demand.
+MAX_DIFF_FILES_RENDERED = 50
+MAX_DIFF_LINES_RENDERED = 1000
+
+# Maximum number of bytes analyzed to guess the encoding of a file
+ENCODING_DETECTION_LIMIT = 64 * 1024
+
+# Time (in seconds) the clients may keep in cache the pages addressed by a
+# commit identifier, the number of open tickets, pull-requests and forks of
+# the project they show may be outdated by as much
+COMMIT_PAGE_MAX_AGE = 300
+
+# Number of git repositories kept open by each web process, 0 to open them
+# for each request
+REPO_POOL_SIZE = 20
+
+# Number of seconds to wait for other changes to the issues or the
+# pull-requests of a project before writing them in a single commit in the
+# tickets or requests git repository, 0 to write them immediately, and
+# maximum number of seconds a change may wait
+GIT_WRITE_DELAY = 0
+GIT_WRITE_MAX_LATENCY = 10
+
+# Number of tickets changed by a push to the tickets git repository of a
+# project from which they are imported in bulk, without notifications, and
+# number of tickets written to the database per transaction when they are
+TICKETS_BULK_IMPORT_MIN = 50
+TICKETS_IMPORT_BATCH_SIZE = 500
+
+# Merge the pull-requests directly in the bare git repository of the project
+# instead of in a clone of it, requires a recent pygit2
+MERGE_IN_BARE_REPO = True
+
+# Number of threads recomputing in the background the merge status of the
+# pull-requests affected by a merge or a push, 0 to compute it only when the
+# pull-request is viewed
+MERGEABILITY_WORKERS = 2
+
+# Have the git repository of a fork share the objects of its parent via git
+# alternates instead of being a full copy of it. The objects of a project
+# are copied in its forks before it is deleted, but they must not be pruned
+# from its git repository while forks use them: forking sets gc.pruneExpire
+# to never in the git repository of the parent, do not override it nor run
+# git gc --prune=<date> or git prune there.
+FORK_WITH_ALTERNATES = False
+
 # IP addresses allowed to access the internal endpoints
 IP_ALLOWED_INTERNAL = ['127.0.0.1', 'localhost', '::1']
 
@@ -123,6 +202,19 @@ REMOTE_GIT_FOLDER = os.path.join(
     'remotes'
 )
 
+# Number of seconds after which the mirror of the branch of a remote
+# pull-request is refreshed, in the background, when it is used
+REMOTE_GIT_TTL = 300
+
+# Transports allowed for the remote pull-requests, as named by git, see
+# GIT_ALLOW_PROTOCOL in git(1). Local paths use the 'file' transport and
+# git's 'ext' transport would run arbitrary commands, do not add it.
+REMOTE_GIT_PROTOCOLS = ['http', 'https', 'git', 'ssh']
+
+# Number of seconds after which the mirrors of remote git repositories which
+# were not fetched are removed by files/clean_remote_mirrors.py
+REMOTE_GIT_MAX_AGE = 30 * 24 * 3600
+
 
 # Configuration file for gitolite
 GITOLITE_CONFIG = os.path.join(
@@ -16,6 +16,8 @@ import markupsafe
 import markdown
 import textwrap
 
+import pagure.lib.cache
+
 
 def modify_rst(rst, view_file_url=None):
     """ Downgrade some of our rst directives if docutils is too old. """
@@ -89,10 +91,18 @@ def convert_doc(rst_string, view_file_url=None):
         return html_string
 
 
-def convert_readme(content, ext, view_file_url=None):
+def convert_readme(content, ext, view_file_url=None, oid=None):
     ''' Convert the provided content according to the extension of the file
     provided.
+
+    If the identifier of the git blob the content comes from is provided,
+    the output is cached using it.
     '''
+    if oid:
+        cached = pagure.lib.cache.get_rendered_markup(oid, ext, view_file_url)
+        if cached is not None:
+            return cached
+
     output = content
     safe = False
     if ext and ext in ['.rst']:
@@ -104,6 +114,10 @@ def convert_readme(content, ext, view_file_url=None):
     elif not ext or (ext and ext in ['.text', '.txt']):
         safe = True
         output = '<pre>%s</pre>' % content
+
+    if oid:
+        pagure.lib.cache.set_rendered_markup(
+            oid, ext, view_file_url, (output, safe))
     return output, safe
 
 
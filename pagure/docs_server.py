@@ -17,6 +17,7 @@ import pygit2
 import pagure.doc_utils
 import pagure.exceptions
 import pagure.lib
+import pagure.lib.repo
 import pagure.forms
 
 # Create the application.
@@ -107,7 +108,8 @@ def __get_tree_and_content(repo_obj, commit, path):
     if isinstance(blob_or_tree, pygit2.TreeEntry):  # Returned a file
         ext = os.path.splitext(blob_or_tree.name)[1]
         blob_obj = repo_obj[blob_or_tree.oid]
-        content, safe = pagure.doc_utils.convert_readme(blob_obj.data, ext)
+        content, safe = pagure.doc_utils.convert_readme(
+            blob_obj.data, ext, oid=blob_obj.oid.hex)
 
     tree = sorted(tree_obj, key=lambda x: x.filemode)
     return (tree, content, safe, extended)
@@ -133,7 +135,7 @@ def view_docs(repo, username=None, filename=None):
     if not os.path.exists(reponame):
         flask.abort(404, 'Documentation not found')
 
-    repo_obj = pygit2.Repository(reponame)
+    repo_obj = pagure.lib.repo.get_repo(reponame)
 
 
     if not repo_obj.is_empty:
@@ -7,6 +7,7 @@ relates to an issue.
 
 import os
 import sys
+import time
 
 from sqlalchemy.exc import SQLAlchemyError
 
@@ -17,54 +18,93 @@ if 'PAGURE_CONFIG' not in os.environ \
 
 import pagure
 import pagure.exceptions
+import pagure.lib.cache
+import pagure.lib.git
 import pagure.lib.link
+import pagure.lib.repo
 
 
 abspath = os.path.abspath(os.environ['GIT_DIR'])
 
 
-def generate_revision_change_log(new_commits_list):
-
-    print 'Detailed log of new commits:\n\n'
-    commitid = None
-    for line in pagure.lib.git.read_git_lines(
-            ['log', '--no-walk'] + new_commits_list + ['--'], abspath):
-        if line.startswith('commit'):
-            commitid = line.split('commit ')[-1]
-
-        line = line.strip()
-
-        print '*', line
-        for relation in pagure.lib.link.get_relation(
-                pagure.SESSION,
-                pagure.lib.git.get_repo_name(abspath),
-                pagure.lib.git.get_username(abspath),
-                line,
-                'fixes',
-                include_prs=True):
-            fixes_relation(commitid, relation,
-                           pagure.APP.config.get('APP_URL'))
-
-        for issue in pagure.lib.link.get_relation(
-                pagure.SESSION,
-                pagure.lib.git.get_repo_name(abspath),
-                pagure.lib.git.get_username(abspath),
-                line,
-                'relates'):
-            relates_commit(commitid, issue, pagure.APP.config.get('APP_URL'))
+def get_commits(repo_obj, revs):
+    ''' Return the commits of the given revisions, read in a single pass
+    over the git repository, each one only once. '''
+    commits = []
+    seen = set()
+    for rev in revs:
+        if rev in seen:
+            continue
+        seen.add(rev)
+        commit = repo_obj.get(rev)
+        if commit is not None:
+            commits.append(commit)
+    return commits
 
 
-def relates_commit(commitid, issue, app_url=None):
-    ''' Add a comment to an issue that this commit relates to it. '''
+def generate_revision_change_log(commits):
+    ''' Print the log of the new commits. '''
 
-    url = '../%s' % commitid[:8]
-    if app_url:
-        if app_url.endswith('/'):
-            app_url = app_url[:-1]
-        project = issue.project.fullname
-        if issue.project.is_fork:
-            project = 'fork/%s' % project
-        url = '%s/%s/c/%s' % (app_url, project, commitid[:8])
+    print 'Detailed log of new commits:\n\n'
+    for commit in commits:
+        print '* commit %s' % commit.oid.hex
+        print '* Author: %s <%s>' % (commit.author.name, commit.author.email)
+        for line in commit.message.strip().splitlines():
+            print '*', line.strip()
+
+
+def get_commits_references(commits):
+    ''' Return the issues and pull-requests the given commits fix and the
+    issues they relate to, as two lists of (commit, reference), the
+    references being as returned by `pagure.lib.link.get_references`. '''
+    fixes = []
+    relates = []
+    for commit in commits:
+        for line in commit.message.splitlines():
+            line = line.strip()
+            for ref in pagure.lib.link.get_references(line, 'fixes'):
+                if (commit, ref) not in fixes:
+                    fixes.append((commit, ref))
+            for ref in pagure.lib.link.get_references(line, 'relates'):
+                if (commit, ref) not in relates:
+                    relates.append((commit, ref))
+    return fixes, relates
+
+
+def filter_project_references(project, references):
+    ''' Return the identifiers of the issues and pull-requests of the given
+    project in the given list of (commit, reference), as a list of
+    (commit, identifier). '''
+    output = []
+    for commit, ref in references:
+        if not pagure.lib.link.is_project_reference(project, ref):
+            continue
+        if (commit, ref[1]) not in output:
+            output.append((commit, ref[1]))
+    return output
+
+
+def get_commit_url(commitid, relation, app_url, fallback):
+    ''' Return the URL of the given commit to use in the comment added to
+    the given issue or pull-request. '''
+    if not app_url:
+        return fallback % commitid[:8]
+
+    if app_url.endswith('/'):
+        app_url = app_url[:-1]
+    project = relation.project.fullname
+    if relation.project.is_fork:
+        project = 'fork/%s' % project
+    return '%s/%s/c/%s' % (app_url, project, commitid[:8])
+
+
+def relates_commit(commit, issue, app_url=None):
+    ''' Add a comment to an issue that this commit relates to it.
+
+    The changes are not committed to the database.
+    '''
+    commitid = commit.oid.hex
+    url = get_commit_url(commitid, issue, app_url, '../%s')
 
     comment = ''' Commit [%s](%s) relates to this ticket''' % (
         commitid[:8], url)
@@ -74,29 +114,22 @@ def relates_commit(commitid, issue, app_url=None):
             pagure.SESSION,
             issue=issue,
             comment=comment,
-            user=pagure.lib.git.get_author_email(commitid, abspath),
+            user=commit.author.email,
             ticketfolder=pagure.APP.config['TICKETS_FOLDER'],
         )
-        pagure.SESSION.commit()
     except pagure.exceptions.PagureException as err:
         print err
-    except SQLAlchemyError as err:  # pragma: no cover
-        pagure.SESSION.rollback()
-        pagure.APP.logger.exception(err)
 
 
-def fixes_relation(commitid, relation, app_url=None):
+def fixes_relation(commit, relation, app_url=None, in_master=False):
     ''' Add a comment to an issue or PR that this commit fixes it and update
-    the status if the commit is in the master branch. '''
+    the status if the commit is in the master branch.
 
-    url = '../c/%s' % commitid[:8]
-    if app_url:
-        if app_url.endswith('/'):
-            app_url = app_url[:-1]
-        project = relation.project.fullname
-        if relation.project.is_fork:
-            project = 'fork/%s' % project
-        url = '%s/%s/c/%s' % (app_url, project, commitid[:8])
+    The changes are not committed to the database.
+    '''
+    commitid = commit.oid.hex
+    url = get_commit_url(commitid, relation, app_url, '../c/%s')
+    user = commit.author.email
 
     comment = ''' Commit [%s](%s) fixes this %s''' % (
         commitid[:8], url, relation.isa)
@@ -107,7 +140,7 @@ def fixes_relation(commitid, relation, app_url=None):
                 pagure.SESSION,
                 issue=relation,
                 comment=comment,
-                user=pagure.lib.git.get_author_email(commitid, abspath),
+                user=user,
                 ticketfolder=pagure.APP.config['TICKETS_FOLDER'],
             )
         elif relation.isa == 'pull-request':
@@ -119,54 +152,104 @@ def fixes_relation(commitid, relation, app_url=None):
                 filename=None,
                 row=None,
                 comment=comment,
-                user=pagure.lib.git.get_author_email(commitid, abspath),
+                user=user,
                 requestfolder=pagure.APP.config['REQUESTS_FOLDER'],
             )
-        pagure.SESSION.commit()
     except pagure.exceptions.PagureException as err:
         print err
-    except SQLAlchemyError as err:  # pragma: no cover
-        pagure.SESSION.rollback()
-        pagure.APP.logger.exception(err)
-
-    branches = [
-        item.replace('* ', '')
-        for item in pagure.lib.git.read_git_lines(
-            ['branch', '--contains', commitid], abspath)
-    ]
 
-    if 'master' in branches:
+    if in_master:
         try:
             if relation.isa == 'issue':
                 pagure.lib.edit_issue(
                     pagure.SESSION,
                     relation,
                     ticketfolder=pagure.APP.config['TICKETS_FOLDER'],
-                    user=pagure.lib.git.get_author_email(commitid, abspath),
+                    user=user,
                     status='Fixed')
             elif relation.isa == 'pull-request':
                 pagure.lib.close_pull_request(
                     pagure.SESSION,
                     relation,
                     requestfolder=pagure.APP.config['REQUESTS_FOLDER'],
-                    user=pagure.lib.git.get_author_email(commitid, abspath),
+                    user=user,
                     merged=True)
-            pagure.SESSION.commit()
         except pagure.exceptions.PagureException as err:
             print err
-        except SQLAlchemyError as err:  # pragma: no cover
-            pagure.SESSION.rollback()
-            pagure.APP.logger.exception(err)
+
+
+def update_relations(project, repo_obj, commits):
+    ''' Comment on the issues and pull-requests the given commits fix or
+    relate to, and close the ones fixed in the master branch, in a single
+    transaction. '''
+    debug = pagure.APP.config.get('HOOK_DEBUG', False)
+    app_url = pagure.APP.config.get('APP_URL')
+
+    start = time.time()
+    fixes, relates = get_commits_references(commits)
+    # Only the issues and pull-requests of this project are updated
+    fixes = filter_project_references(project, fixes)
+    relates = filter_project_references(project, relates)
+    if not fixes and not relates:
+        return
+
+    # All the issues and pull-requests referenced are retrieved at once
+    relations = pagure.lib.link.get_relations(
+        pagure.SESSION, project,
+        [(project.name, relid) for _, relid in fixes + relates],
+        include_prs=True)
+    if debug:
+        print '  -- Resolved %s references in %.3fs' % (
+            len(fixes) + len(relates), time.time() - start)
+
+    start = time.time()
+    fixing = [
+        commit.oid.hex for commit, relid in fixes if relid in relations]
+    in_master = {}
+    if fixing:
+        # Only whether the commits are in master matters, the branches are
+        # read once for all of them
+        reachability = pagure.lib.git.BranchesReachability(repo_obj)
+        for commitid in fixing:
+            in_master[commitid] = reachability.in_branch(commitid, 'master')
+    if debug:
+        print '  -- Found the branches of %s commits in %.3fs' % (
+            len(fixing), time.time() - start)
+
+    start = time.time()
+    try:
+        for commit, relid in fixes:
+            if relid not in relations:
+                continue
+            fixes_relation(
+                commit, relations[relid], app_url,
+                in_master.get(commit.oid.hex, False))
+
+        for commit, relid in relates:
+            # Only issues may be related to
+            if relid not in relations or relations[relid].isa != 'issue':
+                continue
+            relates_commit(commit, relations[relid], app_url)
+
+        pagure.SESSION.commit()
+    except SQLAlchemyError as err:  # pragma: no cover
+        pagure.SESSION.rollback()
+        pagure.APP.logger.exception(err)
+    if debug:
+        print '  -- Updated the issues and pull-requests in %.3fs' % (
+            time.time() - start)
 
 
 def run_as_post_receive_hook():
+    debug = pagure.APP.config.get('HOOK_DEBUG', False)
 
+    refs = []
     for line in sys.stdin:
-        if pagure.APP.config.get('HOOK_DEBUG', False):
+        if debug:
             print line
         (oldrev, newrev, refname) = line.strip().split(' ', 2)
 
-        if pagure.APP.config.get('HOOK_DEBUG', False):
+        if debug:
             print '  -- Old rev'
             print oldrev
             print '  -- New rev'
@@ -176,13 +259,72 @@ def run_as_post_receive_hook():
 
         if set(newrev) == set(['0']):
             print "Deleting a reference/branch, so we won't run the "\
-                "pagure hook"
-            return
-
-        generate_revision_change_log(
-            pagure.lib.git.get_revs_between(oldrev, newrev, abspath, refname))
+                "pagure hook on %s" % refname
+            continue
+
+        refs.append((oldrev, newrev, refname))
+
+    if not refs:
+        return
+
+    start = time.time()
+    repo_obj = pagure.lib.repo.get_repo(abspath)
+    revs = []
+    for (oldrev, newrev, refname) in refs:
+        revs.extend(pagure.lib.git.get_revs_between(
+            oldrev, newrev, abspath, refname))
+    commits = get_commits(repo_obj, revs)
+    if debug:
+        print '  -- Read %s commits in %.3fs' % (
+            len(commits), time.time() - start)
+
+    generate_revision_change_log(commits)
+
+    # The project is only looked for once, for all the commits and refs
+    project = pagure.lib.get_project(
+        pagure.SESSION,
+        pagure.lib.git.get_repo_name(abspath),
+        user=pagure.lib.git.get_username(abspath))
+
+    if project and commits:
+        update_relations(project, repo_obj, commits)
+
+    start = time.time()
+    branches = []
+    for (oldrev, newrev, refname) in refs:
+        # Keep the number of commits of the branch up to date
+        pagure.lib.git.refresh_commits_count(abspath, refname)
+        # Index the tag pushed
+        pagure.lib.git.refresh_tags_index(abspath, refname)
+
+        if refname.startswith('refs/heads/'):
+            branches.append(refname[len('refs/heads/'):])
+
+    # The front page of the project has changed
+    pagure.lib.cache.invalidate_repo_overview(abspath)
+    # Have the web processes re-open the repository
+    pagure.lib.repo.bump_generation(abspath)
+    if debug:
+        print '  -- Refreshed the caches in %.3fs' % (time.time() - start)
+
+    # Check again if the pull-requests from or to these branches can be
+    # merged, before they are viewed, without having the push wait for it
+    if project and branches:
+        start = time.time()
+        requests = []
+        try:
+            requests = pagure.lib.git.refresh_merge_status(
+                pagure.SESSION, project, branches, recompute=False)
+        except SQLAlchemyError as err:  # pragma: no cover
+            pagure.SESSION.rollback()
+            pagure.APP.logger.exception(err)
+        pagure.lib.git.refresh_merge_status_detached(
+            [request.uid for request in requests])
+        if debug:
+            print '  -- Refreshed the merge status in %.3fs' % (
+                time.time() - start)
 
-    if pagure.APP.config.get('HOOK_DEBUG', False):
+    if debug:
         print 'repo:', pagure.lib.git.get_repo_name(abspath)
         print 'user:', pagure.lib.git.get_username(abspath)
 
@@ -7,9 +7,8 @@ the information pushed in the tickets git repository.
 
 import json
 import os
-import re
 import sys
-import subprocess
+import time
 
 
 # We need to access the database
@@ -19,36 +18,53 @@ if 'PAGURE_CONFIG' not in os.environ \
 
 import pagure
 import pagure.lib.git
+import pagure.lib.repo
 
 
 abspath = os.path.abspath(os.environ['GIT_DIR'])
 
 
-def get_files_to_load(new_commits_list):
+def get_files_to_load(repo_obj, refs):
+    ''' Return the blob identifier of the files changed by the refs pushed,
+    diffing once the old and the new tree of each ref. '''
 
     print 'Files changed by new commits:\n'
-    file_list = []
-    new_commits_list.reverse()
-    for commit in new_commits_list:
-        filenames = pagure.lib.git.read_git_lines(
-            ['diff-tree', '--no-commit-id', '--name-only', '-r', commit],
-            abspath)
-        for line in filenames:
-            if line.strip():
-                file_list.append(line.strip())
+    files = {}
+    for (oldrev, newrev, refname) in refs:
+        for filename, blobid in pagure.lib.git.get_changed_files(
+                repo_obj, oldrev, newrev):
+            files[filename] = blobid
 
-    return file_list
+    return files
+
+
+def load_tickets(repo_obj, files):
+    ''' Yield the uid and the json content of the tickets changed, reading
+    their blob one at a time. '''
+    for filename in sorted(files):
+        print 'To load: %s' % filename
+        blob = repo_obj.get(files[filename])
+        if blob is None:
+            continue
+        json_data = None
+        try:
+            json_data = json.loads(blob.data)
+        except ValueError:
+            pass
+        if json_data:
+            yield filename, json_data
 
 
 def run_as_post_receive_hook():
+    debug = pagure.APP.config.get('HOOK_DEBUG', False)
 
-    file_list = set()
+    refs = []
     for line in sys.stdin:
-        if pagure.APP.config.get('HOOK_DEBUG', False):
+        if debug:
             print line
         (oldrev, newrev, refname) = line.strip().split(' ', 2)
 
-        if pagure.APP.config.get('HOOK_DEBUG', False):
+        if debug:
             print '  -- Old rev'
             print oldrev
             print '  -- New rev'
@@ -58,35 +74,42 @@ def run_as_post_receive_hook():
 
         if set(newrev) == set(['0']):
             print "Deleting a reference/branch, so we won't run the "\
-                "pagure hook"
-            return
+                "pagure hook on %s" % refname
+            continue
 
-        tmp = set(get_files_to_load(
-            pagure.lib.git.get_revs_between(oldrev, newrev, abspath, refname)))
-        file_list = file_list.union(tmp)
+        refs.append((oldrev, newrev, refname))
+
+    start = time.time()
+    repo_obj = pagure.lib.repo.get_repo(abspath)
+    files = get_files_to_load(repo_obj, refs)
+    if debug:
+        print '  -- Found %s files changed in %.3fs' % (
+            len(files), time.time() - start)
 
     reponame = pagure.lib.git.get_repo_name(abspath)
     username = pagure.lib.git.get_username(abspath)
     print 'repo:', reponame, username
 
-    for filename in file_list:
-        print 'To load: %s' % filename
-        json_data = None
-        data = ''.join(
-            pagure.lib.git.read_git_lines(
-                ['show', 'HEAD:%s' % filename], abspath))
-        if data:
-            try:
-                json_data = json.loads(data)
-            except:
-                pass
-        if json_data:
+    start = time.time()
+    project = pagure.lib.get_project(
+        pagure.SESSION, reponame, user=username)
+    if project and \
+            len(files) >= pagure.APP.config.get('TICKETS_BULK_IMPORT_MIN', 50):
+        count = pagure.lib.git.update_tickets_from_git(
+            pagure.SESSION, project, load_tickets(repo_obj, files),
+            batch_size=pagure.APP.config.get(
+                'TICKETS_IMPORT_BATCH_SIZE', 500))
+        print '%s tickets imported' % count
+    else:
+        for filename, json_data in load_tickets(repo_obj, files):
             pagure.lib.git.update_ticket_from_git(
                 pagure.SESSION,
                 reponame=reponame,
                 username=username,
                 issue_uid=filename,
                 json_data=json_data)
+    if debug:
+        print '  -- Loaded the tickets in %.3fs' % (time.time() - start)
 
 
 def main(args):
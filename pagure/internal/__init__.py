@@ -26,6 +26,7 @@ import pagure
 import pagure.forms
 import pagure.lib
 import pagure.lib.git
+import pagure.lib.repo
 import pagure.ui.fork
 from pagure import is_repo_admin, authenticated
 
@@ -264,55 +265,48 @@ def get_pull_request_ready_branch():
         return response
 
     reponame = pagure.get_repo_path(repo)
-    repo_obj = pygit2.Repository(reponame)
+    repo_obj = pagure.lib.repo.get_repo(reponame)
 
-    branches = {}
-
-    for branchname in repo_obj.listall_branches():
-        branch = repo_obj.lookup_branch(branchname)
-
-        diff_commits = []
-        if repo.is_fork:
+    if repo.is_fork:
+        parentpath = os.path.join(
+            pagure.APP.config['GIT_FOLDER'], repo.parent.path)
+        if repo.parent.is_fork:
             parentpath = os.path.join(
-                pagure.APP.config['GIT_FOLDER'], repo.parent.path)
-            if repo.parent.is_fork:
-                parentpath = os.path.join(
-                    pagure.APP.config['FORK_FOLDER'], repo.parent.path)
-        else:
-            parentpath = os.path.join(
-                pagure.APP.config['GIT_FOLDER'], repo.path)
-
-        orig_repo = pygit2.Repository(parentpath)
+                pagure.APP.config['FORK_FOLDER'], repo.parent.path)
+    else:
+        parentpath = os.path.join(
+            pagure.APP.config['GIT_FOLDER'], repo.path)
 
-        if not repo_obj.is_empty and not orig_repo.is_empty \
-                and repo_obj.listall_branches() > 1:
+    orig_repo = pagure.lib.repo.get_repo(parentpath)
 
-            if not orig_repo.head_is_unborn:
-                compare_branch = orig_repo.lookup_branch(
-                    orig_repo.head.shorthand)
-            else:
-                compare_branch = None
+    branches = {}
 
-            compare_commits = []
+    if not repo_obj.is_empty and not orig_repo.is_empty \
+            and repo_obj.listall_branches() > 1:
 
+        compare_commitid = None
+        if not orig_repo.head_is_unborn:
+            compare_branch = orig_repo.lookup_branch(
+                orig_repo.head.shorthand)
             if compare_branch:
-                compare_commits = [
-                    commit.oid.hex
-                    for commit in orig_repo.walk(
-                        compare_branch.get_object().hex,
-                        pygit2.GIT_SORT_TIME)
-                ]
+                compare_commitid = compare_branch.get_object().hex
 
-            repo_commit = repo_obj[branch.get_object().hex]
+        # The history of the main branch is the same for all the branches
+        # so we only compute where it stops once
+        boundary = pagure.lib.git.get_commits_boundary(
+            repo_obj, orig_repo, compare_commitid)
 
-            for commit in repo_obj.walk(
-                    repo_commit.oid.hex, pygit2.GIT_SORT_TIME):
-                if commit.oid.hex in compare_commits:
-                    break
-                diff_commits.append(commit.oid.hex)
+        for branchname in repo_obj.listall_branches():
+            branch = repo_obj.lookup_branch(branchname)
+            diff_commits = [
+                commit.oid.hex
+                for commit in pagure.lib.git.get_diff_commits(
+                    repo_obj, branch.get_object().hex,
+                    orig_repo, compare_commitid, boundary=boundary)
+            ]
 
-        if diff_commits:
-            branches[branchname] = diff_commits
+            if diff_commits:
+                branches[branchname] = diff_commits
 
     prs = pagure.lib.search_pull_requests(
         pagure.SESSION,
@@ -378,7 +372,7 @@ def get_ticket_template(repo, username=None):
         pagure.APP.config['TICKETS_FOLDER'], repo.path)
     content = None
     if os.path.exists(ticketrepopath):
-        ticketrepo = pygit2.Repository(ticketrepopath)
+        ticketrepo = pagure.lib.repo.get_repo(ticketrepopath)
         if not ticketrepo.is_empty and not ticketrepo.head_is_unborn:
             commit = ticketrepo[ticketrepo.head.target]
             # Get the asked template
@@ -387,7 +381,7 @@ def get_ticket_template(repo, username=None):
                 bail_on_tree=True)
             if content_file:
                 content, _ = pagure.doc_utils.convert_readme(
-                        content_file.data, 'md')
+                    content_file.data, 'md', oid=content_file.oid.hex)
     if content:
         response = flask.jsonify({
             'code': 'OK',
@@ -448,11 +442,13 @@ def get_branches_of_commit():
         response.status_code = 404
         return response
 
-    repo_obj = pygit2.Repository(repopath)
+    repo_obj = pagure.lib.repo.get_repo(repopath)
 
     try:
-        commit_id in repo_obj
-    except:
+        commit = repo_obj.get(commit_id)
+    except (ValueError, TypeError):
+        commit = None
+    if commit is None:
         response = flask.jsonify({
             'code': 'ERROR',
             'message': 'This commit could not be found in this repo',
@@ -460,40 +456,17 @@ def get_branches_of_commit():
         response.status_code = 404
         return response
 
-    branches = []
-    if not repo_obj.head_is_unborn:
-        compare_branch = repo_obj.lookup_branch(
-            repo_obj.head.shorthand)
+    # A commit of the default branch is only shown as being in it, and if
+    # we didn't find the commit in any branch, then it is in the default
+    # branch.
+    reachability = pagure.lib.git.BranchesReachability(repo_obj)
+    default = reachability.default
+    if default and reachability.in_branch(commit.hex, default):
+        branches = [default]
     else:
-        compare_branch = None
-
-    for branchname in repo_obj.listall_branches():
-        branch = repo_obj.lookup_branch(branchname)
-
-        if not repo_obj.is_empty and len(repo_obj.listall_branches()) > 1:
-
-            merge_commit = None
-
-            if compare_branch:
-                merge_commit = repo_obj.merge_base(
-                    compare_branch.get_object().hex,
-                    branch.get_object().hex
-                ).hex
-
-            repo_commit = repo_obj[branch.get_object().hex]
-
-            for commit in repo_obj.walk(
-                    repo_commit.oid.hex, pygit2.GIT_SORT_TIME):
-                if commit.oid.hex == merge_commit:
-                    break
-                if commit.oid.hex == commit_id:
-                    branches.append(branchname)
-                    break
-
-    # If we didn't find the commit in any branch and there is one, then it
-    # is in the default branch.
-    if not branches and compare_branch:
-        branches.append(compare_branch.branch_name)
+        branches = reachability.get_branches([commit.hex])[commit.hex]
+        if default and not branches:
+            branches = [default]
 
     return flask.jsonify(
         {
@@ -38,6 +38,7 @@ from sqlalchemy.exc import SQLAlchemyError
 import pygit2
 
 import pagure.exceptions
+import pagure.lib.cache
 import pagure.lib.git
 import pagure.lib.login
 import pagure.lib.notify
@@ -220,7 +221,10 @@ def add_issue_comment(session, issue, comment, user, ticketfolder,
     )
     session.add(issue_comment)
     # Make sure we won't have SQLAlchemy error before we continue
-    session.commit()
+    session.flush()
+    # The comments of the issue may have been loaded before this one was
+    # added, reload them so that it is written in the git
+    session.expire(issue, ['comments'])
 
     pagure.lib.git.update_git(
         issue, repo=issue.project, repofolder=ticketfolder)
@@ -1355,8 +1359,13 @@ def update_project_settings(session, repo, settings, user):
 
 
 def fork_project(session, user, repo, gitfolder,
-                 docfolder, ticketfolder, requestfolder):
-    ''' Fork a given project into the user's forks. '''
+                 docfolder, ticketfolder, requestfolder, alternates=False):
+    ''' Fork a given project into the user's forks.
+
+    If ``alternates`` is True, the git repository of the fork shares the
+    objects of the one of the project via git alternates instead of being
+    a full clone of it.
+    '''
     reponame = os.path.join(gitfolder, repo.path)
     forkreponame = '%s.git' % os.path.join(
         gitfolder, 'forks', user, repo.name)
@@ -1385,14 +1394,17 @@ def fork_project(session, user, repo, gitfolder,
     # Make sure we won't have SQLAlchemy error before we create the repo
     session.flush()
 
-    frepo = pygit2.clone_repository(reponame, forkreponame, bare=True)
-    # Clone all the branches as well
-    for branch in frepo.listall_branches(pygit2.GIT_BRANCH_REMOTE):
-        br = frepo.lookup_branch(branch, pygit2.GIT_BRANCH_REMOTE)
-        name = br.branch_name.replace(br.remote_name, '')[1:]
-        if name in frepo.listall_branches(pygit2.GIT_BRANCH_LOCAL):
-            continue
-        frepo.create_branch(name, frepo.get(br.target.hex))
+    if alternates:
+        pagure.lib.git.create_fork_with_alternates(reponame, forkreponame)
+    else:
+        frepo = pygit2.clone_repository(reponame, forkreponame, bare=True)
+        # Clone all the branches as well
+        for branch in frepo.listall_branches(pygit2.GIT_BRANCH_REMOTE):
+            br = frepo.lookup_branch(branch, pygit2.GIT_BRANCH_REMOTE)
+            name = br.branch_name.replace(br.remote_name, '')[1:]
+            if name in frepo.listall_branches(pygit2.GIT_BRANCH_LOCAL):
+                continue
+            frepo.create_branch(name, frepo.get(br.target.hex))
 
     # Create the git-daemin-export-ok file on the clone
     http_clone_file = os.path.join(forkreponame, 'git-daemon-export-ok')
@@ -1966,6 +1978,10 @@ def reset_status_pull_request(session, project):
 
     session.commit()
 
+    # Have the merge status recomputed before the pull-requests are viewed
+    pagure.lib.git.MERGEABILITY_WORKER.add(
+        [request.uid for request in requests])
+
 
 def get_issue_statuses(session):
     ''' Return the complete list of status an issue can have.
@@ -2005,6 +2021,105 @@ def get_request_comment(session, request_uid, comment_id):
     return query.first()
 
 
+def _get_comments_key(comments):
+    ''' Return the key identifying the given list of comments of a
+    pull-request, it changes when a comment is added or removed.
+    '''
+    last = comments[-1]
+    return '%s-%s-%s' % (len(comments), last.id, last.date_created)
+
+
+def _to_unicode(string):
+    ''' Return the given file name or commit hash as unicode. '''
+    if isinstance(string, str):
+        string = string.decode('utf-8')
+    return unicode(string)
+
+
+def _get_comments_positions(request, refresh=False):
+    ''' Return the positions, in the list of the comments of the
+    pull-request, of its inline comments indexed by commit, filename and
+    line, using the cached index unless asked to refresh it.
+    '''
+    comments = request.comments
+    key = _get_comments_key(comments)
+    if not refresh:
+        positions = pagure.lib.cache.get_comments_index(request.uid, key)
+        if positions is not None:
+            return positions
+
+    positions = {}
+    for pos, comment in enumerate(comments):
+        if not comment.commit_id or not comment.filename:
+            continue
+        filekey = (
+            _to_unicode(comment.commit_id), _to_unicode(comment.filename))
+        positions.setdefault(filekey, {}).setdefault(
+            comment.line, []).append((pos, comment.id))
+
+    pagure.lib.cache.set_comments_index(request.uid, key, positions)
+    return positions
+
+
+def _resolve_comments_positions(comments, lines):
+    ''' Return the comments at the positions indexed by line, or None if
+    the positions are stale, for example because two comments made at the
+    same time were not returned in the same order.
+    '''
+    output = {}
+    for line, coms in lines.items():
+        for pos, commentid in coms:
+            if comments[pos].id != commentid:
+                return None
+        output[line] = [comments[pos] for pos, _ in coms]
+    return output
+
+
+def get_inline_comments_index(request):
+    ''' Return the inline comments of the specified pull-request indexed by
+    commit and file.
+
+    The index is built in a single pass over the comments of the
+    pull-request and cached until a comment is added or removed, so
+    rendering the diff of each file does not go through all the comments.
+
+    :arg request: the pull-request whose comments to index
+    :return: a dictionary associating to each (commit hash, filename) a
+        dictionary associating to each line its comments, the oldest first
+
+    '''
+    if not request.comments:
+        return {}
+
+    comments = request.comments
+    for refresh in (False, True):
+        index = {}
+        positions = _get_comments_positions(request, refresh=refresh)
+        for filekey, lines in positions.items():
+            index[filekey] = _resolve_comments_positions(comments, lines)
+            if index[filekey] is None:
+                break
+        else:
+            return index
+
+
+def get_inline_comments(request, commit, filename):
+    ''' Return the inline comments made on the specified file of the
+    specified commit of the pull-request, as a dictionary associating to
+    each line its comments, the oldest first.
+    '''
+    if not request.comments or not commit or not filename:
+        return {}
+
+    filekey = (_to_unicode(commit), _to_unicode(filename))
+    for refresh in (False, True):
+        positions = _get_comments_positions(request, refresh=refresh)
+        output = _resolve_comments_positions(
+            request.comments, positions.get(filekey, {}))
+        if output is not None:
+            return output
+
+
 def get_issue_by_uid(session, issue_uid):
     ''' Return the issue corresponding to the specified unique identifier.
 
@@ -0,0 +1,325 @@
+# -*- coding: utf-8 -*-
+
+"""
+ (c) 2016 - Copyright Red Hat Inc
+
+ Authors:
+   Pierre-Yves Chibon <pingou@pingoured.fr>
+
+"""
+
+import collections
+import hashlib
+import json
+import os
+import threading
+
+import kitchen.text.converters as ktc
+import markupsafe
+
+import pagure
+import pagure.lib
+import pagure.lib.repo
+
+
+class LRUCache(object):
+    """ A simple thread-safe cache keeping in memory the ``size`` items
+    most recently used.
+    """
+
+    def __init__(self, size=128):
+        """ Constructor.
+
+        :kwarg size: the maximum number of items to keep in the cache
+
+        """
+        self.size = size
+        self.stats = collections.Counter()
+        self._data = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """ Return the value stored for the specified key or ``default`` if
+        there are none.
+        """
+        with self._lock:
+            try:
+                value = self._data.pop(key)
+            except KeyError:
+                self.stats['misses'] += 1
+                return default
+            # Move it back to the top of the stack
+            self._data[key] = value
+            self.stats['hits'] += 1
+            return value
+
+    def set(self, key, value):
+        """ Store the value for the specified key, evicting the least
+        recently used item if the cache is full.
+        """
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = value
+            while len(self._data) > self.size:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        """ Remove the specified key from the cache. """
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        """ Remove everything from the cache. """
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+
+OVERVIEW_CACHE = LRUCache(
+    size=pagure.APP.config.get('OVERVIEW_CACHE_SIZE', 100))
+RENDER_CACHE = LRUCache(
+    size=pagure.APP.config.get('RENDER_CACHE_SIZE', 500))
+HIGHLIGHT_CACHE = LRUCache(
+    size=pagure.APP.config.get('HIGHLIGHT_CACHE_SIZE', 200))
+PATCH_CACHE = LRUCache(
+    size=pagure.APP.config.get('PATCH_CACHE_SIZE', 50))
+COMMENTS_INDEX_CACHE = LRUCache(
+    size=pagure.APP.config.get('COMMENTS_INDEX_CACHE_SIZE', 100))
+DIFFSTAT_CACHE = LRUCache(
+    size=pagure.APP.config.get('DIFFSTAT_CACHE_SIZE', 500))
+
+
+def get_stats():
+    """ Return the size and the number of hits and misses of the different
+    caches and of the pool of open git repositories.
+    """
+    stats = {}
+    for name, cache in [
+            ('overview', OVERVIEW_CACHE),
+            ('render', RENDER_CACHE),
+            ('highlight', HIGHLIGHT_CACHE),
+            ('patch', PATCH_CACHE),
+            ('comments_index', COMMENTS_INDEX_CACHE),
+            ('diffstat', DIFFSTAT_CACHE)]:
+        stats[name] = dict(cache.stats)
+        stats[name]['size'] = len(cache)
+        stats[name]['max_size'] = cache.size
+    stats['repo_pool'] = dict(pagure.lib.repo.REPO_POOL.stats)
+    stats['repo_pool']['size'] = len(pagure.lib.repo.REPO_POOL)
+    stats['repo_pool']['max_size'] = pagure.lib.repo.REPO_POOL.size
+    return stats
+
+
+def get_repo_overview(repopath, key):
+    """ Return the snapshot of the overview page of the git repository
+    stored at the specified location, if one was cached for the specified
+    key.
+    """
+    snapshot = OVERVIEW_CACHE.get(key)
+    if snapshot is None and pagure.lib.REDIS:
+        data = pagure.lib.REDIS.get(
+            'pagure.overview.%s' % os.path.abspath(repopath))
+        if data:
+            data = json.loads(data)
+            if data['key'] == key:
+                snapshot = data['snapshot']
+                OVERVIEW_CACHE.set(key, snapshot)
+    return snapshot
+
+
+def set_repo_overview(repopath, key, snapshot):
+    """ Store the snapshot of the overview page of the git repository stored
+    at the specified location for the specified key.
+    The snapshot must be serializable in JSON.
+    """
+    OVERVIEW_CACHE.set(key, snapshot)
+    if pagure.lib.REDIS:
+        try:
+            data = json.dumps({'key': key, 'snapshot': snapshot})
+        except ValueError as err:
+            # For example a README which is not valid UTF-8
+            pagure.LOG.debug('Could not store the overview: %s', err)
+            return
+        pagure.lib.REDIS.set(
+            'pagure.overview.%s' % os.path.abspath(repopath), data)
+
+
+def invalidate_repo_overview(repopath):
+    """ Drop the snapshot of the overview page of the git repository stored
+    at the specified location.
+    Meant to be called from the post-receive hook, snapshots cached in the
+    memory of the other processes are invalidated by their key.
+    """
+    if pagure.lib.REDIS:
+        pagure.lib.REDIS.delete(
+            'pagure.overview.%s' % os.path.abspath(repopath))
+
+
+def _get_blob_key(oid, *args):
+    """ Return the key used to cache the rendering of the git blob with the
+    specified identifier, the other arguments being the parameters of the
+    rendering.
+    """
+    return hashlib.sha1(':'.join(
+        [ktc.to_bytes(arg) for arg in (oid,) + args]
+    )).hexdigest()
+
+
+def get_rendered_markup(oid, ext, view_file_url=None):
+    """ Return the cached output of ``pagure.doc_utils.convert_readme`` for
+    the git blob with the specified identifier, or None if there is none.
+    """
+    key = _get_blob_key(oid, ext, view_file_url)
+    output = RENDER_CACHE.get(key)
+    if output is None and pagure.lib.REDIS:
+        data = pagure.lib.REDIS.get('pagure.render.%s' % key)
+        if data:
+            RENDER_CACHE.stats['redis_hits'] += 1
+            content, safe, is_markup = json.loads(data)
+            if is_markup:
+                content = markupsafe.Markup(content)
+            output = (content, safe)
+            RENDER_CACHE.set(key, output)
+    return output
+
+
+def set_rendered_markup(oid, ext, view_file_url, output):
+    """ Cache the output of ``pagure.doc_utils.convert_readme`` for the git
+    blob with the specified identifier.
+    Since a git blob never changes, entries only leave the cache because
+    of its size limit or, in redis, once ``RENDER_CACHE_REDIS_TTL``
+    seconds have passed.
+    """
+    key = _get_blob_key(oid, ext, view_file_url)
+    RENDER_CACHE.set(key, output)
+    if pagure.lib.REDIS:
+        content, safe = output
+        try:
+            data = json.dumps(
+                [content, safe, isinstance(content, markupsafe.Markup)])
+        except ValueError as err:
+            pagure.LOG.debug('Could not store the rendering: %s', err)
+            return
+        pagure.lib.REDIS.setex(
+            'pagure.render.%s' % key,
+            pagure.APP.config.get('RENDER_CACHE_REDIS_TTL', 7 * 24 * 3600),
+            data)
+
+
+def get_highlighted_file(oid, lexer_name, truncated=False):
+    """ Return the cached syntax highlighted HTML of the git blob with the
+    specified identifier, as produced by the specified pygments lexer, or
+    None if there is none.
+    """
+    key = _get_blob_key(oid, lexer_name, truncated)
+    output = HIGHLIGHT_CACHE.get(key)
+    if output is None and pagure.lib.REDIS:
+        output = pagure.lib.REDIS.get('pagure.highlight.%s' % key)
+        if output is not None:
+            HIGHLIGHT_CACHE.stats['redis_hits'] += 1
+            output = output.decode('utf-8')
+            HIGHLIGHT_CACHE.set(key, output)
+    return output
+
+
+def set_highlighted_file(oid, lexer_name, truncated, output):
+    """ Cache the syntax highlighted HTML of the git blob with the specified
+    identifier, as produced by the specified pygments lexer.
+    """
+    key = _get_blob_key(oid, lexer_name, truncated)
+    HIGHLIGHT_CACHE.set(key, output)
+    if pagure.lib.REDIS:
+        pagure.lib.REDIS.setex(
+            'pagure.highlight.%s' % key,
+            pagure.APP.config.get('RENDER_CACHE_REDIS_TTL', 7 * 24 * 3600),
+            ktc.to_bytes(output))
+
+
+def get_patch(oids):
+    """ Return the cached patch of the git commits with the specified
+    identifiers, as produced by ``pagure.lib.git.stream_commits_patch``,
+    or None if there is none.
+    """
+    key = _get_blob_key(*oids) if oids else 'empty'
+    output = PATCH_CACHE.get(key)
+    if output is None and pagure.lib.REDIS:
+        output = pagure.lib.REDIS.get('pagure.patch.%s' % key)
+        if output is not None:
+            PATCH_CACHE.stats['redis_hits'] += 1
+            PATCH_CACHE.set(key, output)
+    return output
+
+
+def set_patch(oids, patch):
+    """ Cache the patch of the git commits with the specified identifiers.
+    Commits never change, so the patch of a range of commits does not
+    either.
+    """
+    key = _get_blob_key(*oids) if oids else 'empty'
+    PATCH_CACHE.set(key, patch)
+    if pagure.lib.REDIS:
+        pagure.lib.REDIS.setex(
+            'pagure.patch.%s' % key,
+            pagure.APP.config.get('RENDER_CACHE_REDIS_TTL', 7 * 24 * 3600),
+            patch)
+
+
+def get_diff_stats(base, head, options):
+    """ Return the cached statistics of the files changed between the git
+    commits with the specified identifiers, as produced by
+    ``pagure.lib.git.get_diff_stats`` with the specified diff options, or
+    None if there are none.
+    """
+    key = _get_blob_key(base or 'empty', head, *options)
+    output = DIFFSTAT_CACHE.get(key)
+    if output is None and pagure.lib.REDIS:
+        data = pagure.lib.REDIS.get('pagure.diffstat.%s' % key)
+        if data:
+            DIFFSTAT_CACHE.stats['redis_hits'] += 1
+            output = json.loads(data)
+            DIFFSTAT_CACHE.set(key, output)
+    return output
+
+
+def set_diff_stats(base, head, options, stats):
+    """ Cache the statistics of the files changed between the git commits
+    with the specified identifiers, computed with the specified diff
+    options. Like the patches, they never change for a given key.
+    """
+    key = _get_blob_key(base or 'empty', head, *options)
+    DIFFSTAT_CACHE.set(key, stats)
+    if pagure.lib.REDIS:
+        try:
+            data = json.dumps(stats)
+        except ValueError as err:
+            # For example a file name which is not valid UTF-8
+            pagure.LOG.debug('Could not store the diff stats: %s', err)
+            return
+        pagure.lib.REDIS.setex(
+            'pagure.diffstat.%s' % key,
+            pagure.APP.config.get('RENDER_CACHE_REDIS_TTL', 7 * 24 * 3600),
+            data)
+
+
+def get_comments_index(request_uid, key):
+    """ Return the index of the inline comments of the pull-request with
+    the specified uid, as built by ``pagure.lib.get_inline_comments_index``,
+    if one was cached for the specified key.
+    """
+    cached = COMMENTS_INDEX_CACHE.get(request_uid)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    return None
+
+
+def set_comments_index(request_uid, key, index):
+    """ Cache the index of the inline comments of the pull-request with the
+    specified uid for the specified key, replacing the index cached for
+    any other key.
+    """
+    COMMENTS_INDEX_CACHE.set(request_uid, (key, index))
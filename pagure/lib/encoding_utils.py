@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+
+"""
+ (c) 2016 - Copyright Red Hat Inc
+
+ Authors:
+   Pierre-Yves Chibon <pingou@pingoured.fr>
+
+"""
+
+from chardet.universaldetector import UniversalDetector
+
+import kitchen.text.converters as ktc
+
+import pagure
+
+
+def guess_encoding(data, limit=None, chunk_size=4096):
+    """ Return the encoding of the provided data as guessed by chardet.
+
+    The data is given to chardet by chunks, stopping as soon as chardet is
+    confident about its guess or once ``limit`` bytes were read, so large
+    files do not have to be analyzed completely.
+
+    :arg data: the data whose encoding is guessed
+    :kwarg limit: the maximum number of bytes to analyze, defaults to the
+        ``ENCODING_DETECTION_LIMIT`` configuration key. A value of 0 or None
+        means the whole data is analyzed
+    :kwarg chunk_size: the number of bytes given to chardet at once
+    :return: the name of the guessed encoding or None if chardet could not
+        find one
+
+    """
+    if limit is None:
+        limit = pagure.APP.config.get('ENCODING_DETECTION_LIMIT')
+    data = ktc.to_bytes(data)
+    if limit:
+        data = data[:limit]
+
+    detector = UniversalDetector()
+    for idx in range(0, len(data), chunk_size):
+        detector.feed(data[idx:idx + chunk_size])
+        if detector.done:
+            break
+    detector.close()
+    return detector.result['encoding']
@@ -9,13 +9,19 @@
 """
 
 
+import atexit
+import collections
 import datetime
+import errno
 import hashlib
 import json
 import os
+import Queue
 import shutil
 import subprocess
 import tempfile
+import threading
+import time
 import re
 
 import pygit2
@@ -26,26 +32,36 @@ from sqlalchemy.exc import SQLAlchemyError
 import pagure
 import pagure.exceptions
 import pagure.lib
+import pagure.lib.cache
 import pagure.lib.notify
 from pagure.lib import model
 from pagure.lib.repo import PagureRepo
 
 # pylint: disable=R0913,E1101,R0914
 
+# Name of the file, stored in the git repositories, caching the number of
+# commits of each of their branches (when redis is not available)
+COMMITS_COUNT_FILE = 'pagure_commits_count'
 
-def commit_to_patch(repo_obj, commits):
-    ''' For a given commit (PyGit2 commit object) of a specified git repo,
-    returns a string representation of the changes the commit did in a
-    format that allows it to be used as patch.
+# Name of the file, stored in the git repositories, caching the information
+# about their tags (when redis is not available)
+TAGS_INDEX_FILE = 'pagure_tags_index'
+
+# Path, in a bare git repository, of the file listing the object stores of
+# the other git repositories it borrows objects from
+ALTERNATES_FILE = os.path.join('objects', 'info', 'alternates')
+
+
+def iter_commits_patch(repo_obj, commits):
+    ''' For the given commits (PyGit2 commit objects) of a specified git
+    repo, yields, commit by commit, a string representation of the changes
+    the commits did in a format that allows it to be used as patch.
     '''
     if not isinstance(commits, list):
         commits = [commits]
 
-    patch = ""
     for cnt, commit in enumerate(commits):
         if commit.parents:
-            diff = commit.tree.diff_to_tree()
-
             parent = repo_obj.revparse_single('%s^' % commit.oid.hex)
             diff = repo_obj.diff(parent, commit)
         else:
@@ -61,7 +77,7 @@ def commit_to_patch(repo_obj, commits):
         if len(commits) > 1:
             subject = '[PATCH %s/%s] %s' % (cnt + 1, len(commits), subject)
 
-        patch += u"""From {commit} Mon Sep 17 00:00:00 2001
+        yield u"""From {commit} Mon Sep 17 00:00:00 2001
 From: {author_name} <{author_email}>
 Date: {date}
 Subject: {subject}
@@ -78,7 +94,48 @@ Subject: {subject}
            subject=subject,
            msg=message,
            patch=diff.patch)
-    return patch
+
+
+def commit_to_patch(repo_obj, commits):
+    ''' For a given commit (PyGit2 commit object) of a specified git repo,
+    returns a string representation of the changes the commit did in a
+    format that allows it to be used as patch.
+    '''
+    return u''.join(iter_commits_patch(repo_obj, commits))
+
+
+def stream_commits_patch(repo_obj, commits):
+    ''' Yields, as UTF-8 encoded chunks, the patch of the given commits of
+    a specified git repo, see ``iter_commits_patch``.
+
+    Patches smaller than ``MAX_CACHED_PATCH_SIZE`` bytes are cached using
+    the identifiers of the commits.
+    '''
+    if not isinstance(commits, list):
+        commits = [commits]
+    oids = [commit.oid.hex for commit in commits]
+
+    patch = pagure.lib.cache.get_patch(oids)
+    if patch is not None:
+        yield patch
+        return
+
+    limit = pagure.APP.config.get('MAX_CACHED_PATCH_SIZE', 1024 * 1024)
+    chunks = []
+    size = 0
+    for chunk in iter_commits_patch(repo_obj, commits):
+        chunk = chunk.encode('utf-8')
+        if chunks is not None:
+            size += len(chunk)
+            if size > limit:
+                # Too big to be cached
+                chunks = None
+            else:
+                chunks.append(chunk)
+        yield chunk
+
+    if chunks is not None:
+        pagure.lib.cache.set_patch(oids, ''.join(chunks))
 
 
 def write_gitolite_acls(session, configfile):
@@ -151,94 +208,343 @@ def generate_gitolite_acls():
         )
 
 
-def update_git(obj, repo, repofolder):
-    """ Update the given issue in its git.
+def _is_valid_refname(refname):
+    """ Return whether the specified name is a valid name for a git
+    reference, see git-check-ref-format(1).
+    """
+    if hasattr(pygit2, 'reference_is_valid_name'):
+        return pygit2.reference_is_valid_name(refname)
+    proc = subprocess.Popen(
+        ['git', 'check-ref-format', refname],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE)
+    proc.communicate()
+    return proc.returncode == 0
+
 
-    This method forks the provided repo, add/edit the issue whose file name
-    is defined by the uid field of the issue and if there are additions/
-    changes commit them and push them back to the original repo.
+def _update_ref(repo_obj, refname, old_oid, new_oid):
+    """ Point the specified reference of the bare git repository to the
+    specified commit, only if it still points to ``old_oid`` (or does not
+    exist if ``old_oid`` is None).
+
+    The reference is locked the same way git does, so this is safe against
+    concurrent updates made by pagure, git or libgit2.
+    Returns whether the reference was updated.
+
+    :raise pagure.exceptions.PagureException: if the name of the reference
+        is invalid or conflicts with an existing reference
 
     """
+    if not refname.startswith('refs/') or not _is_valid_refname(refname):
+        raise pagure.exceptions.PagureException(
+            'Invalid reference name: %s' % refname)
+    # refs/heads/foo and refs/heads/foo/bar can not both exist
+    for other in repo_obj.listall_references():
+        if other.startswith('%s/' % refname) \
+                or refname.startswith('%s/' % other):
+            raise pagure.exceptions.PagureException(
+                'The reference %s conflicts with the existing reference %s'
+                % (refname, other))
 
-    if not repofolder:
-        return
+    refpath = os.path.join(repo_obj.path, refname)
+    lockpath = '%s.lock' % refpath
+    try:
+        if not os.path.exists(os.path.dirname(refpath)):
+            os.makedirs(os.path.dirname(refpath))
+        lockfd = os.open(
+            lockpath, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+    except OSError as err:
+        if err.errno == errno.EEXIST and os.path.exists(lockpath):
+            return False
+        raise pagure.exceptions.PagureException(
+            'Could not lock the reference %s: %s' % (refname, err))
 
-    # Get the fork
-    repopath = os.path.join(repofolder, repo.path)
+    try:
+        try:
+            current = repo_obj.lookup_reference(refname).target.hex
+        except KeyError:
+            current = None
+        if current != (old_oid.hex if old_oid else None):
+            return False
+
+        os.write(lockfd, '%s\n' % new_oid.hex)
+        os.close(lockfd)
+        lockfd = None
+        os.rename(lockpath, refpath)
+        return True
+    except (ValueError, OSError) as err:
+        raise pagure.exceptions.PagureException(
+            'Could not update the reference %s: %s' % (refname, err))
+    finally:
+        if lockfd is not None:
+            os.close(lockfd)
+        if os.path.exists(lockpath):
+            os.unlink(lockpath)
+
+
+def _build_tree(repo_obj, tree, changes):
+    """ Write in the git repository the tree resulting from the specified
+    changes to the specified tree.
+
+    :arg repo_obj: the git repository
+    :arg tree: the tree to change, None to start from an empty tree
+    :arg changes: a dictionary of the paths, relative to the tree, of the
+        files to change and of the identifier of their new blob, None to
+        remove the file
+    :return: a tuple with the identifier of the new tree and whether it
+        differs from the original one
 
-    # Clone the repo into a temp folder
-    newpath = tempfile.mkdtemp(prefix='pagure-')
-    new_repo = pygit2.clone_repository(repopath, newpath)
+    """
+    builder = repo_obj.TreeBuilder(tree) if tree is not None else \
+        repo_obj.TreeBuilder()
+    changed = False
+    subchanges = {}
+    for path, blob_oid in changes.items():
+        if '/' in path:
+            folder, path = path.split('/', 1)
+            subchanges.setdefault(folder, {})[path] = blob_oid
+            continue
+
+        entry = tree[path] if tree is not None and path in tree else None
+        if blob_oid is None:
+            if entry:
+                builder.remove(path)
+                changed = True
+        elif not entry or entry.oid != blob_oid:
+            # Keep the mode of existing files, e.g. executable
+            filemode = pygit2.GIT_FILEMODE_BLOB
+            if entry and entry.filemode != pygit2.GIT_FILEMODE_TREE:
+                filemode = entry.filemode
+            builder.insert(path, blob_oid, filemode)
+            changed = True
+
+    for folder, folder_changes in subchanges.items():
+        entry = tree[folder] if tree is not None and folder in tree else None
+        subtree = None
+        if entry and entry.filemode == pygit2.GIT_FILEMODE_TREE:
+            subtree = repo_obj[entry.oid]
+        subtree_oid, subtree_changed = _build_tree(
+            repo_obj, subtree, folder_changes)
+        if not subtree_changed:
+            continue
+        changed = True
+        if len(repo_obj[subtree_oid]):
+            builder.insert(folder, subtree_oid, pygit2.GIT_FILEMODE_TREE)
+        elif entry:
+            # Git does not store empty folders
+            builder.remove(folder)
+
+    return builder.write(), changed
+
+
+def _commit_files_in_bare_repo(
+        repopath, files, message, author=None, retries=5):
+    """ Commit on the master branch of the specified bare git repository
+    the changes to the specified files, without cloning the repository.
+
+    :arg repopath: the path to the bare git repository
+    :arg files: a dictionary of the paths of the files to change and of
+        their new content or the identifier of the blob with their new
+        content, None to remove the file
+    :arg message: the commit message
+    :kwarg author: the pygit2.Signature of the author and committer of the
+        commit, defaults to pagure
+    :kwarg retries: the number of times the commit is made again on top of
+        the changes made concurrently to the master branch
+    :return: the identifier of the commit made, None if nothing changed
 
-    file_path = os.path.join(newpath, obj.uid)
+    """
+    repo_obj = PagureRepo(repopath)
+    refname = 'refs/heads/master'
 
-    # Get the current index
-    index = new_repo.index
+    if author is None:
+        author = pygit2.Signature(name='pagure', email='pagure')
 
-    # Are we adding files
-    added = False
-    if not os.path.exists(file_path):
-        added = True
+    changes = {}
+    for path, content in files.items():
+        if content is not None and not isinstance(content, pygit2.Oid):
+            content = repo_obj.create_blob(content)
+        changes[path] = content
 
-    # Write down what changed
-    with open(file_path, 'w') as stream:
-        stream.write(json.dumps(
-            obj.to_json(), sort_keys=True, indent=4,
-            separators=(',', ': ')))
-
-    # Retrieve the list of files that changed
-    diff = new_repo.diff()
-    files = []
-    for p in diff:
-        if hasattr(p, 'new_file_path'):
-            files.append(p.new_file_path)
-        elif hasattr(p, 'delta'):
-            files.append(p.delta.new_file.path)
-
-    # Add the changes to the index
-    if added:
-        index.add(obj.uid)
-    for filename in files:
-        index.add(filename)
+    for _ in range(retries):
+        parent = None
+        tree = None
+        try:
+            parent = repo_obj[repo_obj.lookup_reference(refname).target]
+            tree = parent.tree
+        except KeyError:
+            pass
 
-    # If not change, return
-    if not files and not added:
-        shutil.rmtree(newpath)
-        return
+        tree_oid, changed = _build_tree(repo_obj, tree, changes)
+        if not changed:
+            return None
 
-    # See if there is a parent to this commit
-    parent = None
-    try:
-        parent = new_repo.head.get_object().oid
-    except pygit2.GitError:
-        pass
+        commit_oid = repo_obj.create_commit(
+            None, author, author, message, tree_oid,
+            [parent.oid] if parent else [])
 
-    parents = []
-    if parent:
-        parents.append(parent)
+        if _update_ref(
+                repo_obj, refname, parent.oid if parent else None,
+                commit_oid):
+            return commit_oid
 
-    # Author/commiter will always be this one
-    author = pygit2.Signature(name='pagure', email='pagure')
+    raise pagure.exceptions.PagureException(
+        'Could not update the git repository %s, it is being updated '
+        'concurrently' % repopath)
 
-    # Actually commit
-    new_repo.create_commit(
-        'refs/heads/master',
-        author,
-        author,
-        'Updated %s %s: %s' % (obj.isa, obj.uid, obj.title),
-        new_repo.index.write_tree(),
-        parents)
-    index.write()
 
-    # Push to origin
-    ori_remote = new_repo.remotes[0]
-    master_ref = new_repo.lookup_reference('HEAD').resolve()
-    refname = '%s:%s' % (master_ref.name, master_ref.name)
+class GitWriteQueue(object):
+    """ A queue delaying the writes made by ``update_git`` and ``clean_git``
+    in the tickets and requests git repositories, so that the changes made
+    to a project within a short time end up in a single commit.
 
-    PagureRepo.push(ori_remote, refname)
+    The changes to a git repository are written once no other change was
+    queued for it during ``delay`` seconds, but at most ``max_latency``
+    seconds after the first of them was queued.
+    The changes still in the queue are written when the process exits.
 
-    # Remove the clone
-    shutil.rmtree(newpath)
+    """
+
+    def __init__(self, delay=0, max_latency=10):
+        """ Constructor.
+
+        :kwarg delay: the number of seconds to wait for other changes before
+            writing the changes to a git repository, if 0 the changes are
+            written immediately
+        :kwarg max_latency: the maximum number of seconds a change may stay
+            in the queue
+
+        """
+        self.delay = delay
+        self.max_latency = max_latency
+        self._pending = {}
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._thread = None
+
+    def add(self, repopath, filename, content, message):
+        """ Queue the change of the content of the specified file in the
+        specified git repository.
+
+        :arg repopath: the path to the bare git repository
+        :arg filename: the name of the file, at the root of the repository
+        :arg content: the new content of the file, None to remove it
+        :arg message: the commit message describing the change
+
+        """
+        if not self.delay:
+            _commit_files_in_bare_repo(repopath, {filename: content}, message)
+            return
+
+        now = time.time()
+        with self._cond:
+            entry = self._pending.setdefault(
+                repopath, {'files': {}, 'messages': [], 'first': now})
+            entry['files'][filename] = content
+            entry['messages'].append(message)
+            entry['last'] = now
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run)
+                self._thread.daemon = True
+                self._thread.start()
+            self._cond.notify()
+
+    def _get_deadline(self, entry):
+        """ Return when the changes of the specified entry must be written.
+        """
+        return min(
+            entry['last'] + self.delay, entry['first'] + self.max_latency)
+
+    def _run(self):
+        """ Write the changes queued, once their deadline passed. """
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                now = time.time()
+                deadlines = dict(
+                    (repopath, self._get_deadline(entry))
+                    for repopath, entry in self._pending.items())
+                due = [
+                    repopath for repopath in deadlines
+                    if deadlines[repopath] <= now]
+                if not due:
+                    self._cond.wait(min(deadlines.values()) - now)
+                    continue
+            self._write(due)
+
+    def flush(self):
+        """ Write all the changes queued. """
+        with self._cond:
+            repopaths = list(self._pending)
+        self._write(repopaths)
+
+    def _write(self, repopaths):
+        """ Write the changes queued for the specified git repositories. """
+        with self._write_lock:
+            with self._cond:
+                entries = [
+                    (repopath, self._pending.pop(repopath))
+                    for repopath in repopaths
+                    if repopath in self._pending]
+
+            for repopath, entry in entries:
+                messages = entry['messages']
+                message = messages[0]
+                if len(messages) > 1:
+                    # Several changes of a single file are summarized by
+                    # the last of them
+                    summary = messages[-1]
+                    if len(entry['files']) > 1:
+                        summary = 'Updated %s issues or pull-requests' % (
+                            len(entry['files']))
+                    message = '%s\n\n%s' % (summary, '\n'.join(messages))
+                # We catch Exception if we want :-p
+                # pylint: disable=W0703
+                try:
+                    _commit_files_in_bare_repo(
+                        repopath, entry['files'], message)
+                except Exception as err:
+                    pagure.LOG.exception(
+                        'Could not write the changes to %s: %s',
+                        repopath, err)
+
+
+WRITE_QUEUE = GitWriteQueue(
+    delay=pagure.APP.config.get('GIT_WRITE_DELAY', 0),
+    max_latency=pagure.APP.config.get('GIT_WRITE_MAX_LATENCY', 10))
+atexit.register(WRITE_QUEUE.flush)
+
+
+def _serialize(obj):
+    """ Return the JSON representation of the given issue or pull-request
+    stored in the git repositories.
+    """
+    return json.dumps(
+        obj.to_json(), sort_keys=True, indent=4, separators=(',', ': '))
+
+
+def update_git(obj, repo, repofolder):
+    """ Update the given issue in its git.
+
+    This method writes the issue, in a file named after the uid field of
+    the issue, and commits it directly in the bare git repository if it
+    changed.
+    The commit may be delayed and shared with other changes, see
+    ``GitWriteQueue``.
+
+    """
+
+    if not repofolder:
+        return
+
+    repopath = os.path.join(repofolder, repo.path)
+
+    WRITE_QUEUE.add(
+        repopath,
+        obj.uid,
+        _serialize(obj),
+        'Updated %s %s: %s' % (obj.isa, obj.uid, obj.title))
 
 
 def clean_git(obj, repo, repofolder):
@@ -249,60 +555,126 @@ def clean_git(obj, repo, repofolder):
     if not repofolder:
         return
 
-    # Get the fork
     repopath = os.path.join(repofolder, repo.path)
 
-    # Clone the repo into a temp folder
-    newpath = tempfile.mkdtemp(prefix='pagure-')
-    new_repo = pygit2.clone_repository(repopath, newpath)
+    WRITE_QUEUE.add(
+        repopath,
+        obj.uid,
+        None,
+        'Removed %s %s: %s' % (obj.isa, obj.uid, obj.title))
 
-    file_path = os.path.join(newpath, obj.uid)
 
-    # Get the current index
-    index = new_repo.index
+def regenerate_git(project, kind, progress=None):
+    """ Write all the issues or all the pull-requests of the given project
+    in its tickets or requests git repository, in a single commit.
 
-    # Are we adding files
-    if not os.path.exists(file_path):
-        shutil.rmtree(newpath)
+    :arg project: the project whose git repository is regenerated
+    :arg kind: either ``tickets`` or ``requests``
+    :kwarg progress: a callable called with the number of issues or
+        pull-requests serialized so far and their total number
+    :return: the identifier of the commit made, None if nothing changed
+
+    """
+    if kind == 'tickets':
+        # Do not store private issues in the git
+        objs = [issue for issue in project.issues if not issue.private]
+        repofolder = pagure.APP.config['TICKETS_FOLDER']
+    elif kind == 'requests':
+        objs = project.requests
+        repofolder = pagure.APP.config['REQUESTS_FOLDER']
+    else:
+        raise pagure.exceptions.PagureException(
+            'Only the tickets or requests git repos can be regenerated')
+
+    if not repofolder:
         return
 
-    # Remove the file
-    os.unlink(file_path)
+    files = {}
+    for idx, obj in enumerate(objs, 1):
+        files[obj.uid] = _serialize(obj)
+        if progress:
+            progress(idx, len(objs))
 
-    # Add the changes to the index
-    index.remove(obj.uid)
+    return _commit_files_in_bare_repo(
+        os.path.join(repofolder, project.path),
+        files,
+        'Regenerated the %s git repo of %s' % (kind, project.fullname))
 
-    # See if there is a parent to this commit
-    parent = None
-    if not new_repo.is_empty:
-        parent = new_repo.head.get_object().oid
 
-    parents = []
-    if parent:
-        parents.append(parent)
+def _get_regeneration_key(project_id, kind):
+    """ Return the key used to store the progress of the regeneration of
+    the specified git repository of the specified project.
+    """
+    return 'pagure.regenerate.%s.%s' % (project_id, kind)
 
-    # Author/commiter will always be this one
-    author = pygit2.Signature(name='pagure', email='pagure')
 
-    # Actually commit
-    new_repo.create_commit(
-        'refs/heads/master',
-        author,
-        author,
-        'Removed %s %s: %s' % (obj.isa, obj.uid, obj.title),
-        new_repo.index.write_tree(),
-        parents)
-    index.write()
+REGENERATIONS = {}
 
-    # Push to origin
-    ori_remote = new_repo.remotes[0]
-    master_ref = new_repo.lookup_reference('HEAD').resolve()
-    refname = '%s:%s' % (master_ref.name, master_ref.name)
 
-    PagureRepo.push(ori_remote, refname)
+def _set_regeneration_progress(project_id, kind, **info):
+    """ Store the progress of the regeneration of the specified git
+    repository of the specified project, in redis if it is configured so
+    that all the processes can see it.
+    """
+    key = _get_regeneration_key(project_id, kind)
+    REGENERATIONS[key] = info
+    if pagure.lib.REDIS:
+        pagure.lib.REDIS.setex(key, 24 * 3600, json.dumps(info))
 
-    # Remove the clone
-    shutil.rmtree(newpath)
+
+def get_regeneration_progress(project_id, kind):
+    """ Return the progress of the regeneration of the specified git
+    repository of the specified project, as a dictionary with the keys
+    ``status`` (``running``, ``done`` or ``failed``), ``done`` and
+    ``total``, or None if it was not regenerated recently.
+    """
+    key = _get_regeneration_key(project_id, kind)
+    if pagure.lib.REDIS:
+        info = pagure.lib.REDIS.get(key)
+        return json.loads(info) if info else None
+    return REGENERATIONS.get(key)
+
+
+def regenerate_git_in_background(project, kind):
+    """ Regenerate the tickets or requests git repository of the given
+    project in a thread, with its own session of ``pagure.SESSION``.
+    Its progress is available via ``get_regeneration_progress``.
+    """
+    project_id = project.id
+    _set_regeneration_progress(
+        project_id, kind, status='running', done=0, total=None)
+
+    def progress(done, total):
+        """ Report the progress every 100 issues or pull-requests. """
+        if done % 100 == 0 or done == total:
+            _set_regeneration_progress(
+                project_id, kind, status='running', done=done, total=total)
+
+    def run():
+        """ Do the actual regeneration. """
+        # The scoped session gives this thread a session of its own
+        session = pagure.SESSION
+        # We catch Exception if we want :-p
+        # pylint: disable=W0703
+        try:
+            project = session.query(model.Project).get(project_id)
+            regenerate_git(project, kind, progress=progress)
+            info = get_regeneration_progress(project_id, kind) or {}
+            _set_regeneration_progress(
+                project_id, kind, status='done',
+                done=info.get('done', 0), total=info.get('total', 0))
+        except Exception as err:
+            pagure.LOG.exception(
+                'Could not regenerate the %s git repo of project %s: %s',
+                kind, project_id, err)
+            _set_regeneration_progress(
+                project_id, kind, status='failed', done=None, total=None)
+        finally:
+            session.remove()
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
 
 
 def get_user_from_json(session, jsondata, key='user'):
@@ -502,6 +874,258 @@ def update_ticket_from_git(
     session.commit()
 
 
+def _get_import_user(session, jsondata, users, key='user'):
+    """ Returns the user described in the given json blob, looking for it
+    (or creating it) in the database only once per import.
+    """
+    data = jsondata.get(key)
+    if not data:
+        return None
+
+    userkey = data.get('name') or tuple(data.get('emails') or [])
+    if userkey not in users:
+        users[userkey] = get_user_from_json(session, jsondata, key=key)
+    return users[userkey]
+
+
+def _update_tickets_batch(session, project, batch, users, dependencies):
+    """ Update, or create, the issues of the given batch, as done by
+    ``update_tickets_from_git``, in a single transaction.
+    """
+    # Users are created, and committed, before the batch is written
+    for _, json_data in batch:
+        _get_import_user(session, json_data, users)
+        _get_import_user(session, json_data, users, key='assignee')
+        for comment in json_data.get('comments', []):
+            _get_import_user(session, comment, users)
+
+    uids = [issue_uid for issue_uid, _ in batch]
+    issues = dict(
+        (issue.uid, issue)
+        for issue in session.query(model.Issue).filter(
+            model.Issue.uid.in_(uids)))
+
+    issues_tags = collections.defaultdict(dict)
+    for tagissue in session.query(model.TagIssue).filter(
+            model.TagIssue.issue_uid.in_(uids)):
+        issues_tags[tagissue.issue_uid][tagissue.tag] = tagissue
+
+    issues_comments = collections.defaultdict(set)
+    for issue_uid, commentid in session.query(
+            model.IssueComment.issue_uid, model.IssueComment.id).filter(
+                model.IssueComment.issue_uid.in_(uids)):
+        issues_comments[issue_uid].add(commentid)
+
+    tags = set()
+    for _, json_data in batch:
+        tags.update(json_data.get('tags', []))
+    known_tags = set()
+    if tags:
+        known_tags = set(
+            tag for tag, in session.query(model.Tag.tag).filter(
+                model.Tag.tag.in_(tags)))
+    for tag in tags - known_tags:
+        session.add(model.Tag(tag=tag))
+
+    updated = []
+    for issue_uid, json_data in batch:
+        user = _get_import_user(session, json_data, users)
+        if user is None:
+            continue
+
+        issue = issues.get(issue_uid)
+        if issue is None:
+            issue_id = json_data.get('id')
+            if not issue_id:
+                session.flush()
+                issue_id = pagure.lib.get_next_id(session, project.id)
+            issue = model.Issue(
+                id=issue_id,
+                project_id=project.id,
+                title=json_data.get('title'),
+                content=json_data.get('content'),
+                user_id=user.id,
+                uid=issue_uid,
+                private=bool(json_data.get('private')),
+            )
+            if json_data.get('date_created'):
+                issue.date_created = datetime.datetime.utcfromtimestamp(
+                    float(json_data.get('date_created')))
+            if json_data.get('status'):
+                issue.status = json_data.get('status')
+        else:
+            title = json_data.get('title')
+            if title and title != issue.title:
+                issue.title = title
+            content = json_data.get('content')
+            if content and content != issue.content:
+                issue.content = content
+            status = json_data.get('status')
+            if status and status != issue.status:
+                issue.status = status
+                if status.lower() != 'open':
+                    issue.closed_at = datetime.datetime.utcnow()
+            private = json_data.get('private')
+            if private in [True, False] and private != issue.private:
+                issue.private = private
+
+        assignee = _get_import_user(
+            session, json_data, users, key='assignee')
+        if assignee and assignee.id != issue.assignee_id:
+            issue.assignee_id = assignee.id
+
+        session.add(issue)
+        updated.append((issue_uid, json_data))
+
+        dependencies[issue_uid] = (
+            [int(relid) for relid in json_data.get('depends', [])],
+            [int(relid) for relid in json_data.get('blocks', [])],
+        )
+
+    # The issues and the tags must exist before being linked
+    session.flush()
+
+    for issue_uid, json_data in updated:
+        # Update tags
+        wanted = set(json_data.get('tags', []))
+        current = issues_tags[issue_uid]
+        for tag in set(current) - wanted:
+            session.delete(current[tag])
+        for tag in wanted - set(current):
+            session.add(model.TagIssue(issue_uid=issue_uid, tag=tag))
+
+        # Add the new comments
+        for comment in json_data.get('comments', []):
+            if comment.get('id') in issues_comments[issue_uid]:
+                continue
+            commenter = _get_import_user(session, comment, users)
+            if commenter is None:
+                continue
+            session.add(model.IssueComment(
+                issue_uid=issue_uid,
+                comment=comment['comment'],
+                user_id=commenter.id,
+                notification=bool(comment.get('notification')),
+                date_created=datetime.datetime.utcfromtimestamp(
+                    float(comment['date_created'])),
+            ))
+
+    session.commit()
+    return len(updated)
+
+
+def _update_tickets_dependencies(session, project, dependencies):
+    """ Update the dependencies between the issues of the given project, as
+    listed in their json blobs, in a single transaction.
+
+    :arg dependencies: a dictionary associating the unique identifier of
+        the issues imported to the list of identifiers of the issues they
+        depend on and the list of identifiers of the issues they block
+
+    """
+    if not dependencies:
+        return
+
+    uids = dict(
+        session.query(model.Issue.id, model.Issue.uid).filter(
+            model.Issue.project_id == project.id))
+
+    # An issue depending on another is its parent
+    wanted = set()
+    for issue_uid, (depends, blocks) in dependencies.items():
+        for relid in depends:
+            if relid in uids and uids[relid] != issue_uid:
+                wanted.add((issue_uid, uids[relid]))
+        for relid in blocks:
+            if relid in uids and uids[relid] != issue_uid:
+                wanted.add((uids[relid], issue_uid))
+
+    project_uids = session.query(model.Issue.uid).filter(
+        model.Issue.project_id == project.id).subquery()
+    existing = set()
+    for link in session.query(model.IssueToIssue).filter(
+            model.IssueToIssue.parent_issue_id.in_(project_uids)):
+        key = (link.parent_issue_id, link.child_issue_id)
+        existing.add(key)
+        # Only the dependencies of the issues imported are removed
+        if key not in wanted and (
+                link.parent_issue_id in dependencies
+                or link.child_issue_id in dependencies):
+            session.delete(link)
+
+    for parent_uid, child_uid in wanted - existing:
+        session.add(model.IssueToIssue(
+            parent_issue_id=parent_uid,
+            child_issue_id=child_uid))
+
+    session.commit()
+
+
+def update_tickets_from_git(session, project, tickets, batch_size=500):
+    """ Update, or create, in bulk the issues of the specified project with
+    the data present in the json blobs provided.
+
+    Unlike ``update_ticket_from_git``, which commits to the database several
+    times per issue, the issues, their tags, assignee and comments are
+    written in a transaction per ``batch_size`` issues and their
+    dependencies in a last one. No notification is sent.
+
+    :arg session: the session to connect to the database with.
+    :arg project: the project whose issues are updated
+    :arg tickets: an iterable of (issue_uid, json_data), json_data being the
+        json representation of the issue taken from the git
+    :kwarg batch_size: the number of issues written per transaction
+    :return: the number of issues updated or created
+
+    """
+    users = {}
+    dependencies = {}
+    count = 0
+
+    batch = []
+    for ticket in tickets:
+        batch.append(ticket)
+        if len(batch) >= batch_size:
+            count += _update_tickets_batch(
+                session, project, batch, users, dependencies)
+            batch = []
+    if batch:
+        count += _update_tickets_batch(
+            session, project, batch, users, dependencies)
+
+    # The issues depended on may have been created in any batch
+    _update_tickets_dependencies(session, project, dependencies)
+
+    return count
+
+
+def get_changed_files(repo_obj, oldrev, newrev):
+    """ Returns the path and blob identifier of the files added or modified
+    between the two given revisions, from a single diff of their trees.
+
+    The old revision is a null identifier when a new branch is pushed.
+    """
+    new_commit = repo_obj.get(newrev)
+    if set(oldrev) == set('0'):
+        diff = new_commit.tree.diff_to_tree(swap=True)
+    else:
+        diff = repo_obj.diff(repo_obj.get(oldrev), new_commit)
+
+    if hasattr(diff, 'deltas'):
+        files = [
+            (delta.new_file.path, '%s' % delta.new_file.id)
+            for delta in diff.deltas]
+    else:
+        files = [
+            (info['new_path'], info['new_id'])
+            for info in (get_patch_info(patch) for patch in diff)]
+
+    # Removed files have a null blob identifier
+    return [
+        (filename, blobid) for filename, blobid in files
+        if set(blobid) != set('0')]
+
+
 def update_request_from_git(
         session, reponame, username, request_uid, json_data,
         gitfolder, docfolder, ticketfolder, requestfolder):
@@ -597,82 +1221,59 @@ def update_request_from_git(
     session.commit()
 
 
-def add_file_to_git(repo, issue, ticketfolder, user, filename, filestream):
+def add_file_to_git(repo, issue, ticketfolder, user, filename, filestream,
+                    chunk_size=64 * 1024):
     ''' Add a given file to the specified ticket git repository.
 
+    The file is read only once, by chunks, and stored directly in the bare
+    git repository. Files already present in the git repository are not
+    added again.
+
     :arg repo: the Project object from the database
     :arg ticketfolder: the folder on the filesystem where the git repo for
         tickets are stored
     :arg user: the user object with its username and email
     :arg filename: the name of the file to save
     :arg filestream: the actual content of the file
+    :kwarg chunk_size: the number of bytes read from the stream at once
 
     '''
 
     if not ticketfolder:
         return
 
-    # Prefix the filename with a timestamp:
-    filename = '%s-%s' % (
-        hashlib.sha256(filestream.read()).hexdigest(),
-        werkzeug.secure_filename(filename)
-    )
-
-    # Get the fork
     repopath = os.path.join(ticketfolder, repo.path)
 
-    # Clone the repo into a temp folder
-    newpath = tempfile.mkdtemp(prefix='pagure-')
-    new_repo = pygit2.clone_repository(repopath, newpath)
-
-    folder_path = os.path.join(newpath, 'files')
-    file_path = os.path.join(folder_path, filename)
-
-    # Get the current index
-    index = new_repo.index
-
-    # Are we adding files
-    added = False
-    if not os.path.exists(file_path):
-        added = True
-    else:
-        # File exists, remove the clone and return
-        shutil.rmtree(newpath)
-        return os.path.join('files', filename)
-
-    if not os.path.exists(folder_path):
-        os.mkdir(folder_path)
-
-    # Write down what changed
-    filestream.seek(0)
-    with open(file_path, 'w') as stream:
-        stream.write(filestream.read())
-
-    # Retrieve the list of files that changed
-    diff = new_repo.diff()
-    files = [patch.new_file_path for patch in diff]
-
-    # Add the changes to the index
-    if added:
-        index.add(os.path.join('files', filename))
-    for filename in files:
-        index.add(filename)
-
-    # If not change, return
-    if not files and not added:
-        shutil.rmtree(newpath)
-        return
-
-    # See if there is a parent to this commit
-    parent = None
+    # Store the file next to the git repository while computing its hash
+    checksum = hashlib.sha256()
+    tmpfile = tempfile.NamedTemporaryFile(
+        prefix='pagure-upload-', dir=repopath, delete=False)
     try:
-        parent = new_repo.head.get_object().oid
-    except pygit2.GitError:
-        pass
+        with tmpfile:
+            while True:
+                chunk = filestream.read(chunk_size)
+                if not chunk:
+                    break
+                checksum.update(chunk)
+                tmpfile.write(chunk)
+
+        # Prefix the filename with the hash of its content
+        filename = '%s-%s' % (
+            checksum.hexdigest(),
+            werkzeug.secure_filename(filename)
+        )
+        file_path = os.path.join('files', filename)
+
+        repo_obj = PagureRepo(repopath)
+        if not repo_obj.is_empty and not repo_obj.head_is_unborn:
+            tree = repo_obj[repo_obj.head.target].tree
+            if 'files' in tree and filename in repo_obj[tree['files'].oid]:
+                # The file is already there
+                return file_path
 
-    parents = []
-    if parent:
-        parents.append(parent)
+        blob_oid = repo_obj.create_blob_fromdisk(tmpfile.name)
+    finally:
+        os.unlink(tmpfile.name)
 
     # Author/commiter will always be this one
     author = pygit2.Signature(
@@ -680,27 +1281,13 @@ def add_file_to_git(repo, issue, ticketfolder, user, filename, filestream):
         email=user.email.encode('utf-8')
     )
 
-    # Actually commit
-    new_repo.create_commit(
-        'refs/heads/master',
-        author,
-        author,
+    _commit_files_in_bare_repo(
+        repopath,
+        {file_path: blob_oid},
         'Add file %s to ticket %s: %s' % (filename, issue.uid, issue.title),
-        new_repo.index.write_tree(),
-        parents)
-    index.write()
-
-    # Push to origin
-    ori_remote = new_repo.remotes[0]
-    master_ref = new_repo.lookup_reference('HEAD').resolve()
-    refname = '%s:%s' % (master_ref.name, master_ref.name)
-
-    PagureRepo.push(ori_remote, refname)
-
-    # Remove the clone
-    shutil.rmtree(newpath)
+        author=author)
 
-    return os.path.join('files', filename)
+    return file_path
 
 
 def update_file_in_git(
@@ -708,6 +1295,10 @@ def update_file_in_git(
     ''' Update a specific file in the specified repository with the content
     given and commit the change under the user's name.
 
+    The commit is made directly in the bare git repository, on top of the
+    branch ``branch``, and the branch ``branchto`` is only updated if it
+    did not move in between.
+
     :arg repo: the Project object from the database
     :arg filename: the name of the file to save
     :arg content: the new content of the file
@@ -716,89 +1307,158 @@ def update_file_in_git(
 
     '''
 
-    # Get the fork
     repopath = pagure.get_repo_path(repo)
+    repo_obj = PagureRepo(repopath)
 
-    # Clone the repo into a temp folder
-    newpath = tempfile.mkdtemp(prefix='pagure-')
-    new_repo = pygit2.clone_repository(
-        repopath, newpath, checkout_branch=branch)
-
-    file_path = os.path.join(newpath, filename)
-
-    # Get the current index
-    index = new_repo.index
+    if branch not in repo_obj.listall_branches():
+        raise pagure.exceptions.PagureException(
+            'No refs found for %s' % branch)
+    if not _is_valid_refname('refs/heads/%s' % branchto):
+        raise pagure.exceptions.PagureException(
+            'Invalid branch name: %s' % branchto)
+    parent = repo_obj.lookup_branch(branch).get_object()
 
     # Write down what changed
-    with open(file_path, 'w') as stream:
-        stream.write(content.replace('\r', '').encode('utf-8'))
-
-    # Retrieve the list of files that changed
-    diff = new_repo.diff()
-    files = []
-    for p in diff:
-        if hasattr(p, 'new_file_path'):
-            files.append(p.new_file_path)
-        elif hasattr(p, 'delta'):
-            files.append(p.delta.new_file.path)
-
-    # Add the changes to the index
-    added = False
-    for filename in files:
-        added = True
-        index.add(filename)
+    blob_oid = repo_obj.create_blob(
+        content.replace('\r', '').encode('utf-8'))
+    tree_oid, changed = _build_tree(
+        repo_obj, parent.tree, {filename: blob_oid})
 
     # If not change, return
-    if not files and not added:
-        shutil.rmtree(newpath)
+    if not changed:
         return
 
-    # See if there is a parent to this commit
-    branch_ref = get_branch_ref(new_repo, branch)
-    parent = branch_ref.get_object()
-
-    # See if we need to create the branch
-    nbranch_ref = None
-    if branchto not in new_repo.listall_branches():
-        nbranch_ref = new_repo.create_branch(branchto, parent)
-
-    parents = []
-    if parent:
-        parents.append(parent.hex)
-
     # Author/commiter will always be this one
     author = pygit2.Signature(
         name=user.username.encode('utf-8'),
         email=email.encode('utf-8')
     )
 
-    # Actually commit
-    new_repo.create_commit(
-        nbranch_ref.name if nbranch_ref else branch_ref.name,
+    commit_oid = repo_obj.create_commit(
+        None,
         author,
         author,
         message.strip(),
-        new_repo.index.write_tree(),
-        parents)
-    index.write()
+        tree_oid,
+        [parent.hex])
+
+    # Update the branch, creating it if needed
+    refname = 'refs/heads/%s' % branchto
+    current = None
+    if branchto in repo_obj.listall_branches():
+        current = repo_obj.lookup_reference(refname).target
+        if current != parent.oid \
+                and not repo_obj.descendant_of(parent.oid, current):
+            raise pagure.exceptions.PagureException(
+                'Commit could not be done: %s is not a fast-forward of %s'
+                % (branch, branchto))
 
-    # Push to origin
-    ori_remote = new_repo.remotes[0]
-    refname = '%s:refs/heads/%s' % (
-        nbranch_ref.name if nbranch_ref else branch_ref.name,
-        branchto)
+    if not _update_ref(repo_obj, refname, current, commit_oid):
+        raise pagure.exceptions.PagureException(
+            'Commit could not be done: the branch %s was updated in the '
+            'meantime' % branchto)
 
-    try:
-        PagureRepo.push(ori_remote, refname)
-    except pygit2.GitError as err:  # pragma: no cover
-        shutil.rmtree(newpath)
+    return os.path.join('files', filename)
+
+
+def create_fork_with_alternates(repopath, forkpath):
+    ''' Create a bare git repository sharing the objects of another one via
+    git alternates instead of copying them, with the same branches and tags.
+
+    Objects pushed later to the new repository are stored in it, only the
+    existing ones are shared. As they may become unreachable in the forked
+    repository, it is set to never prune them (gc.pruneExpire = never).
+
+    :arg repopath: the path to the git repository to fork
+    :arg forkpath: the path of the git repository to create
+    :return: the PagureRepo object of the new git repository
+
+    '''
+    repo_obj = PagureRepo(repopath)
+    # The fork needs the objects, even once the branches of the forked
+    # repository do not reference them anymore
+    repo_obj.config['gc.pruneExpire'] = 'never'
+
+    pygit2.init_repository(forkpath, bare=True)
+    with open(os.path.join(forkpath, ALTERNATES_FILE), 'w') as stream:
+        stream.write(
+            '%s\n' % os.path.join(os.path.abspath(repopath), 'objects'))
+
+    # Open it once the alternates are set so the objects are found
+    fork_obj = PagureRepo(forkpath)
+    for refname in repo_obj.listall_references():
+        if refname.startswith(('refs/heads/', 'refs/tags/')):
+            fork_obj.create_reference(
+                refname, repo_obj.lookup_reference(refname).resolve().target)
+
+    head = repo_obj.lookup_reference('HEAD')
+    if head.type == pygit2.GIT_REF_SYMBOLIC:
+        fork_obj.create_reference('HEAD', head.target, force=True)
+
+    return fork_obj
+
+
+def dissociate_repo(repopath):
+    ''' Copy in the specified git repository all the objects it shares
+    with other git repositories via git alternates, and stop sharing them.
+    To be done before deleting a git repository other ones borrow objects
+    from.
+
+    :arg repopath: the path to the git repository
+    :return: a boolean specifying if the git repository used alternates
+
+    '''
+    alternates = os.path.join(repopath, ALTERNATES_FILE)
+    if not os.path.exists(alternates):
+        return False
+
+    # Without -l, the objects found via the alternates are packed as well
+    proc = subprocess.Popen(
+        ['git', 'repack', '-a', '-d', '-q'],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        cwd=repopath)
+    _, error = proc.communicate()
+    if proc.returncode:
         raise pagure.exceptions.PagureException(
-            'Commit could not be done: %s' % err)
+            'Could not repack the git repository %s: %s' % (repopath, error))
+    os.unlink(alternates)
+    return True
 
-    # Remove the clone
-    shutil.rmtree(newpath)
 
-    return os.path.join('files', filename)
+def _get_folder_size(path):
+    ''' Return the number of bytes used by the files in the given folder.
+    '''
+    size = 0
+    for root, _, files in os.walk(path):
+        for filename in files:
+            size += os.path.getsize(os.path.join(root, filename))
+    return size
+
+
+def get_disk_usage(repopath):
+    ''' Return the disk space used by the objects of the specified git
+    repository and the one saved by sharing objects via git alternates.
+
+    :arg repopath: the path to the git repository
+    :return: a dictionary with the number of bytes used by the objects
+        stored in the repository (``own``) and by the objects it borrows
+        from other repositories (``shared``)
+
+    '''
+    output = {
+        'own': _get_folder_size(os.path.join(repopath, 'objects')),
+        'shared': 0,
+    }
+    alternates = os.path.join(repopath, ALTERNATES_FILE)
+    if os.path.exists(alternates):
+        with open(alternates) as stream:
+            for line in stream:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    output['shared'] += _get_folder_size(
+                        os.path.join(repopath, 'objects', line))
+    return output
 
 
 def read_output(cmd, abspath, input=None, keepends=False, **kw):
@@ -888,6 +1548,130 @@ def get_default_branch(abspath):
         return 'master'
 
 
+def _is_ancestor(repo_obj, ancestor, commitid):
+    """ Returns whether the commit ``ancestor`` is reachable from the commit
+    ``commitid``, both given by their hash.
+    """
+    if ancestor == commitid:
+        return True
+    if hasattr(repo_obj, 'descendant_of'):
+        return repo_obj.descendant_of(commitid, ancestor)
+    # Version of pygit2 -0.21.4 -- F21/EL7
+    base = repo_obj.merge_base(commitid, ancestor)
+    return base is not None and base.hex == ancestor
+
+
+class BranchesReachability(object):
+    """ Answers which branches of a git repository contain some commits.
+
+    The tips of the branches are read once. When asking about many
+    commits, for each branch, the commits it has that the default branch
+    does not have, and the ones the default branch has that it does not
+    have, are walked once and kept. Since branches rarely diverge much from
+    the default branch, this is much cheaper than walking the history of
+    every branch, and each commit then only costs a few set lookups per
+    branch. When asking about a few commits, they are looked for from the
+    tip of each branch instead.
+
+    The answers reflect the branches as they were when the object was
+    created, so it should not be kept across pushes.
+
+    """
+
+    # Number of commits asked about from which walking the differences of
+    # the branches with the default branch is cheaper than looking for each
+    # commit from the tip of every branch
+    walk_threshold = 10
+
+    def __init__(self, repo_obj):
+        """ Constructor.
+
+        :arg repo_obj: the pygit2 repository whose branches to look at
+
+        """
+        self.repo_obj = repo_obj
+        self.tips = {}
+        for branchname in repo_obj.listall_branches():
+            branch = repo_obj.lookup_branch(branchname)
+            self.tips[branchname] = branch.get_object().hex
+
+        self.default = None
+        if not repo_obj.is_empty and not repo_obj.head_is_unborn \
+                and repo_obj.head.shorthand in self.tips:
+            self.default = repo_obj.head.shorthand
+        self._ahead = {}
+        self._behind = {}
+
+    def _walk(self, tip, hidden):
+        """ Returns the hashes of the commits reachable from ``tip`` but
+        not from ``hidden``.
+        """
+        walker = self.repo_obj.walk(tip, pygit2.GIT_SORT_NONE)
+        walker.hide(hidden)
+        return set(commit.oid.hex for commit in walker)
+
+    def _get_ahead(self, branchname):
+        """ Returns the commits of the specified branch which are not in the
+        default branch.
+        """
+        if branchname not in self._ahead:
+            self._ahead[branchname] = self._walk(
+                self.tips[branchname], self.tips[self.default])
+        return self._ahead[branchname]
+
+    def _get_behind(self, branchname):
+        """ Returns the commits of the default branch which are not in the
+        specified branch.
+        """
+        if branchname not in self._behind:
+            self._behind[branchname] = self._walk(
+                self.tips[self.default], self.tips[branchname])
+        return self._behind[branchname]
+
+    def in_branch(self, commitid, branchname):
+        """ Returns whether the specified branch contains the specified
+        commit, False if there is no such branch.
+        """
+        if branchname not in self.tips:
+            return False
+        return _is_ancestor(self.repo_obj, commitid, self.tips[branchname])
+
+    def get_branches(self, commitids):
+        """ Returns the branches containing each of the specified commits.
+
+        :arg commitids: the list of the hashes of the commits to look for
+        :return: a dictionary associating to the hash of each commit the
+            sorted list of the names of the branches containing it
+
+        """
+        walk = self.default is not None \
+            and len(commitids) >= self.walk_threshold
+        output = {}
+        for commitid in commitids:
+            branches = []
+            if not walk:
+                for branchname in self.tips:
+                    if self.in_branch(commitid, branchname):
+                        branches.append(branchname)
+            else:
+                in_default = self.in_branch(commitid, self.default)
+                for branchname in self.tips:
+                    if branchname == self.default:
+                        if in_default:
+                            branches.append(branchname)
+                        continue
+                    # The commits of the default branch are in the other
+                    # branches unless they are behind, the other commits
+                    # only if they are ahead
+                    if in_default:
+                        if commitid not in self._get_behind(branchname):
+                            branches.append(branchname)
+                    elif commitid in self._get_ahead(branchname):
+                        branches.append(branchname)
+            output[commitid] = sorted(branches)
+        return output
+
+
 def get_author(commit, abspath):
     ''' Return the name of the person that authored the commit. '''
     user = pagure.lib.git.read_git_lines(
@@ -941,11 +1725,205 @@ def get_branch_ref(repo, branchname):
 def merge_pull_request(
         session, request, username, request_folder, domerge=True):
     ''' Merge the specified pull-request.
+
+    The merge is done directly in the bare git repository of the project if
+    the ``MERGE_IN_BARE_REPO`` configuration key is set and pygit2 is
+    recent enough to merge commits in memory, otherwise it is done in a
+    clone of the git repository.
+
+    :arg session: the session to connect to the database with
+    :arg request: the pull-request to merge
+    :arg username: the name of the user merging the pull-request
+    :arg request_folder: the folder where the git repos of the requests are
+    :kwarg domerge: if False, only check if the pull-request can be merged
+        and store the result in its ``merge_status``
+    :return: a message saying the changes were merged or, if ``domerge`` is
+        False, one of ``NO_CHANGE``, ``FFORWARD``, ``MERGE`` or
+        ``CONFLICTS``
+
+    '''
+    if pagure.APP.config.get('MERGE_IN_BARE_REPO', True) \
+            and hasattr(PagureRepo, 'merge_commits'):
+        merge = _merge_pull_request_in_bare_repo
+    else:
+        merge = _merge_pull_request_in_clone
+    return merge(
+        session, request, username, request_folder, domerge=domerge)
+
+
+def _merge_pull_request_in_bare_repo(
+        session, request, username, request_folder, domerge=True):
+    ''' Merge the specified pull-request in the bare git repository of its
+    project, without cloning it.
+
+    The commits of the pull-request are fetched in a temporary reference of
+    the git repository, the merge is done in memory and the branch is then
+    updated only if it did not move in between.
+    '''
+    if request.remote:
+        # Get the fork
+        repopath = pagure.get_remote_repo_path(
+            request.remote_git, request.branch_from, fresh=domerge)
+    else:
+        # Get the fork
+        repopath = pagure.get_repo_path(request.project_from)
+
+    fork_obj = PagureRepo(repopath)
+
+    # Get the original repo
+    parentpath = pagure.get_repo_path(request.project)
+    parent_obj = PagureRepo(parentpath)
+
+    # Update the start and stop commits in the DB, one last time
+    diff_commits = diff_pull_request(
+        session, request, fork_obj, parent_obj,
+        requestfolder=request_folder, with_diff=False)[0]
+
+    if request.project.settings.get(
+            'Enforce_signed-off_commits_in_pull-request', False):
+        for commit in diff_commits:
+            if 'signed-off-by' not in commit.message.lower():
+                raise pagure.exceptions.PagureException(
+                    'This repo enforces that all commits are '
+                    'signed off by their author. ')
+
+    if request.branch not in parent_obj.listall_branches():
+        raise pagure.exceptions.BranchNotFoundException(
+            'Branch %s could not be found in the repo %s' % (
+                request.branch, request.project.fullname
+            ))
+    refname = 'refs/heads/%s' % request.branch
+    head = parent_obj[parent_obj.lookup_reference(refname).target]
+
+    branch = get_branch_ref(fork_obj, request.branch_from)
+    if not branch:
+        raise pagure.exceptions.BranchNotFoundException(
+            'Branch %s could not be found in the repo %s' % (
+                request.branch_from, request.project_from.fullname
+                if request.project_from else request.remote_git
+            ))
+
+    # Make the commits of the pull-request available in the repo, this is
+    # only needed when they are not already in it. The reference is unique
+    # to this call as the pull-request may be checked concurrently.
+    tmpref = None
+    try:
+        if branch.target not in parent_obj:
+            tmpref = 'refs/pagure/merge/%s-%s-%s' % (
+                request.uid, os.getpid(), threading.current_thread().ident)
+            proc = subprocess.Popen(
+                ['git', 'fetch', '--quiet', repopath,
+                 '+%s:%s' % (branch.name, tmpref)],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                cwd=parentpath)
+            _, error = proc.communicate()
+            if proc.returncode:
+                raise pagure.exceptions.PagureException(
+                    'Could not fetch the changes of the pull-request: %s'
+                    % error)
+
+        repo_commit = parent_obj[branch.target]
+
+        if repo_commit.oid == head.oid \
+                or parent_obj.descendant_of(head.oid, repo_commit.oid):
+            if domerge:
+                pagure.lib.close_pull_request(
+                    session, request, username,
+                    requestfolder=request_folder)
+                try:
+                    session.commit()
+                except SQLAlchemyError as err:  # pragma: no cover
+                    session.rollback()
+                    pagure.APP.logger.exception(err)
+                    raise pagure.exceptions.PagureException(
+                        'Could not close this pull-request')
+                raise pagure.exceptions.PagureException(
+                    'Nothing to do, changes were already merged')
+            else:
+                request.merge_status = 'NO_CHANGE'
+                session.commit()
+                return 'NO_CHANGE'
+
+        elif parent_obj.descendant_of(repo_commit.oid, head.oid):
+            if not domerge:
+                request.merge_status = 'FFORWARD'
+                session.commit()
+                return 'FFORWARD'
+            new_oid = repo_commit.oid
+            tree = repo_commit.tree.oid
+            merge_commit = request.project.settings.get(
+                'always_merge', False)
+
+        else:
+            index = parent_obj.merge_commits(head, repo_commit)
+            if index.conflicts is not None:
+                if domerge:
+                    raise pagure.exceptions.PagureException(
+                        'Merge conflicts!')
+                else:
+                    request.merge_status = 'CONFLICTS'
+                    session.commit()
+                    return 'CONFLICTS'
+            if not domerge:
+                request.merge_status = 'MERGE'
+                session.commit()
+                return 'MERGE'
+            tree = index.write_tree(parent_obj)
+            merge_commit = True
+
+        if merge_commit:
+            user_obj = pagure.lib.__get_user(session, username)
+            author = pygit2.Signature(
+                user_obj.fullname.encode('utf-8'),
+                user_obj.default_email.encode('utf-8'))
+            new_oid = parent_obj.create_commit(
+                None,
+                author,
+                author,
+                'Merge #%s `%s`' % (request.id, request.title),
+                tree,
+                [head.hex, repo_commit.oid.hex])
+
+        if not _update_ref(parent_obj, refname, head.oid, new_oid):
+            raise pagure.exceptions.PagureException(
+                'The branch %s was updated in the meantime, please try '
+                'again' % request.branch)
+    finally:
+        if tmpref:
+            try:
+                parent_obj.lookup_reference(tmpref).delete()
+            except KeyError:
+                # The fetch failed before creating the reference
+                pass
+
+    # Update status
+    pagure.lib.close_pull_request(
+        session, request, username,
+        requestfolder=request_folder,
+    )
+    try:
+        # Reset the merge_status of all opened PR to refresh their cache
+        pagure.lib.reset_status_pull_request(session, request.project)
+        session.commit()
+    except SQLAlchemyError as err:  # pragma: no cover
+        session.rollback()
+        pagure.APP.logger.exception(err)
+        raise pagure.exceptions.PagureException(
+            'Could not update this pull-request in the database')
+
+    return 'Changes merged!'
+
+
+def _merge_pull_request_in_clone(
+        session, request, username, request_folder, domerge=True):
+    ''' Merge the specified pull-request in a clone of the git repository
+    of its project.
     '''
     if request.remote:
         # Get the fork
         repopath = pagure.get_remote_repo_path(
-            request.remote_git, request.branch_from)
+            request.remote_git, request.branch_from, fresh=domerge)
     else:
         # Get the fork
         repopath = pagure.get_repo_path(request.project_from)
@@ -1125,6 +2103,170 @@ def merge_pull_request(
     return 'Changes merged!'
 
 
+class MergeabilityWorker(object):
+    """ A pool of threads recomputing, in the background, the merge status
+    of pull-requests so that their pages find it already cached.
+
+    A pull-request is only queued once at a time, queuing it again while it
+    is waiting is a no-op.
+
+    """
+
+    def __init__(self, workers=2):
+        """ Constructor.
+
+        :kwarg workers: the maximum number of pull-requests checked at the
+            same time, if 0 nothing is recomputed in the background and
+            the merge status is computed when the pull-request is viewed
+
+        """
+        self.workers = workers
+        self._queue = Queue.Queue()
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def add(self, request_uids):
+        """ Queue the specified pull-requests to have their merge status
+        recomputed.
+
+        :arg request_uids: the unique identifiers of the pull-requests
+
+        """
+        if not self.workers:
+            return
+
+        with self._lock:
+            for request_uid in request_uids:
+                if request_uid in self._pending:
+                    continue
+                self._pending.add(request_uid)
+                self._queue.put(request_uid)
+            while len(self._threads) < min(self.workers, len(self._pending)):
+                thread = threading.Thread(target=self._run)
+                thread.daemon = True
+                thread.start()
+                self._threads.append(thread)
+
+    def join(self):
+        """ Wait for all the pull-requests queued to be checked. """
+        self._queue.join()
+
+    def _run(self):
+        """ Check the pull-requests queued, with the session of this thread.
+        """
+        session = pagure.SESSION
+        while True:
+            request_uid = self._queue.get()
+            # A change made from now on requires a new check
+            with self._lock:
+                self._pending.discard(request_uid)
+            # We catch Exception if we want :-p
+            # pylint: disable=W0703
+            try:
+                self._refresh(session, request_uid)
+            except Exception as err:
+                session.rollback()
+                pagure.LOG.exception(
+                    'Could not check if the pull-request %s can be '
+                    'merged: %s', request_uid, err)
+            finally:
+                session.remove()
+                self._queue.task_done()
+
+    def _refresh(self, session, request_uid):
+        """ Recompute the merge status of the specified pull-request if it
+        is still open and its status is unknown.
+        """
+        request = pagure.lib.get_request_by_uid(session, request_uid)
+        if request is None or request.status != 'Open' \
+                or request.merge_status:
+            return
+        merge_pull_request(
+            session, request, request.user.username,
+            pagure.APP.config['REQUESTS_FOLDER'], domerge=False)
+
+
+MERGEABILITY_WORKER = MergeabilityWorker(
+    workers=pagure.APP.config.get('MERGEABILITY_WORKERS', 2))
+
+
+def refresh_merge_status_detached(request_uids):
+    """ Recompute the merge status of the specified pull-requests in a
+    process detached from the current one, which does not wait for it, e.g.
+    a git hook.
+
+    :arg request_uids: the unique identifiers of the pull-requests
+
+    """
+    if not request_uids or not MERGEABILITY_WORKER.workers:
+        return
+
+    # The detached process must not share the pending writes nor the
+    # connections to the database of this one
+    WRITE_QUEUE.flush()
+    pagure.SESSION.remove()
+    pagure.SESSION.bind.dispose()
+
+    pid = os.fork()
+    if pid:
+        # The intermediate process exits as soon as the worker is started
+        os.waitpid(pid, 0)
+        return
+
+    # We catch Exception if we want :-p
+    # pylint: disable=W0703
+    try:
+        os.setsid()
+        if os.fork():
+            os._exit(0)
+        devnull = os.open(os.devnull, os.O_RDWR)
+        for fd in range(3):
+            os.dup2(devnull, fd)
+
+        worker = MergeabilityWorker(workers=MERGEABILITY_WORKER.workers)
+        worker.add(request_uids)
+        worker.join()
+    except Exception as err:
+        pagure.LOG.exception(
+            'Could not check if the pull-requests can be merged: %s', err)
+    finally:
+        os._exit(0)
+
+
+def refresh_merge_status(session, project, branches, recompute=True):
+    """ Reset the merge status of the open pull-requests affected by a
+    change of the specified branches of the given project, either as their
+    source or as their target, and have it recomputed in the background.
+
+    :arg session: the session to connect to the database with
+    :arg project: the Project object from the database
+    :arg branches: the names of the branches that changed
+    :kwarg recompute: whether to have the merge status recomputed by the
+        threads of ``MERGEABILITY_WORKER``, if not it is up to the caller
+    :return: the list of pull-requests whose merge status was reset
+
+    """
+    requests = []
+    for request in pagure.lib.search_pull_requests(
+            session, project_id=project.id, status='Open'):
+        if request.branch in branches:
+            requests.append(request)
+    for request in pagure.lib.search_pull_requests(
+            session, project_id_from=project.id, status='Open'):
+        if request.branch_from in branches and request not in requests:
+            requests.append(request)
+
+    for request in requests:
+        request.merge_status = None
+        session.add(request)
+    session.commit()
+
+    if recompute:
+        MERGEABILITY_WORKER.add([request.uid for request in requests])
+    return requests
+
+
 def diff_pull_request(
         session, request, repo_obj, orig_repo, requestfolder,
         with_diff=True):
@@ -1141,16 +2283,12 @@ def diff_pull_request(
 
     if not repo_obj.is_empty and not orig_repo.is_empty:
         # Pull-request open
-        master_commits = [
-            commit.oid.hex
-            for commit in orig_repo.walk(
-                orig_repo.lookup_branch(request.branch).get_object().hex,
-                pygit2.GIT_SORT_TIME)
-        ]
-        for commit in repo_obj.walk(commitid, pygit2.GIT_SORT_TIME):
-            if request.status and commit.oid.hex in master_commits:
-                break
-            diff_commits.append(commit)
+        orig_commitid = None
+        if request.status:
+            orig_commitid = orig_repo.lookup_branch(
+                request.branch).get_object().hex
+        diff_commits = get_diff_commits(
+            repo_obj, commitid, orig_repo, orig_commitid)
 
         if request.status and diff_commits:
             first_commit = repo_obj[diff_commits[-1].oid.hex]
@@ -1199,8 +2337,7 @@ def diff_pull_request(
             )
 
     elif orig_repo.is_empty and not repo_obj.is_empty:
-        for commit in repo_obj.walk(commitid, pygit2.GIT_SORT_TIME):
-            diff_commits.append(commit)
+        diff_commits = get_diff_commits(repo_obj, commitid)
         if request.status and diff_commits:
             first_commit = repo_obj[diff_commits[-1].oid.hex]
             # Check if we can still rely on the merge_status
@@ -1225,6 +2362,402 @@ def diff_pull_request(
     return (diff_commits, diff)
 
 
+def get_commits_boundary(repo_obj, orig_repo, orig_commitid):
+    """ Returns the list of commits of ``orig_repo`` reachable from
+    ``orig_commitid`` which are also present in ``repo_obj`` and whose
+    descendants (in ``orig_repo``) are not.
+
+    Hiding these commits when walking ``repo_obj`` hides the entire history
+    of ``orig_commitid`` while only visiting the commits of ``orig_repo``
+    that are unknown to ``repo_obj``. When both repositories are the same,
+    or when ``orig_commitid`` is already present in ``repo_obj``, this is
+    simply ``[orig_commitid]``.
+
+    """
+    boundary = []
+    if orig_commitid is None or orig_repo is None:
+        return boundary
+
+    seen = set()
+    to_visit = [orig_repo[orig_commitid]]
+    while to_visit:
+        commit = to_visit.pop()
+        if commit.oid.hex in seen:
+            continue
+        seen.add(commit.oid.hex)
+        if commit.oid.hex in repo_obj:
+            boundary.append(commit.oid.hex)
+        else:
+            to_visit.extend(commit.parents)
+
+    return boundary
+
+
+def get_diff_commits(
+        repo_obj, commitid, orig_repo=None, orig_commitid=None,
+        boundary=None):
+    """ Returns the list of commits reachable from ``commitid`` in
+    ``repo_obj`` but not from ``orig_commitid`` in ``orig_repo``, the most
+    recent commit first.
+
+    Instead of loading the entire history of ``orig_repo`` in memory, the
+    history of ``orig_commitid`` is hidden from the walk done on
+    ``repo_obj``, so the cost is proportional to the number of commits that
+    differ between the two repositories.
+
+    :arg repo_obj: the pygit2 repository in which ``commitid`` lives
+    :arg commitid: the hash of the commit at which to start the walk
+    :kwarg orig_repo: the pygit2 repository to compare against, defaults to
+        ``repo_obj``
+    :kwarg orig_commitid: the hash of the commit whose history should be
+        excluded, if None all the history of ``commitid`` is returned
+    :kwarg boundary: the list of commits to hide as returned by
+        ``get_commits_boundary``, allows to re-use it when comparing
+        several commits against the same ``orig_commitid``
+
+    """
+    if orig_repo is None:
+        orig_repo = repo_obj
+
+    if boundary is None:
+        boundary = get_commits_boundary(repo_obj, orig_repo, orig_commitid)
+
+    walker = repo_obj.walk(commitid, pygit2.GIT_SORT_TIME)
+    for oid in boundary:
+        walker.hide(oid)
+
+    return [commit for commit in walker]
+
+
+def get_commit_diff(repo_obj, commit):
+    """ Returns the diff of the given commit against its first parent, or
+    against an empty tree if it is the first commit of the repository.
+    """
+    if commit.parents:
+        return repo_obj.diff(commit.parents[0], commit)
+    # First commit in the repo
+    return commit.tree.diff_to_tree(swap=True)
+
+
+def get_pull_request_diff(repo_obj, request):
+    """ Returns the diff between the first and the last commits of the
+    given pull-request, as recorded in the database, or None if they are
+    not known or are no longer in ``repo_obj``.
+
+    Contrary to ``diff_pull_request``, this does not walk the history of
+    the repositories nor update the pull-request, so it is cheap enough to
+    be called for every file of the diff displayed.
+
+    """
+    if not request.commit_start or not request.commit_stop:
+        return None
+
+    try:
+        first_commit = repo_obj[request.commit_start]
+        last_commit = repo_obj[request.commit_stop]
+    except (KeyError, ValueError):
+        return None
+
+    if first_commit.parents:
+        diff = repo_obj.diff(first_commit.parents[0], last_commit)
+    else:
+        diff = last_commit.tree.diff_to_tree(swap=True)
+    diff.find_similar()
+    return diff
+
+
+def get_patch_info(patch):
+    """ Returns a dictionary describing the file changed in the given patch
+    of a diff: its old and new paths and blob identifiers, its status (A, D,
+    M or R), the number of lines added and removed and whether it is a
+    binary file.
+    """
+    if hasattr(patch, 'new_file_path'):
+        # Version of pygit2 -0.21.4 -- F21/EL7
+        old_path = patch.old_file_path
+        new_path = patch.new_file_path
+        status = patch.status
+        additions = patch.additions
+        deletions = patch.deletions
+        binary = patch.is_binary
+    else:
+        # Version of pygit2 -0.23.0 -- F23
+        delta = patch.delta
+        old_path = delta.old_file.path
+        new_path = delta.new_file.path
+        if hasattr(delta, 'status_char'):
+            status = delta.status_char()
+        else:
+            status = delta.status
+        _, additions, deletions = patch.line_stats
+        binary = delta.is_binary
+
+    if old_path != new_path:
+        status = 'R'
+
+    if hasattr(patch, 'new_id'):
+        old_id, new_id = patch.old_id, patch.new_id
+    elif hasattr(patch, 'delta'):
+        old_id, new_id = patch.delta.old_file.id, patch.delta.new_file.id
+    else:
+        old_id, new_id = patch.old_oid, patch.new_oid
+
+    return {
+        'old_path': old_path,
+        'new_path': new_path,
+        'old_id': '%s' % old_id,
+        'new_id': '%s' % new_id,
+        'status': status,
+        'lines_added': additions,
+        'lines_removed': deletions,
+        'binary': bool(binary),
+    }
+
+
+def get_diff_stats(diff):
+    """ Returns the list of the files changed in the given diff, as
+    returned by ``get_patch_info``, with their position in the diff
+    (starting at 1) under the ``fileid`` key.
+    """
+    output = []
+    for fileid, patch in enumerate(diff, 1):
+        info = get_patch_info(patch)
+        info['fileid'] = fileid
+        output.append(info)
+    return output
+
+
+def get_commit_diff_stats(repo_obj, commit, diff=None):
+    """ Returns the list of the files changed by the given commit, as
+    returned by ``get_diff_stats`` for ``get_commit_diff``, caching it
+    by the identifiers of the commit and of its parent.
+
+    :arg repo_obj: the pygit2 repository containing the commit
+    :arg commit: the pygit2 commit whose changes to list
+    :kwarg diff: the diff of the commit, as returned by
+        ``get_commit_diff``, if it was already computed
+    :return: the list of the files changed
+
+    """
+    base = commit.parents[0].oid.hex if commit.parents else None
+    stats = pagure.lib.cache.get_diff_stats(base, commit.oid.hex, [])
+    if stats is None:
+        if diff is None:
+            diff = get_commit_diff(repo_obj, commit)
+        stats = get_diff_stats(diff)
+        pagure.lib.cache.set_diff_stats(base, commit.oid.hex, [], stats)
+    return stats
+
+
+def get_pull_request_diff_stats(request, repo_obj=None, diff=None):
+    """ Returns the list of the files changed by the given pull-request, as
+    returned by ``get_diff_stats`` for ``get_pull_request_diff``, caching
+    it by the identifiers of the first and last commits of the
+    pull-request.
+
+    :arg request: the pull-request whose changes to list
+    :kwarg repo_obj: the pygit2 repository containing the commits of the
+        pull-request, if None only the cached list is returned
+    :kwarg diff: the diff of the pull-request, as returned by
+        ``get_pull_request_diff``, if it was already computed
+    :return: the list of the files changed or None if it is unknown
+
+    """
+    if not request.commit_start or not request.commit_stop:
+        return None
+
+    # The diff starts at the parent of the first commit, with the renames
+    options = ['include_start', 'find_similar']
+    stats = pagure.lib.cache.get_diff_stats(
+        request.commit_start, request.commit_stop, options)
+    if stats is None and (repo_obj is not None or diff is not None):
+        if diff is None:
+            diff = get_pull_request_diff(repo_obj, request)
+        if diff is not None:
+            stats = get_diff_stats(diff)
+            pagure.lib.cache.set_diff_stats(
+                request.commit_start, request.commit_stop, options, stats)
+    return stats
+
+
+def summarize_diff_stats(stats):
+    """ Returns the number of files changed and the total number of lines
+    added and removed in the given list of files changed, as returned by
+    ``get_diff_stats``.
+    """
+    return {
+        'files': len(stats),
+        'lines_added': sum(info['lines_added'] for info in stats),
+        'lines_removed': sum(info['lines_removed'] for info in stats),
+    }
+
+
+def get_diff_file(diff, fileid):
+    """ Returns the patch of the file at the given position (starting at 1)
+    in the diff or None if there is no such file.
+    """
+    if diff is None or fileid < 1 or fileid > len(diff):
+        return None
+    return diff[fileid - 1]
+
+
+def patch_to_text(patch):
+    """ Returns the hunks of the given patch of a diff, in the unified diff
+    format.
+    """
+    content = []
+    for hunk in patch.hunks:
+        content.append("@@ -%i,%i +%i,%i @@\n" % (
+            hunk.old_start, hunk.old_lines, hunk.new_start, hunk.new_lines))
+        for line in hunk.lines:
+            if hasattr(line, 'content'):
+                origin = line.origin
+                if line.origin in ['<', '>', '=']:
+                    origin = ''
+                content.append(origin + ' ' + line.content)
+            else:
+                # Avoid situation where at the end of a file we get:
+                # + foo<
+                # \ No newline at end of file
+                if line[0] in ['<', '>', '=']:
+                    line = ('', line[1])
+                content.append(' '.join(line))
+
+    return ''.join(content)
+
+
+def is_diff_file_truncated(info, fileid):
+    """ Returns whether the diff of the file described by ``info`` (as
+    returned by ``get_patch_info``), at the given position in the diff, is
+    too large to be rendered with the rest of the page and should only be
+    loaded on demand.
+    """
+    if fileid > pagure.APP.config.get('MAX_DIFF_FILES_RENDERED', 50):
+        return True
+    return info['lines_added'] + info['lines_removed'] > \
+        pagure.APP.config.get('MAX_DIFF_LINES_RENDERED', 1000)
+
+
+def _get_repo_cache(repo_obj, name, filename):
+    """ Returns the cache of the given name of the specified git repository,
+    either from redis or from the file of the given name stored in the git
+    repository itself.
+    """
+    data = None
+    if pagure.lib.REDIS:
+        data = pagure.lib.REDIS.get(
+            'pagure.%s.%s' % (name, repo_obj.path))
+    else:
+        cachefile = os.path.join(repo_obj.path, filename)
+        if os.path.exists(cachefile):
+            with open(cachefile) as stream:
+                data = stream.read()
+
+    cache = {}
+    if data:
+        try:
+            cache = json.loads(data)
+        except ValueError:
+            pass
+    return cache
+
+
+def _set_repo_cache(repo_obj, name, filename, cache):
+    """ Store the cache of the given name of the specified git repository,
+    either in redis or in the file of the given name stored in the git
+    repository itself.
+    """
+    data = json.dumps(cache)
+    if pagure.lib.REDIS:
+        pagure.lib.REDIS.set(
+            'pagure.%s.%s' % (name, repo_obj.path), data)
+    else:
+        cachefile = os.path.join(repo_obj.path, filename)
+        tmpfile = '%s.%s' % (cachefile, os.getpid())
+        try:
+            with open(tmpfile, 'w') as stream:
+                stream.write(data)
+            os.rename(tmpfile, cachefile)
+        except (OSError, IOError) as err:  # pragma: no cover
+            pagure.LOG.debug(
+                'Could not write the %s cache: %s', name, err)
+
+
+def _get_commits_count_cache(repo_obj):
+    """ Returns the cache of the number of commits of the branches of the
+    specified git repository, either from redis or from the file stored
+    in the git repository itself.
+    """
+    return _get_repo_cache(repo_obj, 'commits_count', COMMITS_COUNT_FILE)
+
+
+def _set_commits_count_cache(repo_obj, cache):
+    """ Store the cache of the number of commits of the branches of the
+    specified git repository, either in redis or in a file stored in the
+    git repository itself.
+    """
+    _set_repo_cache(repo_obj, 'commits_count', COMMITS_COUNT_FILE, cache)
+
+
+def get_commits_count(repo_obj, branchname, full_walk=True):
+    """ Returns the number of commits in the specified branch of the given
+    git repository.
+
+    The result is cached using the commit at the tip of the branch, if the
+    branch moved forward since, only the new commits are counted.
+
+    :arg repo_obj: the pygit2 repository
+    :arg branchname: the name of the branch to count the commits of
+    :kwarg full_walk: a boolean specifying whether to walk the entire
+        history of the branch if nothing useful is found in the cache, if
+        False ``None`` is returned instead
+
+    """
+    branch = repo_obj.lookup_branch(branchname)
+    if not branch:
+        return None
+    commitid = branch.get_object().hex
+
+    cache = _get_commits_count_cache(repo_obj)
+    entry = cache.get(branchname)
+    if entry and entry['oid'] == commitid:
+        return entry['count']
+
+    walker = repo_obj.walk(commitid, pygit2.GIT_SORT_NONE)
+    count = 0
+    if entry and entry['oid'] in repo_obj \
+            and repo_obj.descendant_of(commitid, entry['oid']):
+        # The branch moved forward, only count the new commits
+        walker.hide(entry['oid'])
+        count = entry['count']
+    elif not full_walk:
+        return None
+
+    for _ in walker:
+        count += 1
+
+    branches = repo_obj.listall_branches()
+    cache = dict(
+        (key, value) for key, value in cache.items() if key in branches)
+    cache[branchname] = {'oid': commitid, 'count': count}
+    _set_commits_count_cache(repo_obj, cache)
+
+    return count
+
+
+def refresh_commits_count(abspath, refname):
+    """ Refresh the cache of the number of commits of the branch pushed to
+    the git repository at the specified location.
+    Meant to be called from the post-receive hook.
+    """
+    if not refname.startswith('refs/heads/'):
+        return
+    repo_obj = PagureRepo(abspath)
+    branchname = refname.split('refs/heads/', 1)[1]
+    if branchname in repo_obj.listall_branches():
+        get_commits_count(repo_obj, branchname)
+
+
 def get_git_tags(project):
     """ Returns the list of tags created in the git repositorie of the
     specified project.
@@ -1241,44 +2774,93 @@ def get_git_tags(project):
     return tags
 
 
+def _index_tag(repo_obj, refname, oid):
+    """ Returns the information about the specified tag stored in the tag
+    index of its git repository.
+    """
+    theobject = repo_obj[oid]
+    entry = {
+        "oid": oid.hex,
+        "target": oid.hex,
+        "tagname": refname.replace("refs/tags/", "", 1),
+        "date": 0,
+        "objecttype": "",
+        "head_msg": None,
+        "body_msg": None,
+    }
+    if isinstance(theobject, pygit2.Tag):
+        entry["objecttype"] = "tag"
+        head_msg, _, body_msg = theobject.message.partition('\n')
+        if body_msg.strip().endswith('\n-----END PGP SIGNATURE-----'):
+            body_msg = body_msg.rsplit(
+                '-----BEGIN PGP SIGNATURE-----', 1)[0].strip()
+        entry["head_msg"] = head_msg
+        entry["body_msg"] = body_msg
+        # Peel the tag, it may point to another tag
+        while isinstance(theobject, pygit2.Tag):
+            theobject = theobject.get_object()
+    elif isinstance(theobject, pygit2.Commit):
+        entry["objecttype"] = "commit"
+
+    entry["target"] = theobject.hex
+    if isinstance(theobject, pygit2.Commit):
+        entry["date"] = theobject.commit_time
+    return entry
+
+
+def get_tags_index(repo_obj):
+    """ Returns the information about all the tags of the specified git
+    repository, most recently committed first.
+
+    The information is cached in an index, only the tags added or moved
+    since it was last updated are read from the git repository.
+
+    :arg repo_obj: the pygit2 repository
+    :return: a list of dictionaries with the name of the tag (``tagname``),
+        the identifier of the object the tag points to (``oid``) and of the
+        object it finally resolves to (``target``), the time of that commit
+        (``date``), the type of tag (``objecttype``: ``tag`` for annotated
+        tags, ``commit`` for lightweight ones) and the first line and the
+        rest of the message of annotated tags (``head_msg``, ``body_msg``)
+
+    """
+    index = _get_repo_cache(repo_obj, 'tags_index', TAGS_INDEX_FILE)
+
+    new_index = {}
+    for refname in repo_obj.listall_references():
+        if not refname.startswith('refs/tags/'):
+            continue
+        oid = repo_obj.lookup_reference(refname).resolve().target
+        entry = index.get(refname)
+        if entry is None or entry['oid'] != oid.hex:
+            entry = _index_tag(repo_obj, refname, oid)
+        new_index[refname] = entry
+
+    if new_index != index:
+        _set_repo_cache(repo_obj, 'tags_index', TAGS_INDEX_FILE, new_index)
+
+    # Tags of the same commit, or committed at the same time, are sorted
+    # by name
+    return sorted(
+        new_index.values(),
+        key=lambda tag: (tag['date'], tag['tagname']),
+        reverse=True)
+
+
+def refresh_tags_index(abspath, refname):
+    """ Refresh the index of the tags of the git repository at the specified
+    location if a tag was pushed.
+    Meant to be called from the post-receive hook.
+    """
+    if refname.startswith('refs/tags/'):
+        get_tags_index(PagureRepo(abspath))
+
+
 def get_git_tags_objects(project):
-    """ Returns the list of references of the tags created in the git
-    repositorie the specified project.
-    The list is sorted using the time of the commit associated to the tag """
+    """ Returns the list of the information about the tags created in the
+    git repository of the specified project, see ``get_tags_index``.
+    The list is sorted using the time of the commit associated to the tag,
+    most recent first. """
     repopath = pagure.get_repo_path(project)
     repo_obj = PagureRepo(repopath)
-    tags = {}
-    for tag in repo_obj.listall_references():
-        if 'refs/tags/' in tag and repo_obj.lookup_reference(tag):
-            commit_time = ""
-            theobject = repo_obj[repo_obj.lookup_reference(tag).target]
-            objecttype = ""
-            if isinstance(theobject, pygit2.Tag):
-                commit_time = theobject.get_object().commit_time
-                objecttype = "tag"
-            elif isinstance(theobject, pygit2.Commit):
-                commit_time = theobject.commit_time
-                objecttype = "commit"
-
-            tags[commit_time] = {
-                "object": repo_obj[repo_obj.lookup_reference(tag).target],
-                "tagname": tag.replace("refs/tags/",""),
-                "date": commit_time,
-                "objecttype": objecttype,
-                "head_msg": None,
-                "body_msg": None,
-            }
-            if objecttype == 'tag':
-                head_msg, _, body_msg = tags[commit_time][
-                    "object"].message.partition('\n')
-                if body_msg.strip().endswith('\n-----END PGP SIGNATURE-----'):
-                    body_msg = body_msg.rsplit(
-                        '-----BEGIN PGP SIGNATURE-----', 1)[0].strip()
-                tags[commit_time]["head_msg"] = head_msg
-                tags[commit_time]["body_msg"] = body_msg
-    sorted_tags = []
-
-    for tag in sorted(tags, reverse=True):
-        sorted_tags.append(tags[tag])
-
-    return sorted_tags
+    return get_tags_index(repo_obj)
@@ -12,6 +12,7 @@
 import re
 
 import pagure.exceptions
+import pagure.lib.model
 
 
 FIXES = [
@@ -30,6 +31,90 @@ RELATES = [
 ]
 
 
+def get_references(text, reftype='relates'):
+    ''' For a given text, searches using regex if the text contains
+    reference to another issue in this project or another one.
+
+    Returns the list of the issues (or pull-requests) referenced, possibly
+    empty, in the order they are found, as tuples of the name of their
+    project, None if the reference does not specify it, and of their
+    identifier.
+
+    The reference types are the same as for `get_relation`.
+
+    '''
+
+    regex = RELATES
+    if reftype == 'fixes':
+        regex = FIXES
+
+    references = []
+    for motif in regex:
+        match = motif.match(text)
+        if not match:
+            continue
+
+        project = None
+        if len(match.groups()) >= 2:
+            project = match.group(1)
+            relid = int(match.group(2))
+        else:
+            relid = int(match.group(1))
+
+        if (project, relid) not in references:
+            references.append((project, relid))
+
+    return references
+
+
+def is_project_reference(repo, reference):
+    ''' Returns whether the given reference, as returned by
+    `get_references`, is to an issue or a pull-request of the given
+    project. '''
+    project, _ = reference
+    return project is None or project == repo.name
+
+
+def get_relations(session, repo, references, include_prs=False):
+    ''' Returns the issues of the given project referenced, as returned by
+    `get_references`, retrieved in a single query, as a dictionary
+    associating them to their identifier.
+
+    The references to other projects are ignored.
+    If include_prs=True, the identifiers not matching an issue are looked
+    for in the pull-requests of the project.
+
+    '''
+    relids = set(
+        relid for (project, relid) in references
+        if is_project_reference(repo, (project, relid)))
+    if not relids:
+        return {}
+
+    query = session.query(
+        pagure.lib.model.Issue
+    ).filter(
+        pagure.lib.model.Issue.project_id == repo.id
+    ).filter(
+        pagure.lib.model.Issue.id.in_(relids)
+    )
+    relations = dict((issue.id, issue) for issue in query.all())
+
+    missing = relids - set(relations)
+    if missing and include_prs:
+        query = session.query(
+            pagure.lib.model.PullRequest
+        ).filter(
+            pagure.lib.model.PullRequest.project_id == repo.id
+        ).filter(
+            pagure.lib.model.PullRequest.id.in_(missing)
+        )
+        for request in query.all():
+            relations[request.id] = request
+
+    return relations
+
+
 def get_relation(session, reponame, username, text, reftype='relates',
                  include_prs=False):
     ''' For a given text, searches using regex if the text contains
@@ -51,34 +136,17 @@ def get_relation(session, reponame, username, text, reftype='relates',
     if not repo:
         return []
 
-    regex = RELATES
-    if reftype == 'fixes':
-        regex = FIXES
-
-    relations = []
-    for motif in regex:
-        relid = None
-        project = None
-        if motif.match(text):
-            if len(motif.match(text).groups()) >= 2:
-                relid = motif.match(text).group(2)
-                project = motif.match(text).group(1)
-            else:
-                relid = motif.match(text).group(1)
+    references = get_references(text, reftype)
+    relations = get_relations(
+        session, repo, references, include_prs=include_prs)
 
-        if relid:
-            relation = pagure.lib.search_issues(
-                session, repo=repo, issueid=relid)
+    output = []
+    for reference in references:
+        _, relid = reference
+        if not is_project_reference(repo, reference) \
+                or relid not in relations:
+            continue
+        if relations[relid] not in output:
+            output.append(relations[relid])
 
-            if relation is None and include_prs:
-                relation = pagure.lib.search_pull_requests(
-                    session, project_id=repo.id, requestid=relid)
-
-            if relation is None or relation.project.name not in [project,
-                                                                 repo.name]:
-                continue
-
-            if relation not in relations:
-                relations.append(relation)
-
-    return relations
+    return output
@@ -0,0 +1,275 @@
+# -*- coding: utf-8 -*-
+
+"""
+ (c) 2016 - Copyright Red Hat Inc
+
+ Authors:
+   Pierre-Yves Chibon <pingou@pingoured.fr>
+
+"""
+
+import contextlib
+import errno
+import fcntl
+import os
+import re
+import shutil
+import subprocess
+import threading
+import time
+
+import pygit2
+import werkzeug
+
+import pagure
+import pagure.exceptions
+
+
+# Locks of the mirrors, shared by the threads of this process
+_LOCKS = {}
+_LOCKS_LOCK = threading.Lock()
+# Mirrors being refreshed in the background by this process
+_FETCHING = set()
+
+
+def get_mirror_path(remote_git, branch):
+    """ Return the path of the local mirror of the specified branch of the
+    remote git repository.
+    """
+    return os.path.join(
+        pagure.APP.config['REMOTE_GIT_FOLDER'],
+        werkzeug.secure_filename('%s_%s' % (remote_git, branch))
+    )
+
+
+def get_last_fetch(repopath):
+    """ Return when the specified mirror was last fetched, as a timestamp,
+    or None if it never was.
+    """
+    # Mirrors created by clone have a working tree
+    gitdir = os.path.join(repopath, '.git')
+    if not os.path.isdir(gitdir):
+        gitdir = repopath
+    try:
+        return os.path.getmtime(os.path.join(gitdir, 'FETCH_HEAD'))
+    except OSError:
+        return None
+
+
+def get_protocol(remote_git):
+    """ Return the name of the git transport used to fetch the remote git
+    repository at the specified address.
+    """
+    # <transport>::<address>, as used by the remote helpers
+    match = re.match(r'^([a-zA-Z][a-zA-Z0-9+.-]*)::', remote_git)
+    if match:
+        return match.group(1).lower()
+    match = re.match(r'^([a-zA-Z][a-zA-Z0-9+.-]*)://', remote_git)
+    if match:
+        protocol = match.group(1).lower()
+        # git+ssh:// and ssh+git:// are aliases of ssh://
+        if protocol in ('git+ssh', 'ssh+git'):
+            return 'ssh'
+        return protocol
+    # [user@]host:path, as long as there is no slash before the colon
+    if re.match(r'^[^/]+:', remote_git):
+        return 'ssh'
+    return 'file'
+
+
+def check_remote_git(remote_git):
+    """ Check that the remote git repository at the specified address may
+    be fetched, ie that it uses one of the ``REMOTE_GIT_PROTOCOLS``.
+
+    :raise pagure.exceptions.PagureException: if it may not be fetched
+
+    """
+    protocol = get_protocol(remote_git)
+    if remote_git.startswith('-') or protocol not in \
+            pagure.APP.config.get('REMOTE_GIT_PROTOCOLS', []):
+        raise pagure.exceptions.PagureException(
+            'The git repository %s may not be fetched, the protocols '
+            'supported are: %s' % (
+                remote_git,
+                ', '.join(pagure.APP.config.get('REMOTE_GIT_PROTOCOLS', []))))
+
+
+@contextlib.contextmanager
+def _lock_mirror(repopath, blocking=True):
+    """ Lock the specified mirror against the other threads and processes.
+    Yield whether the lock was acquired, which is always the case when
+    ``blocking`` is True.
+    """
+    with _LOCKS_LOCK:
+        lock = _LOCKS.setdefault(repopath, threading.Lock())
+    if not lock.acquire(blocking):
+        yield False
+        return
+
+    try:
+        folder = os.path.dirname(repopath)
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+        with open('%s.lock' % repopath, 'a') as stream:
+            flags = fcntl.LOCK_EX
+            if not blocking:
+                flags |= fcntl.LOCK_NB
+            try:
+                fcntl.flock(stream, flags)
+            except IOError as err:
+                if err.errno not in (errno.EAGAIN, errno.EACCES):
+                    raise
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(stream, fcntl.LOCK_UN)
+    finally:
+        lock.release()
+
+
+def _fetch(remote_git, branch, repopath):
+    """ Fetch the specified branch of the remote git repository in its
+    mirror, creating the mirror as a bare git repository if needed.
+    Only this branch is fetched, without the tags.
+    """
+    check_remote_git(remote_git)
+
+    created = False
+    if not os.path.exists(repopath):
+        pygit2.init_repository(repopath, bare=True)
+        created = True
+
+    refspec = '+refs/heads/%s:refs/heads/%s' % (branch, branch)
+    proc = subprocess.Popen(
+        ['git', 'fetch', '--quiet', '--no-tags', '--update-head-ok',
+         '--', remote_git, refspec],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        cwd=repopath,
+        # Never wait for credentials and let git itself refuse the other
+        # transports, including in the redirections and submodules
+        env=dict(
+            os.environ,
+            GIT_TERMINAL_PROMPT='0',
+            GIT_ALLOW_PROTOCOL=':'.join(
+                pagure.APP.config.get('REMOTE_GIT_PROTOCOLS', []))))
+    _, error = proc.communicate()
+    if proc.returncode:
+        if created:
+            shutil.rmtree(repopath)
+        raise pagure.exceptions.PagureException(
+            'Could not fetch the branch %s of %s: %s' % (
+                branch, remote_git, error))
+
+    if created:
+        repo_obj = pygit2.Repository(repopath)
+        repo_obj.create_reference(
+            'HEAD', 'refs/heads/%s' % branch, force=True)
+
+
+def get_mirror(remote_git, branch, fresh=False):
+    """ Return the path of the local mirror of the specified branch of the
+    remote git repository.
+
+    A mirror fetched more than ``REMOTE_GIT_TTL`` seconds ago is returned
+    as it is and refreshed in the background, while a missing mirror is
+    fetched first.
+
+    :arg remote_git: the URL of the remote git repository
+    :arg branch: the name of the branch to mirror
+    :kwarg fresh: if True, fetch the branch before returning, even if the
+        mirror is recent
+    :return: the path of the mirror
+    :raise pagure.exceptions.PagureException: if the branch could not be
+        fetched or the remote git repository uses a protocol not allowed
+
+    """
+    check_remote_git(remote_git)
+
+    repopath = get_mirror_path(remote_git, branch)
+    last_fetch = get_last_fetch(repopath)
+    if not fresh and last_fetch is not None:
+        if time.time() - last_fetch >= pagure.APP.config.get(
+                'REMOTE_GIT_TTL', 300):
+            fetch_in_background(remote_git, branch)
+        return repopath
+
+    start = time.time()
+    with _lock_mirror(repopath):
+        # Another thread or process may have fetched it while we waited
+        last_fetch = get_last_fetch(repopath)
+        if last_fetch is None or last_fetch < start:
+            _fetch(remote_git, branch, repopath)
+
+    return repopath
+
+
+def fetch_in_background(remote_git, branch):
+    """ Refresh, in a thread, the local mirror of the specified branch of
+    the remote git repository, unless it is already being refreshed.
+
+    :return: the thread refreshing the mirror or None
+
+    """
+    repopath = get_mirror_path(remote_git, branch)
+    with _LOCKS_LOCK:
+        if repopath in _FETCHING:
+            return None
+        _FETCHING.add(repopath)
+
+    def run():
+        """ Do the actual fetch. """
+        # We catch Exception if we want :-p
+        # pylint: disable=W0703
+        try:
+            with _lock_mirror(repopath, blocking=False) as locked:
+                if locked:
+                    _fetch(remote_git, branch, repopath)
+        except Exception as err:
+            pagure.LOG.exception(
+                'Could not refresh the mirror %s: %s', repopath, err)
+        finally:
+            with _LOCKS_LOCK:
+                _FETCHING.discard(repopath)
+
+    thread = threading.Thread(target=run)
+    thread.daemon = True
+    thread.start()
+    return thread
+
+
+def clean_mirrors(max_age=None):
+    """ Remove the local mirrors of remote git repositories which were not
+    fetched for some time.
+
+    :kwarg max_age: the number of seconds since their last fetch after
+        which mirrors are removed, defaults to the ``REMOTE_GIT_MAX_AGE``
+        configuration key
+    :return: the list of the paths of the mirrors removed
+
+    """
+    if max_age is None:
+        max_age = pagure.APP.config.get('REMOTE_GIT_MAX_AGE', 30 * 24 * 3600)
+    folder = pagure.APP.config['REMOTE_GIT_FOLDER']
+    if not os.path.exists(folder):
+        return []
+
+    removed = []
+    now = time.time()
+    for name in sorted(os.listdir(folder)):
+        repopath = os.path.join(folder, name)
+        if not os.path.isdir(repopath):
+            continue
+        # Skip the mirrors being fetched
+        with _lock_mirror(repopath, blocking=False) as locked:
+            if not locked:
+                continue
+            last_fetch = get_last_fetch(repopath) \
+                or os.path.getmtime(repopath)
+            if now - last_fetch > max_age:
+                shutil.rmtree(repopath)
+                removed.append(repopath)
+
+    return removed
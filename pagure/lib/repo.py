@@ -9,12 +9,20 @@
 """
 
 
+import collections
+import os
+import threading
+
 import pygit2
 
 import pagure
 import pagure.exceptions
 
 
+# File touched by the hooks to mark that a git repository changed
+GENERATION_FILE = 'pagure_generation'
+
+
 def get_pygit2_version():
     ''' Return pygit2 version as a tuple of integers.
     This is needed for correct version comparison.
@@ -76,3 +84,108 @@ class PagureRepo(pygit2.Repository):
                         'Un-expected merge result: %s' % (
                         pygit2.GIT_MERGE_ANALYSIS_NORMAL))
                     raise AssertionError('Unknown merge analysis result')
+
+
+class RepoPool(object):
+    """ A pool keeping open the ``size`` git repositories most recently
+    used, so that each request does not have to load again their packfile
+    indexes and references.
+
+    libgit2 repository objects should not be shared between threads, so
+    the repositories are kept open for each thread.
+    A repository is opened again once its references, packfiles or
+    generation file changed.
+
+    """
+
+    # Files and folders of a git repository which change when its content
+    # changes
+    WATCHED = ('HEAD', 'packed-refs', 'refs/heads', 'refs/tags',
+               'objects/pack', GENERATION_FILE)
+
+    def __init__(self, size=20):
+        """ Constructor.
+
+        :kwarg size: the maximum number of git repositories kept open, if 0
+            the repositories are never kept open
+
+        """
+        self.size = size
+        self.stats = collections.Counter()
+        self._repos = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def _get_signature(cls, path):
+        """ Return the modification times of the files and folders of the
+        git repository at the specified location which change when its
+        content changes.
+        """
+        gitdir = os.path.join(path, '.git')
+        if not os.path.isdir(gitdir):
+            gitdir = path
+        signature = []
+        for name in cls.WATCHED:
+            try:
+                stat = os.stat(os.path.join(gitdir, name))
+                signature.append((stat.st_ino, stat.st_mtime))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+
+    def get(self, path):
+        """ Return the git repository at the specified location, opening it
+        only if it is not already open or if it changed since.
+        """
+        path = os.path.abspath(path)
+        if not self.size:
+            return PagureRepo(path)
+
+        key = (threading.current_thread().ident, path)
+        signature = self._get_signature(path)
+        with self._lock:
+            entry = self._repos.pop(key, None)
+            if entry is not None and entry[0] == signature:
+                self.stats['hits'] += 1
+                self._repos[key] = entry
+                return entry[1]
+            elif entry is not None:
+                self.stats['invalidations'] += 1
+            else:
+                self.stats['misses'] += 1
+
+        repo_obj = PagureRepo(path)
+        with self._lock:
+            self._repos[key] = (signature, repo_obj)
+            while len(self._repos) > self.size:
+                self._repos.popitem(last=False)
+        return repo_obj
+
+    def clear(self):
+        """ Close all the git repositories kept open. """
+        with self._lock:
+            self._repos.clear()
+
+    def __len__(self):
+        return len(self._repos)
+
+
+REPO_POOL = RepoPool(size=pagure.APP.config.get('REPO_POOL_SIZE', 20))
+
+
+def get_repo(path):
+    """ Return the git repository at the specified location, from the pool
+    of the repositories kept open.
+    """
+    return REPO_POOL.get(path)
+
+
+def bump_generation(path):
+    """ Mark the git repository at the specified location as changed, so
+    that all the processes open it again.
+    Meant to be called from the hooks, for changes which do not touch the
+    files and folders watched by the pool, such as a reference in a
+    sub-folder of refs/heads.
+    """
+    with open(os.path.join(path, GENERATION_FILE), 'a'):
+        os.utime(os.path.join(path, GENERATION_FILE), None)
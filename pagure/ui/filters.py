@@ -21,6 +21,7 @@ from pygments.formatters import HtmlFormatter
 
 import pagure.exceptions
 import pagure.lib
+import pagure.lib.git
 import pagure.forms
 from pagure import (APP, SESSION, authenticated, is_repo_admin)
 
@@ -66,16 +67,7 @@ def format_loc(loc, commit=None, filename=None, tree_id=None, prequest=None,
 
     comments = {}
     if prequest and not isinstance(prequest, flask.wrappers.Request):
-        for com in prequest.comments:
-            if commit and unicode(com.commit_id) == unicode(commit) \
-                    and unicode(com.filename) == unicode(filename):
-                if com.line in comments:
-                    comments[com.line].append(com)
-                else:
-                    comments[com.line] = [com]
-    for key in comments:
-        comments[key] = sorted(
-            comments[key], key=lambda obj: obj.date_created)
+        comments = pagure.lib.get_inline_comments(prequest, commit, filename)
 
     if not index:
         index = ''
@@ -291,25 +283,17 @@ def html_diff(diff):
 @APP.template_filter('patch_to_diff')
 def patch_to_diff(patch):
     """Render a hunk as a diff"""
-    content = ""
-    for hunk in patch.hunks:
-        content = content + "@@ -%i,%i +%i,%i @@\n" % (
-            hunk.old_start, hunk.old_lines, hunk.new_start, hunk.new_lines)
-        for line in hunk.lines:
-            if hasattr(line, 'content'):
-                origin = line.origin
-                if line.origin in ['<', '>', '=']:
-                    origin = ''
-                content = content + origin + ' '+ line.content
-            else:
-                # Avoid situation where at the end of a file we get:
-                # + foo<
-                # \ No newline at end of file
-                if line[0] in ['<', '>', '=']:
-                    line = ('', line[1])
-                content = content + ' '.join(line)
-
-    return content
+    return pagure.lib.git.patch_to_text(patch)
+
+
+@APP.template_filter('diff_truncated')
+def diff_truncated(patch, fileid):
+    """ Template filter returning whether the diff of the provided patch,
+    at the given position in the diff, is too large to be rendered with the
+    page and should only be loaded on demand.
+    """
+    return pagure.lib.git.is_diff_file_truncated(
+        pagure.lib.git.get_patch_info(patch), fileid)
 
 
 @APP.template_filter('author2user')
@@ -20,6 +20,7 @@ import pagure.doc_utils
 import pagure.exceptions
 import pagure.lib
 import pagure.lib.git
+import pagure.lib.repo
 import pagure.forms
 from pagure import (APP, SESSION, LOG, login_required, is_repo_admin,
                     __get_file_in_tree)
@@ -79,19 +80,8 @@ def _get_pr_info(repo_obj, orig_repo, branch_from, branch_to):
         orig_commit = orig_repo[
             orig_repo.lookup_branch(branch_to).get_object().hex]
 
-        master_commits = [
-            commit.oid.hex
-            for commit in orig_repo.walk(
-                orig_commit.oid.hex, pygit2.GIT_SORT_TIME)
-        ]
-
-        repo_commit = repo_obj[commitid]
-
-        for commit in repo_obj.walk(
-                repo_commit.oid.hex, pygit2.GIT_SORT_TIME):
-            if commit.oid.hex in master_commits:
-                break
-            diff_commits.append(commit)
+        diff_commits = pagure.lib.git.get_diff_commits(
+            repo_obj, commitid, orig_repo, orig_commit.oid.hex)
 
         if diff_commits:
             first_commit = repo_obj[diff_commits[-1].oid.hex]
@@ -108,9 +98,8 @@ def _get_pr_info(repo_obj, orig_repo, branch_from, branch_to):
             branch = repo_obj.lookup_branch(branch_from)
             repo_commit = branch.get_object()
 
-        for commit in repo_obj.walk(
-                repo_commit.oid.hex, pygit2.GIT_SORT_TIME):
-            diff_commits.append(commit)
+        diff_commits = pagure.lib.git.get_diff_commits(
+            repo_obj, repo_commit.oid.hex)
 
         diff = repo_commit.tree.diff_to_tree(swap=True)
     else:
@@ -172,8 +161,16 @@ def request_pulls(repo, username=None):
             author=author,
             count=True)
 
+    # Only the pull-requests whose files changed are already known
+    diffstats = {}
+    for request in requests:
+        stats = pagure.lib.git.get_pull_request_diff_stats(request)
+        if stats is not None:
+            diffstats[request.uid] = pagure.lib.git.summarize_diff_stats(
+                stats)
+
     reponame = pagure.get_repo_path(repo)
-    repo_obj = pygit2.Repository(reponame)
+    repo_obj = pagure.lib.repo.get_repo(reponame)
     if not repo_obj.is_empty and not repo_obj.head_is_unborn:
         head = repo_obj.head.shorthand
     else:
@@ -186,6 +183,7 @@ def request_pulls(repo, username=None):
         username=username,
         repo_obj=repo_obj,
         requests=requests,
+        diffstats=diffstats,
         oth_requests=oth_requests,
         status=status,
         assignee=assignee,
@@ -227,8 +225,8 @@ def request_pull(repo, requestid, username=None):
         repopath = pagure.get_repo_path(repo_from)
         parentpath = _get_parent_repo_path(repo_from)
 
-    repo_obj = pygit2.Repository(repopath)
-    orig_repo = pygit2.Repository(parentpath)
+    repo_obj = pagure.lib.repo.get_repo(repopath)
+    orig_repo = pagure.lib.repo.get_repo(parentpath)
 
     diff_commits = []
     diff = None
@@ -267,6 +265,8 @@ def request_pull(repo, requestid, username=None):
 
     if diff:
         diff.find_similar()
+        # Cache the files changed for the list of the pull-requests
+        pagure.lib.git.get_pull_request_diff_stats(request, diff=diff)
 
     form = pagure.forms.ConfirmationForm()
 
@@ -313,8 +313,8 @@ def request_pull_patch(repo, requestid, username=None):
         repopath = pagure.get_repo_path(repo_from)
         parentpath = _get_parent_repo_path(repo_from)
 
-    repo_obj = pygit2.Repository(repopath)
-    orig_repo = pygit2.Repository(parentpath)
+    repo_obj = pagure.lib.repo.get_repo(repopath)
+    orig_repo = pagure.lib.repo.get_repo(parentpath)
 
     branch = repo_obj.lookup_branch(request.branch_from)
     commitid = None
@@ -350,9 +350,55 @@ def request_pull_patch(repo, requestid, username=None):
                 'error')
 
     diff_commits.reverse()
-    patch = pagure.lib.git.commit_to_patch(repo_obj, diff_commits)
 
-    return flask.Response(patch, content_type="text/plain;charset=UTF-8")
+    return flask.Response(
+        pagure.lib.git.stream_commits_patch(repo_obj, diff_commits),
+        content_type="text/plain;charset=UTF-8")
+
+
+@APP.route('/<repo:repo>/pull-request/<int:requestid>/diff/<int:fileid>')
+@APP.route(
+    '/fork/<username>/<repo:repo>/pull-request/<int:requestid>/diff/'
+    '<int:fileid>')
+def request_pull_diff(repo, requestid, fileid, username=None):
+    """ Render the diff of a single file of a pull-request, used to load on
+    demand the diffs too large to be rendered with the pull-request.
+    """
+    repo = pagure.lib.get_project(SESSION, repo, user=username)
+
+    if not repo:
+        flask.abort(404, 'Project not found')
+
+    if not repo.settings.get('pull_requests', True):
+        flask.abort(404, 'No pull-requests found for this project')
+
+    request = pagure.lib.search_pull_requests(
+        SESSION, project_id=repo.id, requestid=requestid)
+
+    if not request:
+        flask.abort(404, 'Pull-request not found')
+
+    if request.remote:
+        repopath = pagure.get_remote_repo_path(
+            request.remote_git, request.branch_from)
+    else:
+        repopath = pagure.get_repo_path(request.project_from)
+
+    repo_obj = pagure.lib.repo.get_repo(repopath)
+
+    diff = pagure.lib.git.get_pull_request_diff(repo_obj, request)
+    patch = pagure.lib.git.get_diff_file(diff, fileid)
+    if patch is None:
+        flask.abort(404, 'File not found in this pull-request')
+
+    return flask.render_template(
+        'diff_file.html',
+        patch=patch,
+        info=pagure.lib.git.get_patch_info(patch),
+        fileid=fileid,
+        pull_request=request,
+        tree_id=repo_obj[request.commit_stop].tree.id,
+    )
 
 
 @APP.route('/<repo:repo>/pull-request/<int:requestid>/edit/',
@@ -861,7 +907,8 @@ def fork_project(repo, username=None):
             docfolder=APP.config['DOCS_FOLDER'],
             ticketfolder=APP.config['TICKETS_FOLDER'],
             requestfolder=APP.config['REQUESTS_FOLDER'],
-            user=flask.g.fas_user.username)
+            user=flask.g.fas_user.username,
+            alternates=APP.config.get('FORK_WITH_ALTERNATES', False))
 
         SESSION.commit()
         pagure.lib.git.generate_gitolite_acls()
@@ -908,10 +955,10 @@ def new_request_pull(repo, branch_to, branch_from, username=None):
         flask.abort(404, 'No pull-request allowed on this project')
 
     repopath = pagure.get_repo_path(repo)
-    repo_obj = pygit2.Repository(repopath)
+    repo_obj = pagure.lib.repo.get_repo(repopath)
 
     parentpath = _get_parent_repo_path(repo)
-    orig_repo = pygit2.Repository(parentpath)
+    orig_repo = pagure.lib.repo.get_repo(parentpath)
 
     try:
         diff, diff_commits, orig_commit = _get_pr_info(
@@ -992,7 +1039,7 @@ def new_request_pull(repo, branch_to, branch_from, username=None):
     contributing = None
     requestrepopath = _get_parent_request_repo_path(repo)
     if os.path.exists(requestrepopath):
-        requestrepo = pygit2.Repository(requestrepopath)
+        requestrepo = pagure.lib.repo.get_repo(requestrepopath)
         if not requestrepo.is_empty and not requestrepo.head_is_unborn:
             commit = requestrepo[requestrepo.head.target]
             contributing = __get_file_in_tree(
@@ -1041,7 +1088,7 @@ def new_remote_request_pull(repo, username=None):
         flask.abort(404, 'No pull-request allowed on this project')
 
     parentpath = pagure.get_repo_path(repo)
-    orig_repo = pygit2.Repository(parentpath)
+    orig_repo = pagure.lib.repo.get_repo(parentpath)
 
     repo_admin = is_repo_admin(repo)
 
@@ -1051,8 +1098,9 @@ def new_remote_request_pull(repo, username=None):
         branch_to = form.branch_to.data.strip()
         remote_git = form.git_repo.data.strip()
 
-        repopath = pagure.get_remote_repo_path(remote_git, branch_from)
-        repo_obj = pygit2.Repository(repopath)
+        repopath = pagure.get_remote_repo_path(
+            remote_git, branch_from, fresh=True)
+        repo_obj = pagure.lib.repo.get_repo(repopath)
 
         try:
             diff, diff_commits, orig_commit = _get_pr_info(
@@ -15,12 +15,12 @@ from collections import defaultdict
 import pygit2
 from sqlalchemy.exc import SQLAlchemyError
 
-import chardet
-import kitchen.text.converters as ktc
 import mimetypes
 
 import pagure.doc_utils
 import pagure.lib
+import pagure.lib.encoding_utils
+import pagure.lib.repo
 import pagure.forms
 from pagure import (APP, SESSION, LOG, __get_file_in_tree,
                     login_required, is_repo_admin, authenticated)
@@ -440,7 +440,7 @@ def view_issues(repo, username=None):
     tag_list = pagure.lib.get_tags_of_project(SESSION, repo)
 
     reponame = pagure.get_repo_path(repo)
-    repo_obj = pygit2.Repository(reponame)
+    repo_obj = pagure.lib.repo.get_repo(reponame)
 
     return flask.render_template(
         'issues.html',
@@ -531,7 +531,7 @@ def view_roadmap(repo, username=None):
     tag_list = pagure.lib.get_tags_of_project(SESSION, repo)
 
     reponame = pagure.get_repo_path(repo)
-    repo_obj = pygit2.Repository(reponame)
+    repo_obj = pagure.lib.repo.get_repo(reponame)
     milestones_ordered = sorted(list(milestone_issues.keys()))
     if 'unplanned' in milestones_ordered:
         index = milestones_ordered.index('unplanned')
@@ -626,7 +626,7 @@ def new_issue(repo, username=None):
     default = None
     ticketrepopath = os.path.join(APP.config['TICKETS_FOLDER'], repo.path)
     if os.path.exists(ticketrepopath):
-        ticketrepo = pygit2.Repository(ticketrepopath)
+        ticketrepo = pagure.lib.repo.get_repo(ticketrepopath)
         if not ticketrepo.is_empty and not ticketrepo.head_is_unborn:
             commit = ticketrepo[ticketrepo.head.target]
             # Get the different ticket types
@@ -683,7 +683,7 @@ def view_issue(repo, issueid, username=None):
             403, 'This issue is private and you are not allowed to view it')
 
     reponame = pagure.get_repo_path(repo)
-    repo_obj = pygit2.Repository(reponame)
+    repo_obj = pagure.lib.repo.get_repo(reponame)
 
     status = pagure.lib.get_issue_statuses(SESSION)
 
@@ -917,7 +917,7 @@ def view_issue_raw_file(repo, filename=None, username=None):
 
     reponame = os.path.join(APP.config['TICKETS_FOLDER'], repo.path)
 
-    repo_obj = pygit2.Repository(reponame)
+    repo_obj = pagure.lib.repo.get_repo(reponame)
 
     if repo_obj.is_empty:
         flask.abort(404, 'Empty repo cannot have a file')
@@ -949,7 +949,7 @@ def view_issue_raw_file(repo, filename=None, username=None):
             mimetype = 'text/plain'
 
     if mimetype.startswith('text/') and not encoding:
-        encoding = chardet.detect(ktc.to_bytes(data))['encoding']
+        encoding = pagure.lib.encoding_utils.guess_encoding(data)
 
     headers = {'Content-Type': mimetype}
     if encoding:
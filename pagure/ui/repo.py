@@ -9,6 +9,7 @@
 """
 
 import datetime
+import hashlib
 import shutil
 import os
 from math import ceil
@@ -16,6 +17,7 @@ from math import ceil
 import flask
 import pygit2
 import kitchen.text.converters as ktc
+import munch
 import werkzeug
 
 from cStringIO import StringIO
@@ -28,43 +30,47 @@ from pygments.util import ClassNotFound
 from sqlalchemy.exc import SQLAlchemyError
 
 import mimetypes
-import chardet
 
 from binaryornot.helpers import is_binary_string
 
 import pagure.exceptions
 import pagure.lib
+import pagure.lib.cache
+import pagure.lib.encoding_utils
 import pagure.lib.git
+import pagure.lib.repo
 import pagure.forms
 import pagure
 import pagure.ui.plugins
 from pagure import (APP, SESSION, LOG, __get_file_in_tree, login_required,
-                    is_repo_admin, admin_session_timedout, authenticated)
+                    is_repo_admin, admin_session_timedout, authenticated,
+                    conditional_get)
 
 
 # pylint: disable=E1101
 
 
-@APP.route('/<repo:repo>/')
-@APP.route('/<repo:repo>')
-@APP.route('/fork/<username>/<repo:repo>/')
-@APP.route('/fork/<username>/<repo:repo>')
-def view_repo(repo, username=None):
-    """ Front page of a specific repo.
-    """
-    repo = pagure.lib.get_project(SESSION, repo, user=username)
-
-    if repo is None:
-        flask.abort(404, 'Project not found')
-
-    reponame = pagure.get_repo_path(repo)
-
-    repo_obj = pygit2.Repository(reponame)
+def _get_repo_overview(repo, repo_obj, username=None):
+    """ Return the information displayed on the front page of the specified
+    project: its default branch, its branches, its last commits, the
+    content of its root folder and its rendered README.
 
+    These only depend on the HEAD of the git repository and on its list of
+    branches, so they are cached using them.
+    """
+    head = head_oid = None
     if not repo_obj.is_empty and not repo_obj.head_is_unborn:
         head = repo_obj.head.shorthand
-    else:
-        head = None
+        head_oid = repo_obj.head.target.hex
+
+    branches = sorted(repo_obj.listall_branches())
+    key = '%s:%s:%s:%s' % (
+        repo.id, repo.path, head_oid,
+        hashlib.sha1(ktc.to_bytes('\n'.join(branches))).hexdigest())
+
+    overview = pagure.lib.cache.get_repo_overview(repo_obj.path, key)
+    if overview is not None:
+        return munch.munchify(overview)
 
     cnt = 0
     last_commits = []
@@ -83,22 +89,70 @@ def view_repo(repo, username=None):
 
     readme = None
     safe = False
-
-    if not repo_obj.is_empty and not repo_obj.head_is_unborn:
-        branchname = repo_obj.head.shorthand
-    else:
-        branchname = None
     for i in tree:
         name, ext = os.path.splitext(i.name)
         if name == 'README':
             content = __get_file_in_tree(
-                repo_obj, last_commits[0].tree, [i.name]).data
+                repo_obj, last_commits[0].tree, [i.name])
 
             readme, safe = pagure.doc_utils.convert_readme(
-                content, ext,
+                content.data, ext,
                 view_file_url=flask.url_for(
                     'view_raw_file', username=username,
-                    repo=repo.name, identifier=branchname, filename=''))
+                    repo=repo.name, identifier=head, filename=''),
+                oid=content.oid.hex)
+
+    overview = {
+        'head': head,
+        'branchname': head,
+        'branches': branches,
+        'last_commits': [
+            {
+                'hex': commit.oid.hex,
+                'oid': {'hex': commit.oid.hex},
+                'commit_time': commit.commit_time,
+                'author': {
+                    'name': commit.author.name,
+                    'email': commit.author.email,
+                },
+                'message': commit.message,
+            }
+            for commit in last_commits
+        ],
+        'tree': [
+            {
+                'name': entry.name,
+                'filemode': entry.filemode,
+                'hex': entry.oid.hex,
+            }
+            for entry in tree
+        ],
+        'readme': readme,
+        'safe': safe,
+    }
+    pagure.lib.cache.set_repo_overview(repo_obj.path, key, overview)
+
+    return munch.munchify(overview)
+
+
+@APP.route('/<repo:repo>/')
+@APP.route('/<repo:repo>')
+@APP.route('/fork/<username>/<repo:repo>/')
+@APP.route('/fork/<username>/<repo:repo>')
+@conditional_get()
+def view_repo(repo, username=None):
+    """ Front page of a specific repo.
+    """
+    repo = pagure.lib.get_project(SESSION, repo, user=username)
+
+    if repo is None:
+        flask.abort(404, 'Project not found')
+
+    reponame = pagure.get_repo_path(repo)
+
+    repo_obj = pagure.lib.repo.get_repo(reponame)
+
+    overview = _get_repo_overview(repo, repo_obj, username)
 
     diff_commits = []
     if repo.is_fork:
@@ -107,43 +161,34 @@ def view_repo(repo, username=None):
     else:
         parentname = os.path.join(APP.config['GIT_FOLDER'], repo.path)
 
-    orig_repo = pygit2.Repository(parentname)
+    orig_repo = pagure.lib.repo.get_repo(parentname)
 
     if not repo_obj.is_empty and not orig_repo.is_empty:
 
         orig_branch = orig_repo.lookup_branch('master')
         branch = repo_obj.lookup_branch('master')
         if orig_branch and branch:
-
-            master_commits = [
+            diff_commits = [
                 commit.oid.hex
-                for commit in orig_repo.walk(
-                    orig_branch.get_object().hex,
-                    pygit2.GIT_SORT_TIME)
+                for commit in pagure.lib.git.get_diff_commits(
+                    repo_obj, branch.get_object().hex,
+                    orig_repo, orig_branch.get_object().hex)
             ]
 
-            repo_commit = repo_obj[branch.get_object().hex]
-
-            for commit in repo_obj.walk(
-                    repo_commit.oid.hex, pygit2.GIT_SORT_TIME):
-                if commit.oid.hex in master_commits:
-                    break
-                diff_commits.append(commit.oid.hex)
-
     return flask.render_template(
         'repo_info.html',
         select='overview',
         repo=repo,
         repo_obj=repo_obj,
         username=username,
-        head=head,
-        readme=readme,
-        safe=safe,
+        head=overview.head,
+        readme=overview.readme,
+        safe=overview.safe,
         origin='view_repo',
-        branches=sorted(repo_obj.listall_branches()),
-        branchname=branchname,
-        last_commits=last_commits,
-        tree=tree,
+        branches=overview.branches,
+        branchname=overview.branchname,
+        last_commits=overview.last_commits,
+        tree=overview.tree,
         diff_commits=diff_commits,
         repo_admin=is_repo_admin(repo),
         form=pagure.forms.ConfirmationForm(),
@@ -152,6 +197,7 @@ def view_repo(repo, username=None):
 
 @APP.route('/<repo:repo>/branch/<path:branchname>')
 @APP.route('/fork/<username>/<repo:repo>/branch/<path:branchname>')
+@conditional_get()
 def view_repo_branch(repo, branchname, username=None):
     ''' Returns the list of branches in the repo. '''
 
@@ -162,7 +208,7 @@ def view_repo_branch(repo, branchname, username=None):
 
     reponame = pagure.get_repo_path(repo)
 
-    repo_obj = pygit2.Repository(reponame)
+    repo_obj = pagure.lib.repo.get_repo(reponame)
 
     if branchname not in repo_obj.listall_branches():
         flask.abort(404, 'Branch no found')
@@ -188,7 +234,7 @@ def view_repo_branch(repo, branchname, username=None):
     else:
         parentname = os.path.join(APP.config['GIT_FOLDER'], repo.path)
 
-    orig_repo = pygit2.Repository(parentname)
+    orig_repo = pagure.lib.repo.get_repo(parentname)
 
     tree = None
     safe=False
@@ -200,36 +246,30 @@ def view_repo_branch(repo, branchname, username=None):
         else:
             compare_branch = None
 
-        compare_commits = []
-
+        compare_commitid = None
         if compare_branch:
-            compare_commits = [
-                commit.oid.hex
-                for commit in orig_repo.walk(
-                    compare_branch.get_object().hex,
-                    pygit2.GIT_SORT_TIME)
-            ]
-
-        repo_commit = repo_obj[branch.get_object().hex]
+            compare_commitid = compare_branch.get_object().hex
 
-        for commit in repo_obj.walk(
-                repo_commit.oid.hex, pygit2.GIT_SORT_TIME):
-            if commit.oid.hex in compare_commits:
-                break
-            diff_commits.append(commit.oid.hex)
+        diff_commits = [
+            commit.oid.hex
+            for commit in pagure.lib.git.get_diff_commits(
+                repo_obj, branch.get_object().hex,
+                orig_repo, compare_commitid)
+        ]
 
         tree=sorted(last_commits[0].tree, key=lambda x: x.filemode)
         for i in tree:
             name, ext = os.path.splitext(i.name)
             if name == 'README':
                 content = __get_file_in_tree(
-                    repo_obj, last_commits[0].tree, [i.name]).data
+                    repo_obj, last_commits[0].tree, [i.name])
 
                 readme, safe = pagure.doc_utils.convert_readme(
-                    content, ext,
+                    content.data, ext,
                     view_file_url=flask.url_for(
                         'view_raw_file', username=username,
-                        repo=repo.name, identifier=branchname, filename=''))
+                        repo=repo.name, identifier=branchname, filename=''),
+                    oid=content.oid.hex)
 
     return flask.render_template(
         'repo_info.html',
@@ -256,6 +296,7 @@ def view_repo_branch(repo, branchname, username=None):
 @APP.route('/fork/<username>/<repo:repo>/commits/')
 @APP.route('/fork/<username>/<repo:repo>/commits')
 @APP.route('/fork/<username>/<repo:repo>/commits/<path:branchname>')
+@conditional_get()
 def view_commits(repo, branchname=None, username=None):
     """ Displays the commits of the specified repo.
     """
@@ -266,7 +307,7 @@ def view_commits(repo, branchname=None, username=None):
 
     reponame = pagure.get_repo_path(repo)
 
-    repo_obj = pygit2.Repository(reponame)
+    repo_obj = pagure.lib.repo.get_repo(reponame)
 
     if branchname and branchname not in repo_obj.listall_branches():
         flask.abort(404, 'Branch no found')
@@ -295,14 +336,31 @@ def view_commits(repo, branchname=None, username=None):
 
     n_commits = 0
     last_commits = []
+    total_page = 0
     if branch:
+        n_commits = pagure.lib.git.get_commits_count(
+            repo_obj, branchname, full_walk=False)
+
+        # Only walk the history up to the page requested
+        cnt = 0
         for commit in repo_obj.walk(
                 branch.get_object().hex, pygit2.GIT_SORT_TIME):
-            if n_commits >= start and n_commits <= end:
+            if cnt > end:
+                break
+            if cnt >= start:
                 last_commits.append(commit)
-            n_commits += 1
+            cnt += 1
+
+        if n_commits is None and cnt <= end:
+            # We walked the entire history, so we know its size
+            n_commits = cnt
 
-    total_page = int(ceil(n_commits / float(limit)))
+        if n_commits is not None:
+            total_page = int(ceil(n_commits / float(limit)))
+        else:
+            # The size of the history is not known yet, allow going to
+            # the next page
+            total_page = page + 1
 
     diff_commits = []
     diff_commits_full = []
@@ -312,7 +370,7 @@ def view_commits(repo, branchname=None, username=None):
     else:
         parentname = os.path.join(APP.config['GIT_FOLDER'], repo.path)
 
-    orig_repo = pygit2.Repository(parentname)
+    orig_repo = pagure.lib.repo.get_repo(parentname)
 
     if not repo_obj.is_empty and not orig_repo.is_empty \
             and repo_obj.listall_branches() > 1:
@@ -323,25 +381,16 @@ def view_commits(repo, branchname=None, username=None):
         else:
             compare_branch = None
 
-        compare_commits = []
-
+        compare_commitid = None
         if compare_branch:
-            compare_commits = [
-                commit.oid.hex
-                for commit in orig_repo.walk(
-                    compare_branch.get_object().hex,
-                    pygit2.GIT_SORT_TIME)
-            ]
+            compare_commitid = compare_branch.get_object().hex
 
         if branch:
-            repo_commit = repo_obj[branch.get_object().hex]
-
-            for commit in repo_obj.walk(
-                    repo_commit.oid.hex, pygit2.GIT_SORT_TIME):
-                if commit.oid.hex in compare_commits:
-                    break
-                diff_commits.append(commit.oid.hex)
-                diff_commits_full.append(commit)
+            diff_commits_full = pagure.lib.git.get_diff_commits(
+                repo_obj, branch.get_object().hex,
+                orig_repo, compare_commitid)
+            diff_commits = [
+                commit.oid.hex for commit in diff_commits_full]
 
     return flask.render_template(
         'commits.html',
@@ -378,7 +427,7 @@ def compare_commits(repo, commit1, commit2, username=None):
 
     reponame = pagure.get_repo_path(repo)
 
-    repo_obj = pygit2.Repository(reponame)
+    repo_obj = pagure.lib.repo.get_repo(reponame)
 
     if not repo_obj.is_empty and not repo_obj.head_is_unborn:
         head = repo_obj.head.shorthand
@@ -437,6 +486,7 @@ def compare_commits(repo, commit1, commit2, username=None):
 
 @APP.route('/<repo:repo>/blob/<path:identifier>/f/<path:filename>')
 @APP.route('/fork/<username>/<repo:repo>/blob/<path:identifier>/f/<path:filename>')
+@conditional_get()
 def view_file(repo, identifier, filename, username=None):
     """ Displays the content of a file or a tree for the specified repo.
     """
@@ -447,7 +497,7 @@ def view_file(repo, identifier, filename, username=None):
 
     reponame = pagure.get_repo_path(repo)
 
-    repo_obj = pygit2.Repository(reponame)
+    repo_obj = pagure.lib.repo.get_repo(reponame)
 
     if repo_obj.is_empty:
         flask.abort(404, 'Empty repo cannot have a file')
@@ -483,6 +533,7 @@ def view_file(repo, identifier, filename, username=None):
         flask.abort(404, 'File not found')
 
     encoding = None
+    truncated = False
     if isinstance(content, pygit2.Blob):
         rawtext = str(flask.request.args.get('text')).lower() in ['1', 'true']
         ext = filename[filename.rfind('.'):]
@@ -498,26 +549,42 @@ def view_file(repo, identifier, filename, username=None):
                 )
                 output_type = 'binary'
         elif ext in ('.rst', '.mk', '.md', '.markdown') and not rawtext:
-            content, safe = pagure.doc_utils.convert_readme(content.data, ext)
+            content, safe = pagure.doc_utils.convert_readme(
+                content.data, ext, oid=content.oid.hex)
             output_type = 'markup'
-        elif not is_binary_string(content.data):
-            encoding = chardet.detect(ktc.to_bytes(content.data))['encoding']
+        elif not is_binary_string(content.data[:1024]):
+            encoding = pagure.lib.encoding_utils.guess_encoding(content.data)
             file_content = content.data
-            try:
-                lexer = guess_lexer_for_filename(
-                    filename,
-                    file_content
-                )
-            except (ClassNotFound, TypeError):
+            max_size = APP.config.get('MAX_HIGHLIGHT_SIZE')
+            if max_size and content.size > max_size:
+                # Too large to be highlighted, only show the beginning
+                truncated = True
+                file_content = file_content[:max_size]
+                file_content = file_content[:file_content.rfind('\n') + 1] \
+                    or file_content
                 lexer = TextLexer()
-
-            content = highlight(
-                file_content,
-                lexer,
-                HtmlFormatter(
-                    noclasses=True,
-                    style="tango",)
-            )
+            else:
+                try:
+                    lexer = guess_lexer_for_filename(
+                        filename,
+                        file_content
+                    )
+                except (ClassNotFound, TypeError):
+                    lexer = TextLexer()
+
+            oid = content.oid.hex
+            content = pagure.lib.cache.get_highlighted_file(
+                oid, lexer.name, truncated)
+            if content is None:
+                content = highlight(
+                    file_content,
+                    lexer,
+                    HtmlFormatter(
+                        noclasses=True,
+                        style="tango",)
+                )
+                pagure.lib.cache.set_highlighted_file(
+                    oid, lexer.name, truncated, content)
             output_type = 'file'
         else:
             output_type = 'binary'
@@ -541,6 +608,7 @@ def view_file(repo, identifier, filename, username=None):
             filename=filename,
             content=content,
             output_type=output_type,
+            truncated=truncated,
             repo_admin=is_repo_admin(repo),
         ),
         200,
@@ -548,6 +616,44 @@ def view_file(repo, identifier, filename, username=None):
     )
 
 
+def _stream_raw_content(data, etag, headers, chunk_size=64 * 1024):
+    """ Return a response sending the provided data by chunks of
+    ``chunk_size`` bytes, with the provided ETag and headers.
+
+    If the request asks for a single range of bytes, only this range is
+    sent, unless the request has an If-Range header which does not match
+    the ETag.
+    """
+    length = len(data)
+    start, stop = 0, length
+    status = 200
+
+    headers['ETag'] = '"%s"' % etag
+    headers['Accept-Ranges'] = 'bytes'
+
+    if_range = flask.request.headers.get('If-Range', '').strip('"')
+    rng = flask.request.range
+    if rng and len(rng.ranges) == 1 and (not if_range or if_range == etag):
+        byte_range = rng.range_for_length(length)
+        if byte_range is None:
+            headers['Content-Range'] = 'bytes */%s' % length
+            return flask.Response(status=416, headers=headers)
+        start, stop = byte_range
+        status = 206
+        headers['Content-Range'] = 'bytes %s-%s/%s' % (
+            start, stop - 1, length)
+
+    headers['Content-Length'] = str(stop - start)
+
+    def generate():
+        """ Yield the content to send, chunk by chunk. """
+        for idx in range(start, stop, chunk_size):
+            yield data[idx:min(idx + chunk_size, stop)]
+
+    return flask.Response(
+        generate(), status=status, headers=headers, direct_passthrough=True)
+
+
 @APP.route('/<repo:repo>/raw/<path:identifier>', defaults={'filename': None})
 @APP.route('/<repo:repo>/raw/<path:identifier>/f/<path:filename>')
 @APP.route('/fork/<username>/<repo:repo>/raw/<path:identifier>',
@@ -563,7 +669,7 @@ def view_raw_file(repo, identifier, filename=None, username=None):
 
     reponame = pagure.get_repo_path(repo)
 
-    repo_obj = pygit2.Repository(reponame)
+    repo_obj = pagure.lib.repo.get_repo(reponame)
 
     if repo_obj.is_empty:
         flask.abort(404, 'Empty repo cannot have a file')
@@ -594,9 +700,18 @@ def view_raw_file(repo, identifier, filename=None, username=None):
         if not content or isinstance(content, pygit2.Tree):
             flask.abort(404, 'File not found')
 
+        etag = content.oid.hex
+        if flask.request.if_none_match.contains(etag):
+            return flask.Response(status=304, headers={'ETag': '"%s"' % etag})
+
         mimetype, encoding = mimetypes.guess_type(filename)
         data = repo_obj[content.oid].data
     else:
+        # The patch of a commit never changes, the commit identifies it
+        etag = commit.oid.hex
+        if flask.request.if_none_match.contains(etag):
+            return flask.Response(status=304, headers={'ETag': '"%s"' % etag})
+
         if commit.parents:
             diff = commit.tree.diff_to_tree()
 
@@ -608,7 +723,8 @@ def view_raw_file(repo, identifier, filename=None, username=None):
         else:
             # First commit in the repo
             diff = commit.tree.diff_to_tree(swap=True)
-        data = diff.patch
+        # The patch is sent as is, by ranges of bytes
+        data = ktc.to_bytes(diff.patch or '')
 
     if not data:
         flask.abort(404, 'No content found')
@@ -618,7 +734,7 @@ def view_raw_file(repo, identifier, filename=None, username=None):
 
     headers = {}
     if not mimetype:
-        if '\0' in data:
+        if '\0' in data[:1024]:
             mimetype = 'application/octet-stream'
         else:
             mimetype = 'text/plain'
@@ -627,13 +743,13 @@ def view_raw_file(repo, identifier, filename=None, username=None):
         headers['Content-Disposition'] = 'attachment'
 
     if mimetype.startswith('text/') and not encoding:
-        encoding = chardet.detect(ktc.to_bytes(data))['encoding']
+        encoding = pagure.lib.encoding_utils.guess_encoding(data)
 
     headers['Content-Type'] = mimetype
     if encoding:
         headers['Content-Encoding'] = encoding
 
-    return (data, 200, headers)
+    return _stream_raw_content(data, etag, headers)
 
 
 if APP.config.get('OLD_VIEW_COMMIT_ENABLED', False):
@@ -663,6 +779,7 @@ if APP.config.get('OLD_VIEW_COMMIT_ENABLED', False):
 @APP.route('/<repo:repo>/c/<commitid>')
 @APP.route('/fork/<username>/<repo:repo>/c/<commitid>/')
 @APP.route('/fork/<username>/<repo:repo>/c/<commitid>')
+@conditional_get()
 def view_commit(repo, commitid, username=None):
     """ Render a commit in a repo
     """
@@ -673,7 +790,7 @@ def view_commit(repo, commitid, username=None):
 
     reponame = pagure.get_repo_path(repo)
 
-    repo_obj = pygit2.Repository(reponame)
+    repo_obj = pagure.lib.repo.get_repo(reponame)
 
     branchname = flask.request.args.get('branch', None)
 
@@ -688,14 +805,9 @@ def view_commit(repo, commitid, username=None):
     if commit is None:
         flask.abort(404, 'Commit not found')
 
-    if commit.parents:
-        diff = commit.tree.diff_to_tree()
-
-        parent = repo_obj.revparse_single('%s^' % commitid)
-        diff = repo_obj.diff(parent, commit)
-    else:
-        # First commit in the repo
-        diff = commit.tree.diff_to_tree(swap=True)
+    diff = pagure.lib.git.get_commit_diff(repo_obj, commit)
+    diff_stats = pagure.lib.git.get_commit_diff_stats(
+        repo_obj, commit, diff=diff)
 
     return flask.render_template(
         'commit.html',
@@ -707,12 +819,51 @@ def view_commit(repo, commitid, username=None):
         commitid=commitid,
         commit=commit,
         diff=diff,
+        diff_stats=diff_stats,
         form=pagure.forms.ConfirmationForm(),
     )
 
 
+@APP.route('/<repo:repo>/c/<commitid>/diff/<int:fileid>')
+@APP.route('/fork/<username>/<repo:repo>/c/<commitid>/diff/<int:fileid>')
+@conditional_get(user_dependent=False)
+def view_commit_diff(repo, commitid, fileid, username=None):
+    """ Render the diff of a single file of a commit, used to load on
+    demand the diffs too large to be rendered with the commit.
+    """
+    repo = pagure.lib.get_project(SESSION, repo, user=username)
+
+    if not repo:
+        flask.abort(404, 'Project not found')
+
+    reponame = pagure.get_repo_path(repo)
+
+    repo_obj = pagure.lib.repo.get_repo(reponame)
+
+    try:
+        commit = repo_obj.get(commitid)
+    except ValueError:
+        flask.abort(404, 'Commit not found')
+
+    if commit is None:
+        flask.abort(404, 'Commit not found')
+
+    diff = pagure.lib.git.get_commit_diff(repo_obj, commit)
+    patch = pagure.lib.git.get_diff_file(diff, fileid)
+    if patch is None:
+        flask.abort(404, 'File not found in this commit')
+
+    return flask.render_template(
+        'diff_file.html',
+        patch=patch,
+        info=pagure.lib.git.get_patch_info(patch),
+        fileid=fileid,
+    )
+
+
 @APP.route('/<repo:repo>/c/<commitid>.patch')
 @APP.route('/fork/<username>/<repo:repo>/c/<commitid>.patch')
+@conditional_get()
 def view_commit_patch(repo, commitid, username=None):
     """ Render a commit in a repo as patch
     """
@@ -723,7 +874,7 @@ def view_commit_patch(repo, commitid, username=None):
 
     reponame = pagure.get_repo_path(repo)
 
-    repo_obj = pygit2.Repository(reponame)
+    repo_obj = pagure.lib.repo.get_repo(reponame)
 
     try:
         commit = repo_obj.get(commitid)
@@ -733,9 +884,9 @@ def view_commit_patch(repo, commitid, username=None):
     if commit is None:
         flask.abort(404, 'Commit not found')
 
-    patch = pagure.lib.git.commit_to_patch(repo_obj, commit)
-
-    return flask.Response(patch, content_type="text/plain;charset=UTF-8")
+    return flask.Response(
+        pagure.lib.git.stream_commits_patch(repo_obj, commit),
+        content_type="text/plain;charset=UTF-8")
 
 
 @APP.route('/<repo:repo>/tree/')
@@ -744,6 +895,7 @@ def view_commit_patch(repo, commitid, username=None):
 @APP.route('/fork/<username>/<repo:repo>/tree/')
 @APP.route('/fork/<username>/<repo:repo>/tree')
 @APP.route('/fork/<username>/<repo:repo>/tree/<path:identifier>')
+@conditional_get()
 def view_tree(repo, identifier=None, username=None):
     """ Render the tree of the repo
     """
@@ -754,7 +906,7 @@ def view_tree(repo, identifier=None, username=None):
 
     reponame = pagure.get_repo_path(repo)
 
-    repo_obj = pygit2.Repository(reponame)
+    repo_obj = pagure.lib.repo.get_repo(reponame)
 
     branchname = None
     content = None
@@ -824,6 +976,7 @@ def view_forks(repo, username=None):
 @APP.route('/<repo:repo>/releases')
 @APP.route('/fork/<username>/<repo:repo>/releases/')
 @APP.route('/fork/<username>/<repo:repo>/releases')
+@conditional_get()
 def view_tags(repo, username=None):
     """ Presents all the tags of the project.
     """
@@ -833,16 +986,28 @@ def view_tags(repo, username=None):
         flask.abort(404, 'Project not found')
 
     reponame = pagure.get_repo_path(repo)
-    repo_obj = pygit2.Repository(reponame)
+    repo_obj = pagure.lib.repo.get_repo(reponame)
+
+    try:
+        page = int(flask.request.args.get('page', 1))
+    except ValueError:
+        page = 1
+
+    limit = APP.config['ITEM_PER_PAGE']
+    start = limit * (page - 1)
+    end = limit * page
 
     tags = pagure.lib.git.get_git_tags_objects(repo)
+    total_page = int(ceil(len(tags) / float(limit)))
 
     return flask.render_template(
         'releases.html',
         select='tags',
         username=username,
         repo=repo,
-        tags=tags,
+        tags=tags[start:end],
+        page=page,
+        total_page=total_page,
         repo_admin=is_repo_admin(repo),
         repo_obj=repo_obj,
     )
@@ -924,7 +1089,7 @@ def view_settings(repo, username=None):
             'You are not allowed to change the settings for this project')
 
     reponame = pagure.get_repo_path(repo)
-    repo_obj = pygit2.Repository(reponame)
+    repo_obj = pagure.lib.repo.get_repo(reponame)
 
     plugins = pagure.ui.plugins.get_plugin_names(
         APP.config.get('DISABLED_PLUGINS'))
@@ -1227,7 +1392,7 @@ def change_ref_head(repo, username=None):
             403,
             'You are not allowed to change the settings for this project')
     repopath = pagure.get_repo_path(repo)
-    repo_obj = pygit2.Repository(repopath)
+    repo_obj = pagure.lib.repo.get_repo(repopath)
     branches = repo_obj.listall_branches()
     form = pagure.forms.DefaultBranchForm(branches=branches)
 
@@ -1270,6 +1435,17 @@ def delete_repo(repo, username=None):
             403,
             'You are not allowed to change the settings for this project')
 
+    # The forks sharing the objects of the project need their own copy
+    for fork in repo.forks:
+        try:
+            pagure.lib.git.dissociate_repo(
+                os.path.join(APP.config['GIT_FOLDER'], fork.path))
+        except pagure.exceptions.PagureException as err:
+            APP.logger.exception(err)
+            flask.flash('Could not delete the project', 'error')
+            return flask.redirect(flask.url_for(
+                'view_settings', username=username, repo=repo.name))
+
     try:
         for issue in repo.issues:
             for comment in issue.comments:
@@ -1609,27 +1785,39 @@ def regenerate_git(repo, username=None):
 
     form = pagure.forms.ConfirmationForm()
     if form.validate_on_submit():
-        if regenerate.lower() == 'requests':
-            for request in repo.requests:
-                pagure.lib.git.update_git(
-                    request, repo=repo,
-                    repofolder=APP.config['REQUESTS_FOLDER'])
-            flask.flash('Requests git repo updated')
-        elif regenerate.lower() == 'tickets':
-            for ticket in repo.issues:
-                # Do not store private issues in the git
-                if ticket.private:
-                    continue
-                pagure.lib.git.update_git(
-                    ticket, repo=repo,
-                    repofolder=APP.config['TICKETS_FOLDER'])
-            flask.flash('Tickets git repo updated')
+        pagure.lib.git.regenerate_git_in_background(repo, regenerate.lower())
+        flask.flash(
+            '%s git repo is being regenerated' % regenerate.capitalize())
 
     return flask.redirect(
         flask.url_for('.view_settings', repo=repo.name, username=username)
     )
 
 
+@APP.route('/<repo:repo>/regenerate/<kind>/status')
+@APP.route('/fork/<username>/<repo:repo>/regenerate/<kind>/status')
+@login_required
+def regenerate_git_status(repo, kind, username=None):
+    """ Return the progress of the regeneration of the specified git repo.
+    """
+    repo = pagure.lib.get_project(SESSION, repo, user=username)
+
+    if not repo:
+        flask.abort(404, 'Project not found')
+
+    if not is_repo_admin(repo):
+        flask.abort(403, 'You are not allowed to regenerate the git repos')
+
+    if kind not in ['tickets', 'requests']:
+        flask.abort(400, 'You can only regenerate tickest or requests repos')
+
+    info = pagure.lib.git.get_regeneration_progress(repo.id, kind)
+    if info is None:
+        flask.abort(404, 'This git repo was not regenerated recently')
+
+    return flask.jsonify(info)
+
+
 @APP.route('/<repo:repo>/token/new/', methods=('GET', 'POST'))
 @APP.route('/<repo:repo>/token/new', methods=('GET', 'POST'))
 @APP.route('/fork/<username>/<repo:repo>/token/new/', methods=('GET', 'POST'))
@@ -1764,7 +1952,7 @@ def edit_file(repo, branchname, filename, username=None):
 
     reponame = pagure.get_repo_path(repo)
 
-    repo_obj = pygit2.Repository(reponame)
+    repo_obj = pagure.lib.repo.get_repo(reponame)
 
     if repo_obj.is_empty:
         flask.abort(404, 'Empty repo cannot have a file')
@@ -1851,7 +2039,7 @@ def delete_branch(repo, branchname, username=None):
         flask.abort(403, 'You are not allowed to delete the master branch')
 
     reponame = pagure.get_repo_path(repo_obj)
-    repo_git = pygit2.Repository(reponame)
+    repo_git = pagure.lib.repo.get_repo(reponame)
 
     if branchname not in repo_git.listall_branches():
         flask.abort(404, 'Branch no found')
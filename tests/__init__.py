@@ -34,7 +34,9 @@ sys.path.insert(0, os.path.join(os.path.dirname(
 
 import pagure
 import pagure.lib
+import pagure.lib.git
 import pagure.lib.model
+import pagure.lib.repo
 from pagure.lib.repo import PagureRepo
 
 DB_PATH = 'sqlite:///:memory:'
@@ -101,6 +103,11 @@ class Modeltests(unittest.TestCase):
                 shutil.rmtree(folder)
             os.mkdir(folder)
 
+        # Do not keep open the git repositories of the previous test
+        pagure.lib.repo.REPO_POOL.clear()
+        # Only check if the pull-requests can be merged when asked to
+        pagure.lib.git.MERGEABILITY_WORKER.workers = 0
+
         self.session = pagure.lib.model.create_tables(
             DB_PATH, acls=pagure.APP.config.get('ACLS', {}))
 
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+
+"""
+ (c) 2016 - Copyright Red Hat Inc
+
+ Authors:
+   Pierre-Yves Chibon <pingou@pingoured.fr>
+
+ Compare the time needed by the two merge engines of pagure.lib.git to
+ check if a pull-request can be merged and to merge it.
+
+ Usage: python tests/benchmark_merge.py [number of files] [iterations]
+
+"""
+
+__requires__ = ['SQLAlchemy >= 0.8']
+import pkg_resources
+
+import os
+import sys
+import time
+
+from mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(
+    os.path.abspath(__file__)), '..'))
+
+import pygit2
+
+import pagure.lib.git
+import tests
+
+
+class MergeBenchmark(tests.Modeltests):
+    """ Benchmark of the merge engines of pagure.lib.git """
+
+    nfiles = 1000
+    iterations = 10
+
+    def setUp(self):
+        """ Set up the environnment, ran before every benchmarks. """
+        super(MergeBenchmark, self).setUp()
+
+        pagure.lib.git.SESSION = self.session
+        pagure.APP.config['GIT_FOLDER'] = os.path.join(
+            tests.HERE, 'repos')
+        pagure.APP.config['REQUESTS_FOLDER'] = None
+
+        tests.create_projects(self.session)
+        self.gitpath = os.path.join(tests.HERE, 'repos', 'test.git')
+        pygit2.init_repository(self.gitpath, bare=True)
+        files = dict(
+            ('folder%s/file%s' % (idx % 10, idx), 'content %s\n' % idx)
+            for idx in range(self.nfiles))
+        pagure.lib.git._commit_files_in_bare_repo(
+            self.gitpath, files, 'Add %s files' % self.nfiles)
+
+        self.forkpath = os.path.join(tests.HERE, 'repos', 'test2.git')
+        pygit2.clone_repository(self.gitpath, self.forkpath, bare=True)
+        pagure.lib.git._commit_files_in_bare_repo(
+            self.forkpath, {'folder0/file0': 'new content\n'},
+            'Edit folder0/file0')
+        # Have the project move on so a merge commit is needed
+        pagure.lib.git._commit_files_in_bare_repo(
+            self.gitpath, {'folder1/file1': 'new content\n'},
+            'Edit folder1/file1')
+
+    def _new_request(self):
+        """ Open a new pull-request from test2 to test. """
+        req = pagure.lib.new_pull_request(
+            session=self.session,
+            repo_from=pagure.lib.get_project(self.session, 'test2'),
+            branch_from='master',
+            repo_to=pagure.lib.get_project(self.session, 'test'),
+            branch_to='master',
+            title='Edit folder0/file0',
+            user='pingou',
+            requestfolder=None,
+        )
+        self.session.commit()
+        return req
+
+    def _time(self, merge, domerge):
+        """ Return the average time spent by the specified merge engine to
+        check or merge a pull-request.
+        """
+        gitrepo = pygit2.Repository(self.gitpath)
+        head = gitrepo.lookup_reference('refs/heads/master').target
+        total = 0
+        for _ in range(self.iterations):
+            req = self._new_request()
+            start = time.time()
+            output = merge(
+                self.session, req, 'pingou', None, domerge=domerge)
+            total += time.time() - start
+            assert output in ('MERGE', 'Changes merged!'), output
+            # Restore the project as it was
+            gitrepo.lookup_reference('refs/heads/master').set_target(head)
+        return total / self.iterations
+
+    @patch('pagure.lib.notify.send_email')
+    def run_benchmark(self, send_email):
+        """ Time both merge engines and print the results. """
+        send_email.return_value = True
+        print 'Repository of %s files, average over %s runs' % (
+            self.nfiles, self.iterations)
+        print '%-20s %12s %12s' % ('engine', 'check (s)', 'merge (s)')
+        for name, merge in [
+                ('clone', pagure.lib.git._merge_pull_request_in_clone),
+                ('bare', pagure.lib.git._merge_pull_request_in_bare_repo)]:
+            print '%-20s %12.4f %12.4f' % (
+                name, self._time(merge, False), self._time(merge, True))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        MergeBenchmark.nfiles = int(sys.argv[1])
+    if len(sys.argv) > 2:
+        MergeBenchmark.iterations = int(sys.argv[2])
+    BENCHMARK = MergeBenchmark('run_benchmark')
+    BENCHMARK.setUp()
+    try:
+        BENCHMARK.run_benchmark()
+    finally:
+        BENCHMARK.tearDown()
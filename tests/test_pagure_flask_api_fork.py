@@ -631,6 +631,68 @@ class PagureFlaskApiForktests(tests.Modeltests):
             self.session, project_id=1, requestid=1)
         self.assertEqual(len(request.comments), 1)
 
+    @patch('pagure.lib.notify.send_email')
+    def test_api_pull_request_inline_comments(self, mockemail):
+        """ Test the api_pull_request_inline_comments method of the flask
+        api. """
+        mockemail.return_value = True
+
+        tests.create_projects(self.session)
+
+        output = self.app.get('/api/0/test/pull-request/1/comments/inline')
+        self.assertEqual(output.status_code, 404)
+        data = json.loads(output.data)
+        self.assertEqual(data['error_code'], 'ENOREQ')
+
+        # Create a pull-request with some comments
+        repo = pagure.lib.get_project(self.session, 'test')
+        req = pagure.lib.new_pull_request(
+            session=self.session,
+            repo_from=repo,
+            branch_from='master',
+            repo_to=repo,
+            branch_to='master',
+            title='test pull-request',
+            user='pingou',
+            requestfolder=None,
+        )
+        self.session.commit()
+        for commit, filename, row, comment in [
+                (None, None, None, 'General comment'),
+                ('commithash', 'sources', 2, 'Line 2'),
+                ('commithash', 'README', 1, 'Line 1')]:
+            pagure.lib.add_pull_request_comment(
+                session=self.session,
+                request=req,
+                commit=commit,
+                tree_id=None,
+                filename=filename,
+                row=row,
+                comment=comment,
+                user='pingou',
+                requestfolder=None,
+            )
+        self.session.commit()
+
+        output = self.app.get('/api/0/test/pull-request/1/comments/inline')
+        self.assertEqual(output.status_code, 200)
+        data = json.loads(output.data)
+        self.assertEqual(data['total_comments'], 2)
+        self.assertEqual(
+            [(f['commit'], f['filename']) for f in data['files']],
+            [('commithash', 'README'), ('commithash', 'sources')])
+        comment = data['files'][1]['comments'][0]
+        self.assertEqual(comment['comment'], 'Line 2')
+        self.assertEqual(comment['line'], 2)
+        self.assertEqual(comment['user']['name'], 'pingou')
+
+        output = self.app.get(
+            '/api/0/test/pull-request/1/comments/inline?filename=sources')
+        self.assertEqual(output.status_code, 200)
+        data = json.loads(output.data)
+        self.assertEqual(data['total_comments'], 1)
+        self.assertEqual(data['files'][0]['filename'], 'sources')
+
     @patch('pagure.lib.notify.send_email')
     def test_api_pull_request_add_flag(self, mockemail):
         """ Test the api_pull_request_add_flag method of the flask api. """
@@ -229,6 +229,56 @@ class PagureFlaskApiProjecttests(tests.Modeltests):
             }
         )
 
+    def test_api_commit_diff(self):
+        """ Test the api_commit_diff and api_commit_diff_file methods of
+        the flask api. """
+        tests.create_projects(self.session)
+
+        gitrepo = os.path.join(tests.HERE, 'repos', 'test.git')
+        repo = pygit2.init_repository(gitrepo, bare=True)
+        pagure.lib.git._commit_files_in_bare_repo(
+            gitrepo, {'sources': 'foo\n bar'}, 'Add sources file')
+        commit = repo.revparse_single('master')
+
+        output = self.app.get('/api/0/foo/c/%s/diff' % commit.oid.hex)
+        self.assertEqual(output.status_code, 404)
+        output = self.app.get('/api/0/test/c/bar/diff')
+        self.assertEqual(output.status_code, 404)
+        data = json.loads(output.data)
+        self.assertEqual(data['error_code'], 'ENOCOMMIT')
+
+        output = self.app.get('/api/0/test/c/%s/diff' % commit.oid.hex)
+        self.assertEqual(output.status_code, 200)
+        data = json.loads(output.data)
+        self.assertEqual(data['total_files'], 1)
+        blob = repo[commit.tree['sources'].oid]
+        self.assertDictEqual(
+            data['files'][0],
+            {
+                'binary': False,
+                'fileid': 1,
+                'lines_added': 2,
+                'lines_removed': 0,
+                'new_id': blob.oid.hex,
+                'new_path': 'sources',
+                'old_id': '0' * 40,
+                'old_path': 'sources',
+                'status': 'A',
+            }
+        )
+
+        output = self.app.get('/api/0/test/c/%s/diff/2' % commit.oid.hex)
+        self.assertEqual(output.status_code, 404)
+        data = json.loads(output.data)
+        self.assertEqual(data['error_code'], 'ENODIFFFILE')
+
+        output = self.app.get('/api/0/test/c/%s/diff/1' % commit.oid.hex)
+        self.assertEqual(output.status_code, 200)
+        data = json.loads(output.data)
+        self.assertEqual(data['file']['new_path'], 'sources')
+        self.assertTrue(
+            data['diff'].startswith('@@ -0,0 +1,2 @@\n+ foo\n+  bar'))
+
     @patch('pagure.lib.git.generate_gitolite_acls')
     def test_api_new_project(self, p_gga):
         """ Test the api_new_project method of the flask api. """
@@ -1456,6 +1456,31 @@ class PagureFlaskRepotests(tests.Modeltests):
         output = self.app.get('/test/raw/master/f/sources')
         self.assertEqual(output.status_code, 200)
         self.assertTrue('foo\n bar' in output.data)
+        self.assertEqual(output.headers['Accept-Ranges'], 'bytes')
+        etag = output.headers['ETag']
+
+        # Same content as the one already downloaded
+        output = self.app.get(
+            '/test/raw/master/f/sources', headers={'If-None-Match': etag})
+        self.assertEqual(output.status_code, 304)
+        self.assertEqual(output.data, '')
+
+        # Download only some bytes
+        output = self.app.get(
+            '/test/raw/master/f/sources', headers={'Range': 'bytes=1-5'})
+        self.assertEqual(output.status_code, 206)
+        self.assertEqual(output.data, 'oo\n b')
+        self.assertEqual(output.headers['Content-Range'], 'bytes 1-5/8')
+
+        output = self.app.get(
+            '/test/raw/master/f/sources',
+            headers={'Range': 'bytes=1-5', 'If-Range': '"foo"'})
+        self.assertEqual(output.status_code, 200)
+        self.assertEqual(output.data, 'foo\n bar')
+
+        output = self.app.get(
+            '/test/raw/master/f/sources', headers={'Range': 'bytes=10-'})
+        self.assertEqual(output.status_code, 416)
 
         # View what's supposed to be an image
         output = self.app.get('/test/raw/master/f/test.jpg')
@@ -1526,6 +1551,115 @@ class PagureFlaskRepotests(tests.Modeltests):
         self.assertEqual(output.status_code, 200)
         self.assertTrue('foo\n bar' in output.data)
 
+    def test_view_raw_file_non_ascii(self):
+        """ Test the view_raw_file endpoint with a patch containing non-ASCII
+        characters. """
+        tests.create_projects(self.session)
+        tests.create_projects_git(tests.HERE, bare=True)
+        gitpath = os.path.join(tests.HERE, 'test.git')
+        tests.add_readme_git_repo(gitpath)
+        content = u'Ça va très bien\n'.encode('utf-8')
+        commitid = pagure.lib.git._commit_files_in_bare_repo(
+            gitpath, {'accents': content}, 'Add accents').hex
+
+        output = self.app.get('/test/raw/%s' % commitid)
+        self.assertEqual(output.status_code, 200)
+        self.assertTrue('+%s' % content in output.data)
+        self.assertEqual(
+            output.headers['Content-Length'], str(len(output.data)))
+
+        # The ranges are of bytes, not of characters
+        start = output.data.index(content)
+        output = self.app.get(
+            '/test/raw/%s' % commitid,
+            headers={'Range': 'bytes=%s-%s' % (
+                start, start + len(content) - 1)})
+        self.assertEqual(output.status_code, 206)
+        self.assertEqual(output.data, content)
+
+    def test_view_commit_conditional_get(self):
+        """ Test the ETags of the pages showing the content of the git
+        repository. """
+        tests.create_projects(self.session)
+        tests.create_projects_git(tests.HERE, bare=True)
+        tests.add_readme_git_repo(os.path.join(tests.HERE, 'test.git'))
+        repo = pygit2.Repository(os.path.join(tests.HERE, 'test.git'))
+        commit = repo.revparse_single('HEAD')
+
+        # Page addressed by a commit
+        output = self.app.get('/test/c/%s' % commit.oid.hex)
+        self.assertEqual(output.status_code, 200)
+        self.assertEqual(
+            output.headers['Cache-Control'], 'public, max-age=300')
+        commit_etag = output.headers['ETag']
+
+        output = self.app.get(
+            '/test/c/%s' % commit.oid.hex,
+            headers={'If-None-Match': commit_etag})
+        self.assertEqual(output.status_code, 304)
+        self.assertEqual(output.data, '')
+
+        # Page addressed by a branch
+        output = self.app.get('/test/tree/master')
+        self.assertEqual(output.status_code, 200)
+        self.assertEqual(output.headers['Cache-Control'], 'no-cache')
+        etag = output.headers['ETag']
+
+        output = self.app.get(
+            '/test/tree/master', headers={'If-None-Match': etag})
+        self.assertEqual(output.status_code, 304)
+
+        # The branch moved
+        tests.add_content_git_repo(os.path.join(tests.HERE, 'test.git'))
+        output = self.app.get(
+            '/test/tree/master', headers={'If-None-Match': etag})
+        self.assertEqual(output.status_code, 200)
+        self.assertNotEqual(output.headers['ETag'], etag)
+
+        # The commit did not
+        output = self.app.get(
+            '/test/c/%s' % commit.oid.hex,
+            headers={'If-None-Match': commit_etag})
+        self.assertEqual(output.status_code, 304)
+
+        # An issue is opened, the number of open issues shown changes
+        project = pagure.lib.get_project(self.session, 'test')
+        pagure.lib.new_issue(
+            self.session,
+            project,
+            title='foo',
+            content='bar',
+            user='pingou',
+            ticketfolder=None,
+            notify=False)
+        self.session.commit()
+        output = self.app.get(
+            '/test/c/%s' % commit.oid.hex,
+            headers={'If-None-Match': commit_etag})
+        self.assertEqual(output.status_code, 200)
+        self.assertNotEqual(output.headers['ETag'], commit_etag)
+
+        # The pages of a fork change with its parent
+        project.parent_id = 2
+        self.session.add(project)
+        self.session.commit()
+        forkpath = os.path.join(tests.HERE, 'forks', 'pingou', 'test.git')
+        tests.add_content_git_repo(forkpath)
+        tests.add_content_git_repo(os.path.join(tests.HERE, 'test2.git'))
+        output = self.app.get('/fork/pingou/test')
+        self.assertEqual(output.status_code, 200)
+        etag = output.headers['ETag']
+
+        output = self.app.get(
+            '/fork/pingou/test', headers={'If-None-Match': etag})
+        self.assertEqual(output.status_code, 304)
+
+        tests.add_readme_git_repo(os.path.join(tests.HERE, 'test2.git'))
+        output = self.app.get(
+            '/fork/pingou/test', headers={'If-None-Match': etag})
+        self.assertEqual(output.status_code, 200)
+        self.assertNotEqual(output.headers['ETag'], etag)
+
     def test_view_commit(self):
         """ Test the view_commit endpoint. """
         output = self.app.get('/foo/c/bar')
@@ -1668,6 +1802,46 @@ class PagureFlaskRepotests(tests.Modeltests):
             in output.data)
 
 
+    def test_view_commit_diff(self):
+        """ Test the view_commit_diff endpoint. """
+        tests.create_projects(self.session)
+        tests.create_projects_git(tests.HERE, bare=True)
+
+        # Add a README to the git repo - First commit
+        tests.add_readme_git_repo(os.path.join(tests.HERE, 'test.git'))
+        repo = pygit2.Repository(os.path.join(tests.HERE, 'test.git'))
+        commit = repo.revparse_single('HEAD')
+
+        output = self.app.get('/test/c/bar/diff/1')
+        self.assertEqual(output.status_code, 404)
+        output = self.app.get('/test/c/%s/diff/2' % commit.oid.hex)
+        self.assertEqual(output.status_code, 404)
+
+        # The README is small enough to be rendered with the commit
+        output = self.app.get('/test/c/%s' % commit.oid.hex)
+        self.assertEqual(output.status_code, 200)
+        self.assertNotIn('class="card-block lazy_diff"', output.data)
+        self.assertIn(
+            '<span style="color: #00A000">+ Pagure</span>', output.data)
+
+        # But not anymore
+        with patch.dict(pagure.APP.config, {'MAX_DIFF_LINES_RENDERED': 10}):
+            output = self.app.get('/test/c/%s' % commit.oid.hex)
+            self.assertEqual(output.status_code, 200)
+            self.assertIn('class="card-block lazy_diff"', output.data)
+            self.assertIn(
+                'data-url="/test/c/%s/diff/1"' % commit.oid.hex,
+                output.data)
+            self.assertNotIn(
+                '<span style="color: #00A000">+ Pagure</span>', output.data)
+
+        # The diff is loaded on demand
+        output = self.app.get('/test/c/%s/diff/1' % commit.oid.hex)
+        self.assertEqual(output.status_code, 200)
+        self.assertIn(
+            '<span style="color: #00A000">+ Pagure</span>', output.data)
+        self.assertNotIn('<html', output.data)
+
     def test_view_commit_patch(self):
         """ Test the view_commit_patch endpoint. """
 
@@ -2406,7 +2580,7 @@ index 0000000..fb7093d
 
     @patch('pagure.lib.notify.send_email')
     @patch('pagure.ui.repo.admin_session_timedout')
-    @patch('pagure.lib.git.update_git')
+    @patch('pagure.lib.git.regenerate_git_in_background')
     def test_regenerate_git(self, upgit, ast, sendmail):
         """ Test the regenerate_git endpoint. """
         ast.return_value = False
@@ -2467,8 +2641,9 @@ index 0000000..fb7093d
                 '/test/regenerate', data=data, follow_redirects=True)
             self.assertEqual(output.status_code, 200)
             self.assertIn(
-                '</button>\n                      Tickets git repo updated',
-                output.data)
+                '</button>\n                      Tickets git repo is being '
+                'regenerated', output.data)
+            self.assertEqual(upgit.call_args[0][1], 'tickets')
 
             # Create a request to play with
             repo = pagure.lib.get_project(self.session, 'test')
@@ -2490,8 +2665,23 @@ index 0000000..fb7093d
                 '/test/regenerate', data=data, follow_redirects=True)
             self.assertEqual(output.status_code, 200)
             self.assertIn(
-                '</button>\n                      Requests git repo updated',
-                output.data)
+                '</button>\n                      Requests git repo is being '
+                'regenerated', output.data)
+            self.assertEqual(upgit.call_args[0][1], 'requests')
+
+            # No regeneration is known
+            output = self.app.get('/test/regenerate/requests/status')
+            self.assertEqual(output.status_code, 404)
+            output = self.app.get('/test/regenerate/foo/status')
+            self.assertEqual(output.status_code, 400)
+
+            pagure.lib.git._set_regeneration_progress(
+                repo.id, 'requests', status='running', done=100, total=150)
+            output = self.app.get('/test/regenerate/requests/status')
+            self.assertEqual(output.status_code, 200)
+            self.assertEqual(
+                json.loads(output.data),
+                {'status': 'running', 'done': 100, 'total': 150})
 
     def test_view_tags(self):
         """ Test the view_tags endpoint. """
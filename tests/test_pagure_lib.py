@@ -1332,6 +1332,74 @@ class PagureLibtests(tests.Modeltests):
         self.assertEqual(len(request.comments), 1)
         self.assertEqual(request.score, 0)
 
+    @patch('pagure.lib.notify.send_email')
+    def test_get_inline_comments_index(self, mockemail):
+        """ Test get_inline_comments_index of pagure.lib. """
+        mockemail.return_value = True
+
+        self.test_new_pull_request()
+
+        request = pagure.lib.search_pull_requests(self.session, requestid=1)
+        self.assertEqual(pagure.lib.get_inline_comments_index(request), {})
+
+        for commit, filename, row, comment in [
+                (None, None, None, 'General comment'),
+                ('commithash', 'file', 3, 'Line 3'),
+                ('commithash', 'file', 1, 'Line 1'),
+                ('commithash', 'file', 3, 'Line 3 again'),
+                ('commithash', 'other', 1, 'Other file'),
+                ('commithash2', 'file', 1, 'Other commit')]:
+            pagure.lib.add_pull_request_comment(
+                session=self.session,
+                request=request,
+                commit=commit,
+                tree_id=None,
+                filename=filename,
+                row=row,
+                comment=comment,
+                user='foo',
+                requestfolder=None,
+            )
+        self.session.commit()
+
+        index = pagure.lib.get_inline_comments_index(request)
+        self.assertEqual(
+            sorted(index),
+            [('commithash', 'file'), ('commithash', 'other'),
+             ('commithash2', 'file')])
+        self.assertEqual(
+            dict(
+                (line, [com.comment for com in coms])
+                for line, coms in index[('commithash', 'file')].items()),
+            {1: ['Line 1'], 3: ['Line 3', 'Line 3 again']})
+
+        comments = pagure.lib.get_inline_comments(
+            request, 'commithash', 'other')
+        self.assertEqual(
+            [com.comment for com in comments[1]], ['Other file'])
+        self.assertEqual(
+            pagure.lib.get_inline_comments(request, 'commithash', 'foo'),
+            {})
+
+        # The index is refreshed when comments are added
+        pagure.lib.add_pull_request_comment(
+            session=self.session,
+            request=request,
+            commit='commithash',
+            tree_id=None,
+            filename='other',
+            row=1,
+            comment='Other file again',
+            user='foo',
+            requestfolder=None,
+        )
+        self.session.commit()
+        comments = pagure.lib.get_inline_comments(
+            request, 'commithash', 'other')
+        self.assertEqual(
+            [com.comment for com in comments[1]],
+            ['Other file', 'Other file again'])
+
     @patch('pagure.lib.notify.send_email')
     def test_add_pull_request_flag(self, mockemail):
         """ Test add_pull_request_flag of pagure.lib. """
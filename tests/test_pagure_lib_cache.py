@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+
+"""
+ (c) 2016 - Copyright Red Hat Inc
+
+ Authors:
+   Pierre-Yves Chibon <pingou@pingoured.fr>
+
+"""
+
+__requires__ = ['SQLAlchemy >= 0.8']
+import pkg_resources
+
+import unittest
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(
+    os.path.abspath(__file__)), '..'))
+
+import pagure.doc_utils
+import pagure.lib.cache
+import tests
+
+
+class PagureLibCachetests(tests.Modeltests):
+    """ Tests for pagure.lib.cache """
+
+    def test_lru_cache(self):
+        """ Test the LRUCache object of pagure.lib.cache. """
+        cache = pagure.lib.cache.LRUCache(size=2)
+        self.assertEqual(cache.get('foo'), None)
+        self.assertEqual(cache.get('foo', 'bar'), 'bar')
+
+        cache.set('foo', 1)
+        cache.set('bar', 2)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.get('foo'), 1)
+
+        # bar is now the least recently used item
+        cache.set('baz', 3)
+        self.assertEqual(len(cache), 2)
+        self.assertTrue('foo' in cache)
+        self.assertFalse('bar' in cache)
+        self.assertEqual(cache.get('baz'), 3)
+
+        cache.delete('baz')
+        self.assertFalse('baz' in cache)
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+    def test_repo_overview(self):
+        """ Test the get/set_repo_overview methods of pagure.lib.cache. """
+        pagure.lib.cache.OVERVIEW_CACHE.clear()
+        self.assertEqual(
+            pagure.lib.cache.get_repo_overview('/tmp/test.git', 'key'),
+            None)
+
+        pagure.lib.cache.set_repo_overview(
+            '/tmp/test.git', 'key', {'head': 'master'})
+        self.assertEqual(
+            pagure.lib.cache.get_repo_overview('/tmp/test.git', 'key'),
+            {'head': 'master'})
+        # The HEAD moved
+        self.assertEqual(
+            pagure.lib.cache.get_repo_overview('/tmp/test.git', 'key2'),
+            None)
+
+    def test_rendered_markup(self):
+        """ Test the caching of the output of convert_readme. """
+        pagure.lib.cache.RENDER_CACHE.clear()
+        pagure.lib.cache.RENDER_CACHE.stats.clear()
+
+        output = pagure.doc_utils.convert_readme(
+            'Foo\n===\n', '.rst', oid='aaa')
+        self.assertTrue('<h1 class="title">Foo</h1>' in output[0])
+        self.assertTrue(output[1])
+        self.assertEqual(pagure.lib.cache.RENDER_CACHE.stats['misses'], 1)
+
+        # The content is not read, the blob identifier is what matters
+        self.assertEqual(
+            pagure.doc_utils.convert_readme('Bar', '.rst', oid='aaa'),
+            output)
+        self.assertEqual(pagure.lib.cache.RENDER_CACHE.stats['hits'], 1)
+
+        # Not the same extension
+        output2 = pagure.doc_utils.convert_readme(
+            'Foo\n===\n', '.txt', oid='aaa')
+        self.assertEqual(output2, ('<pre>Foo\n===\n</pre>', True))
+
+        # Without the blob identifier, nothing is cached
+        pagure.doc_utils.convert_readme('Foo', '.md')
+        stats = pagure.lib.cache.get_stats()['render']
+        self.assertEqual(stats['size'], 2)
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 2)
+
+    def test_highlighted_file(self):
+        """ Test the get/set_highlighted_file methods of pagure.lib.cache. """
+        pagure.lib.cache.HIGHLIGHT_CACHE.clear()
+        self.assertEqual(
+            pagure.lib.cache.get_highlighted_file('aaa', 'Python'), None)
+
+        pagure.lib.cache.set_highlighted_file(
+            'aaa', 'Python', False, '<div>foo</div>')
+        self.assertEqual(
+            pagure.lib.cache.get_highlighted_file('aaa', 'Python'),
+            '<div>foo</div>')
+        self.assertEqual(
+            pagure.lib.cache.get_highlighted_file('aaa', 'Text only'), None)
+        self.assertEqual(
+            pagure.lib.cache.get_highlighted_file(
+                'aaa', 'Python', truncated=True),
+            None)
+
+        stats = pagure.lib.cache.get_stats()['highlight']
+        self.assertEqual(stats['size'], 1)
+        self.assertEqual(stats['max_size'], 200)
+
+
+if __name__ == '__main__':
+    SUITE = unittest.TestLoader().loadTestsFromTestCase(PagureLibCachetests)
+    unittest.TextTestRunner(verbosity=2).run(SUITE)
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+
+"""
+ (c) 2016 - Copyright Red Hat Inc
+
+ Authors:
+   Pierre-Yves Chibon <pingou@pingoured.fr>
+
+"""
+
+__requires__ = ['SQLAlchemy >= 0.8']
+import pkg_resources
+
+import unittest
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(
+    os.path.abspath(__file__)), '..'))
+
+import pagure.lib.encoding_utils
+import tests
+
+
+class PagureLibEncodingUtilstests(tests.Modeltests):
+    """ Tests for pagure.lib.encoding_utils """
+
+    def test_guess_encoding(self):
+        """ Test the guess_encoding method of pagure.lib.encoding_utils. """
+        self.assertEqual(
+            pagure.lib.encoding_utils.guess_encoding('foo bar\n'), 'ascii')
+
+        data = u'Ça va très bien, merci à vous\n'.encode('utf-8') * 10
+        self.assertEqual(
+            pagure.lib.encoding_utils.guess_encoding(data), 'utf-8')
+
+        # Only the beginning of the data is analyzed, the accented part is
+        # long enough for any version of chardet to recognize it
+        data = 'foo bar\n' * 10 + \
+            u'Ça va très bien, merci à vous\n'.encode('utf-8') * 10
+        self.assertEqual(
+            pagure.lib.encoding_utils.guess_encoding(data, limit=20),
+            'ascii')
+        self.assertEqual(
+            pagure.lib.encoding_utils.guess_encoding(data, limit=0),
+            'utf-8')
+
+
+if __name__ == '__main__':
+    SUITE = unittest.TestLoader().loadTestsFromTestCase(
+        PagureLibEncodingUtilstests)
+    unittest.TextTestRunner(verbosity=2).run(SUITE)
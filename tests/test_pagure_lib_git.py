@@ -11,18 +11,23 @@
 __requires__ = ['SQLAlchemy >= 0.8']
 import pkg_resources
 
+import hashlib
 import json
 import unittest
 import shutil
 import sys
 import os
 import tempfile
+import threading
+import time
 import pygit2
-from mock import patch
+from cStringIO import StringIO
+from mock import patch, MagicMock
 
 sys.path.insert(0, os.path.join(os.path.dirname(
     os.path.abspath(__file__)), '..'))
 
+import pagure.lib.cache
 import pagure.lib.git
 import tests
 
@@ -419,6 +424,39 @@ index 9f44358..2a552bb 100644
         patch = '\n'.join(npatch)
         self.assertEqual(patch, exp)
 
+    def test_stream_commits_patch(self):
+        """ Test the stream_commits_patch function of pagure.lib.git. """
+        gitpath = os.path.join(tests.HERE, 'repos', 'test.git')
+        tests.add_content_git_repo(gitpath)
+        repo = pygit2.Repository(gitpath)
+        second_commit = repo.revparse_single('HEAD')
+        first_commit = second_commit.parents[0]
+        commits = [first_commit, second_commit]
+        oids = [first_commit.oid.hex, second_commit.oid.hex]
+        pagure.lib.cache.PATCH_CACHE.clear()
+
+        # One chunk per commit
+        chunks = list(pagure.lib.git.stream_commits_patch(repo, commits))
+        self.assertEqual(len(chunks), 2)
+        self.assertEqual(
+            ''.join(chunks),
+            pagure.lib.git.commit_to_patch(repo, commits).encode('utf-8'))
+
+        # The patch is then cached
+        self.assertEqual(
+            pagure.lib.cache.get_patch(oids), ''.join(chunks))
+        self.assertEqual(
+            list(pagure.lib.git.stream_commits_patch(repo, commits)),
+            [''.join(chunks)])
+
+        # Too big to be cached
+        with patch.dict(pagure.APP.config, {'MAX_CACHED_PATCH_SIZE': 10}):
+            chunks = list(
+                pagure.lib.git.stream_commits_patch(repo, second_commit))
+        self.assertEqual(len(chunks), 1)
+        self.assertEqual(
+            pagure.lib.cache.get_patch([second_commit.oid.hex]), None)
+
     @patch('pagure.lib.notify.send_email')
     def test_update_git(self, email_f):
         """ Test the update_git of pagure.lib.git. """
@@ -646,6 +684,503 @@ index 458821a..77674a8
         files = [entry.name for entry in commit.tree]
         self.assertEqual(files, [])
 
+    def test_commit_files_in_bare_repo(self):
+        """ Test the _commit_files_in_bare_repo method of pagure.lib.git. """
+        gitpath = os.path.join(tests.HERE, 'test_ticket_repo.git')
+        gitrepo = pygit2.init_repository(gitpath, bare=True)
+
+        # Nothing to remove in an empty repo
+        self.assertEqual(
+            pagure.lib.git._commit_files_in_bare_repo(
+                gitpath, {'foo': None}, 'Remove foo'),
+            None)
+        self.assertTrue(gitrepo.is_empty)
+
+        oid = pagure.lib.git._commit_files_in_bare_repo(
+            gitpath, {'foo': 'bar', 'baz': 'qux'}, 'Add foo and baz')
+        commit = gitrepo.revparse_single('HEAD')
+        self.assertEqual(commit.oid, oid)
+        self.assertEqual(commit.message, 'Add foo and baz')
+        self.assertEqual(commit.parents, [])
+        self.assertEqual(
+            sorted([entry.name for entry in commit.tree]), ['baz', 'foo'])
+        self.assertEqual(gitrepo[commit.tree['foo'].oid].data, 'bar')
+
+        # Nothing changed
+        self.assertEqual(
+            pagure.lib.git._commit_files_in_bare_repo(
+                gitpath, {'foo': 'bar'}, 'Update foo'),
+            None)
+
+        oid2 = pagure.lib.git._commit_files_in_bare_repo(
+            gitpath, {'foo': 'bar2', 'baz': None}, 'Update foo')
+        commit = gitrepo.revparse_single('HEAD')
+        self.assertEqual(commit.oid, oid2)
+        self.assertEqual([parent.oid for parent in commit.parents], [oid])
+        self.assertEqual([entry.name for entry in commit.tree], ['foo'])
+        self.assertEqual(gitrepo[commit.tree['foo'].oid].data, 'bar2')
+
+        # The reference is only updated if it did not move in between
+        self.assertFalse(
+            pagure.lib.git._update_ref(
+                gitrepo, 'refs/heads/master', oid, oid))
+        self.assertTrue(
+            pagure.lib.git._update_ref(
+                gitrepo, 'refs/heads/master', oid2, oid))
+        self.assertEqual(gitrepo.revparse_single('HEAD').oid, oid)
+
+        # The reference is locked
+        lockpath = os.path.join(gitpath, 'refs', 'heads', 'master.lock')
+        open(lockpath, 'w').close()
+        self.assertRaises(
+            pagure.exceptions.PagureException,
+            pagure.lib.git._commit_files_in_bare_repo,
+            gitpath, {'foo': 'bar3'}, 'Update foo'
+        )
+        os.unlink(lockpath)
+        self.assertEqual(gitrepo.revparse_single('HEAD').oid, oid)
+
+    def test_git_write_queue(self):
+        """ Test the GitWriteQueue object of pagure.lib.git. """
+        gitpath = os.path.join(tests.HERE, 'test_ticket_repo.git')
+        gitrepo = pygit2.init_repository(gitpath, bare=True)
+
+        queue = pagure.lib.git.GitWriteQueue(delay=60, max_latency=600)
+        queue.add(gitpath, 'foo', 'bar', 'Updated issue foo: Foo')
+        queue.add(gitpath, 'baz', 'qux', 'Updated issue baz: Baz')
+        queue.add(gitpath, 'foo', 'bar2', 'Updated issue foo: Foo')
+        # Nothing written yet
+        self.assertTrue(gitrepo.is_empty)
+
+        queue.flush()
+        commit = gitrepo.revparse_single('HEAD')
+        self.assertEqual(commit.parents, [])
+        self.assertEqual(
+            commit.message,
+            'Updated 2 issues or pull-requests\n\n'
+            'Updated issue foo: Foo\n'
+            'Updated issue baz: Baz\n'
+            'Updated issue foo: Foo')
+        self.assertEqual(
+            sorted([entry.name for entry in commit.tree]), ['baz', 'foo'])
+        self.assertEqual(gitrepo[commit.tree['foo'].oid].data, 'bar2')
+
+        # Nothing left in the queue
+        queue.flush()
+        self.assertEqual(gitrepo.revparse_single('HEAD').oid, commit.oid)
+
+        # Several changes of a single file
+        queue.add(gitpath, 'foo', 'bar3', 'Updated issue foo: Foo')
+        queue.add(gitpath, 'foo', 'bar4', 'Updated issue foo: Foo bar')
+        queue.flush()
+        commit = gitrepo.revparse_single('HEAD')
+        self.assertEqual(
+            commit.message,
+            'Updated issue foo: Foo bar\n\n'
+            'Updated issue foo: Foo\n'
+            'Updated issue foo: Foo bar')
+        self.assertEqual(gitrepo[commit.tree['foo'].oid].data, 'bar4')
+
+        # The changes are written in the background after the delay
+        queue = pagure.lib.git.GitWriteQueue(delay=0.1, max_latency=1)
+        queue.add(gitpath, 'baz', None, 'Removed issue baz: Baz')
+        for _ in range(50):
+            if gitrepo.revparse_single('HEAD').oid != commit.oid:
+                break
+            time.sleep(0.1)
+        commit = gitrepo.revparse_single('HEAD')
+        self.assertEqual(commit.message, 'Removed issue baz: Baz')
+        self.assertEqual([entry.name for entry in commit.tree], ['foo'])
+
+    @patch('pagure.lib.notify.send_email')
+    def test_regenerate_git(self, email_f):
+        """ Test the regenerate_git method of pagure.lib.git. """
+        email_f.return_value = True
+        pagure.APP.config['TICKETS_FOLDER'] = tests.HERE
+
+        item = pagure.lib.model.Project(
+            user_id=1,  # pingou
+            name='test_ticket_repo',
+            description='test project for ticket',
+            hook_token='aaabbbwww',
+        )
+        self.session.add(item)
+        self.session.commit()
+        gitpath = os.path.join(tests.HERE, 'test_ticket_repo.git')
+        gitrepo = pygit2.init_repository(gitpath, bare=True)
+
+        repo = pagure.lib.get_project(self.session, 'test_ticket_repo')
+        for title, private in [('Issue #1', False), ('Issue #2', True),
+                               ('Issue #3', False)]:
+            pagure.lib.new_issue(
+                session=self.session,
+                repo=repo,
+                title=title,
+                content='We should work on this',
+                user='pingou',
+                ticketfolder=None,
+                private=private,
+            )
+        self.session.commit()
+
+        self.assertRaises(
+            pagure.exceptions.PagureException,
+            pagure.lib.git.regenerate_git,
+            repo, 'foo'
+        )
+
+        progress = []
+        pagure.lib.git.regenerate_git(
+            repo, 'tickets',
+            progress=lambda done, total: progress.append((done, total)))
+        self.assertEqual(progress, [(1, 2), (2, 2)])
+
+        # A single commit with the two public issues
+        commit = gitrepo.revparse_single('HEAD')
+        self.assertEqual(commit.parents, [])
+        self.assertEqual(
+            commit.message,
+            'Regenerated the tickets git repo of test_ticket_repo')
+        self.assertEqual(
+            sorted([entry.name for entry in commit.tree]),
+            sorted([issue.uid for issue in repo.issues if not issue.private]))
+
+        # Nothing changed
+        self.assertEqual(
+            pagure.lib.git.regenerate_git(repo, 'tickets'), None)
+
+        # In a thread, with its own session of the scoped session
+        with patch('pagure.SESSION', self.session):
+            with patch('pagure.lib.create_session') as create_session:
+                pagure.lib.git.regenerate_git_in_background(
+                    repo, 'tickets').join()
+        self.assertFalse(create_session.called)
+        self.assertEqual(
+            pagure.lib.git.get_regeneration_progress(repo.id, 'tickets'),
+            {'status': 'done', 'done': 2, 'total': 2})
+
+    @patch('pagure.lib.notify.send_email')
+    def test_add_file_to_git(self, email_f):
+        """ Test the add_file_to_git method of pagure.lib.git. """
+        email_f.return_value = True
+        self.test_update_git()
+
+        gitpath = os.path.join(tests.HERE, 'test_ticket_repo.git')
+        gitrepo = pygit2.Repository(gitpath)
+        orig_commit = gitrepo.revparse_single('HEAD')
+
+        repo = pagure.lib.get_project(self.session, 'test_ticket_repo')
+        issue = pagure.lib.search_issues(self.session, repo, issueid=1)
+        user = tests.FakeUser(username='pingou')
+
+        output = pagure.lib.git.add_file_to_git(
+            repo, issue, tests.HERE, user, 'test file.txt',
+            StringIO('foo bar\n' * 10), chunk_size=16)
+        filename = 'files/%s-test_file.txt' % (
+            hashlib.sha256('foo bar\n' * 10).hexdigest())
+        self.assertEqual(output, filename)
+
+        commit = gitrepo.revparse_single('HEAD')
+        self.assertEqual([p.oid for p in commit.parents], [orig_commit.oid])
+        self.assertEqual(commit.author.name, 'pingou')
+        self.assertEqual(commit.author.email, 'foo@bar.com')
+        self.assertEqual(
+            sorted([entry.name for entry in commit.tree]),
+            sorted([issue.uid, 'files']))
+        blob = gitrepo[gitrepo[commit.tree['files'].oid][
+            filename.split('/')[1]].oid]
+        self.assertEqual(blob.data, 'foo bar\n' * 10)
+
+        # No temporary file left
+        self.assertEqual(
+            [name for name in os.listdir(gitpath)
+             if name.startswith('pagure-upload-')],
+            [])
+
+        # Same file again: nothing is committed
+        output = pagure.lib.git.add_file_to_git(
+            repo, issue, tests.HERE, user, 'test file.txt',
+            StringIO('foo bar\n' * 10))
+        self.assertEqual(output, filename)
+        self.assertEqual(gitrepo.revparse_single('HEAD').oid, commit.oid)
+
+    def test_update_file_in_git(self):
+        """ Test the update_file_in_git method of pagure.lib.git. """
+        tests.create_projects(self.session)
+        gitpath = os.path.join(tests.HERE, 'repos', 'test.git')
+        tests.add_content_git_repo(gitpath)
+        gitrepo = pygit2.Repository(gitpath)
+        orig_commit = gitrepo.revparse_single('master')
+
+        repo = pagure.lib.get_project(self.session, 'test')
+        user = tests.FakeUser(username='pingou')
+
+        self.assertRaises(
+            pagure.exceptions.PagureException,
+            pagure.lib.git.update_file_in_git,
+            repo, 'foo', 'foo', 'sources', u'bar', 'Edit', user,
+            'bar@pingou.com'
+        )
+
+        # No change
+        self.assertEqual(
+            pagure.lib.git.update_file_in_git(
+                repo, 'master', 'master', 'sources', u'foo\r\n bar',
+                'Edit sources', user, 'bar@pingou.com'),
+            None)
+        self.assertEqual(
+            gitrepo.revparse_single('master').oid, orig_commit.oid)
+
+        # Edit a file in a folder, on the same branch
+        pagure.lib.git.update_file_in_git(
+            repo, 'master', 'master', 'folder1/folder2/file',
+            u'bar\r\nbaz ☃', 'Edit file\n\nWith a message\n',
+            user, 'bar@pingou.com')
+        commit = gitrepo.revparse_single('master')
+        self.assertEqual(
+            [parent.oid for parent in commit.parents], [orig_commit.oid])
+        self.assertEqual(commit.message, 'Edit file\n\nWith a message')
+        self.assertEqual(commit.author.name, 'pingou')
+        self.assertEqual(commit.author.email, 'bar@pingou.com')
+        self.assertEqual(
+            gitrepo.revparse_single('master:folder1/folder2/file').data,
+            u'bar\nbaz ☃'.encode('utf-8'))
+        self.assertEqual(
+            gitrepo.revparse_single('master:sources').oid,
+            gitrepo.revparse_single(
+                '%s:sources' % orig_commit.oid.hex).oid)
+
+        # Edit a file on a new branch
+        pagure.lib.git.update_file_in_git(
+            repo, 'master', 'feature', 'sources', u'foo',
+            'Edit sources', user, 'bar@pingou.com')
+        commit2 = gitrepo.revparse_single('feature')
+        self.assertEqual(
+            [parent.oid for parent in commit2.parents], [commit.oid])
+        self.assertEqual(gitrepo.revparse_single('master').oid, commit.oid)
+
+        # feature is not a fast-forward of master anymore
+        self.assertRaises(
+            pagure.exceptions.PagureException,
+            pagure.lib.git.update_file_in_git,
+            repo, 'master', 'feature', 'sources', u'bar', 'Edit sources',
+            user, 'bar@pingou.com'
+        )
+        self.assertEqual(
+            gitrepo.revparse_single('feature').oid, commit2.oid)
+
+        # Invalid branch names are refused before anything is written
+        for branchto in ['../../../escaped', 'foo..bar', 'foo.lock', 'a b']:
+            self.assertRaises(
+                pagure.exceptions.PagureException,
+                pagure.lib.git.update_file_in_git,
+                repo, 'master', branchto, 'sources', u'bar',
+                'Edit sources', user, 'bar@pingou.com'
+            )
+        self.assertFalse(
+            os.path.exists(os.path.join(tests.HERE, 'escaped.lock')))
+        self.assertEqual(
+            sorted(gitrepo.listall_branches()), ['feature', 'master'])
+
+        # Branches conflicting with existing ones are refused as well
+        for branchto in ['feature/foo', 'master/foo']:
+            self.assertRaises(
+                pagure.exceptions.PagureException,
+                pagure.lib.git.update_file_in_git,
+                repo, 'master', branchto, 'sources', u'bar',
+                'Edit sources', user, 'bar@pingou.com'
+            )
+        self.assertEqual(
+            sorted(gitrepo.listall_branches()), ['feature', 'master'])
+        self.assertFalse(os.path.exists(
+            os.path.join(gitpath, 'refs', 'heads', 'feature', 'foo.lock')))
+
+    @patch('pagure.lib.notify.send_email')
+    def test_merge_pull_request_in_bare_repo(self, email_f):
+        """ Test the merge_pull_request method of pagure.lib.git when
+        merging in the bare git repository. """
+        email_f.return_value = True
+        pagure.APP.config['MERGE_IN_BARE_REPO'] = True
+        tests.create_projects(self.session)
+        gitpath = os.path.join(tests.HERE, 'repos', 'test.git')
+        gitrepo = pygit2.init_repository(gitpath, bare=True)
+        pagure.lib.git._commit_files_in_bare_repo(
+            gitpath, {'sources': 'foo\n bar'}, 'Add sources')
+        forkpath = os.path.join(tests.HERE, 'repos', 'test2.git')
+        pygit2.clone_repository(gitpath, forkpath, bare=True)
+        forkrepo = pygit2.Repository(forkpath)
+        pagure.lib.git._commit_files_in_bare_repo(
+            forkpath, {'sources': 'foo\n bar\nbaz'}, 'Edit sources')
+
+        project = pagure.lib.get_project(self.session, 'test')
+        fork = pagure.lib.get_project(self.session, 'test2')
+
+        def new_request():
+            req = pagure.lib.new_pull_request(
+                session=self.session,
+                repo_from=fork,
+                branch_from='master',
+                repo_to=project,
+                branch_to='master',
+                title='Edit sources',
+                user='pingou',
+                requestfolder=None,
+            )
+            self.session.commit()
+            return req
+
+        req = new_request()
+        self.assertEqual(
+            pagure.lib.git.merge_pull_request(
+                self.session, req, 'pingou', None, domerge=False),
+            'FFORWARD')
+
+        # The project moved on
+        pagure.lib.git._commit_files_in_bare_repo(
+            gitpath, {'.gitignore': '*~'}, 'Add .gitignore')
+        head = gitrepo.revparse_single('master')
+        self.assertEqual(
+            pagure.lib.git.merge_pull_request(
+                self.session, req, 'pingou', None, domerge=False),
+            'MERGE')
+        self.assertEqual(req.merge_status, 'MERGE')
+        # Nothing changed in the repo
+        self.assertEqual(gitrepo.revparse_single('master').oid, head.oid)
+
+        self.assertEqual(
+            pagure.lib.git.merge_pull_request(
+                self.session, req, 'pingou', None),
+            'Changes merged!')
+        commit = gitrepo.revparse_single('master')
+        self.assertEqual(
+            [parent.oid for parent in commit.parents],
+            [head.oid, forkrepo.revparse_single('master').oid])
+        self.assertEqual(commit.message, 'Merge #1 `Edit sources`')
+        self.assertEqual(
+            sorted([entry.name for entry in commit.tree]),
+            ['.gitignore', 'sources'])
+        self.assertEqual(req.status, 'Merged')
+        # The temporary reference is gone
+        self.assertEqual(
+            [ref for ref in gitrepo.listall_references()
+             if ref.startswith('refs/pagure/')],
+            [])
+
+        # Already merged
+        req = new_request()
+        self.assertEqual(
+            pagure.lib.git.merge_pull_request(
+                self.session, req, 'pingou', None, domerge=False),
+            'NO_CHANGE')
+
+        # Conflicting changes
+        pagure.lib.git._commit_files_in_bare_repo(
+            gitpath, {'sources': 'foo'}, 'Edit sources')
+        pagure.lib.git._commit_files_in_bare_repo(
+            forkpath, {'sources': 'bar'}, 'Edit sources')
+        req = new_request()
+        self.assertEqual(
+            pagure.lib.git.merge_pull_request(
+                self.session, req, 'pingou', None, domerge=False),
+            'CONFLICTS')
+        self.assertRaises(
+            pagure.exceptions.PagureException,
+            pagure.lib.git.merge_pull_request,
+            self.session, req, 'pingou', None
+        )
+        self.assertEqual(
+            gitrepo.revparse_single('master:sources').data, 'foo')
+
+    def test_mergeability_worker(self):
+        """ Test the MergeabilityWorker object of pagure.lib.git. """
+        started = threading.Event()
+        resume = threading.Event()
+        checked = []
+
+        def refresh(session, request_uid):
+            """ Block on the first pull-request checked. """
+            if not checked:
+                started.set()
+                resume.wait(5)
+            checked.append(request_uid)
+
+        worker = pagure.lib.git.MergeabilityWorker(workers=1)
+        with patch('pagure.SESSION'):
+            with patch.object(worker, '_refresh', side_effect=refresh):
+                worker.add(['aaa'])
+                started.wait(5)
+                # bbb is only queued once, aaa is queued again as its check
+                # already started
+                worker.add(['bbb', 'aaa', 'bbb'])
+                self.assertEqual(len(worker._threads), 1)
+                resume.set()
+                worker.join()
+
+        self.assertEqual(checked, ['aaa', 'bbb', 'aaa'])
+
+        # Disabled
+        worker = pagure.lib.git.MergeabilityWorker(workers=0)
+        worker.add(['aaa'])
+        self.assertEqual(worker._threads, [])
+
+    @patch('pagure.lib.notify.send_email')
+    def test_refresh_merge_status(self, email_f):
+        """ Test the refresh_merge_status method of pagure.lib.git. """
+        email_f.return_value = True
+        tests.create_projects(self.session)
+        project = pagure.lib.get_project(self.session, 'test')
+        fork = pagure.lib.get_project(self.session, 'test2')
+
+        for branch_from, repo_to, branch_to in [
+                ('feature', project, 'master'),
+                ('feature', project, 'devel'),
+                ('master', fork, 'master')]:
+            req = pagure.lib.new_pull_request(
+                session=self.session,
+                repo_from=project,
+                branch_from=branch_from,
+                repo_to=repo_to,
+                branch_to=branch_to,
+                title='PR from the %s branch' % branch_from,
+                user='pingou',
+                requestfolder=None,
+            )
+            req.merge_status = 'MERGE'
+            self.session.add(req)
+        self.session.commit()
+
+        with patch('pagure.lib.git.MERGEABILITY_WORKER') as worker:
+            # master is the target of the first pull-request and the source
+            # of the third one
+            requests = pagure.lib.git.refresh_merge_status(
+                self.session, project, ['master'])
+            self.assertEqual(
+                [(request.project.name, request.id) for request in requests],
+                [('test', 1), ('test2', 1)])
+            worker.add.assert_called_with(
+                [request.uid for request in requests])
+
+            # Left to the caller
+            worker.add.reset_mock()
+            requests = pagure.lib.git.refresh_merge_status(
+                self.session, project, ['master'], recompute=False)
+            self.assertEqual(len(requests), 2)
+            self.assertFalse(worker.add.called)
+
+            # devel is the target of the second pull-request
+            requests = pagure.lib.git.refresh_merge_status(
+                self.session, project, ['master', 'devel'])
+            self.assertEqual(
+                sorted([
+                    (request.project.name, request.id)
+                    for request in requests]),
+                [('test', 1), ('test', 2), ('test2', 1)])
+
+        statuses = [
+            request.merge_status
+            for request in pagure.lib.search_pull_requests(self.session)]
+        self.assertEqual(statuses, [None, None, None])
+
     @patch('pagure.lib.notify.send_email')
     def test_update_git_requests(self, email_f):
         """ Test the update_git of pagure.lib.git for pull-requests. """
@@ -945,6 +1480,101 @@ index 0000000..60f7480
         self.assertEqual(repo.issues[1].depends_text, [])
         self.assertEqual(repo.issues[1].blocks_text, [1])
 
+    def test_update_tickets_from_git(self):
+        """ Test the update_tickets_from_git method from pagure.lib.git. """
+        tests.create_projects(self.session)
+        repo = pagure.lib.get_project(self.session, 'test')
+
+        user = {
+            "name": "pingou", "emails": ["pingou@fedoraproject.org"]}
+        tickets = [
+            ('foobar', {
+                "status": "Open", "title": "foo", "content": "bar",
+                "date_created": "1426500263", "user": user, "id": 1,
+                "tags": ["easyfix"], "depends": ["2"],
+                "assignee": {
+                    "name": "foo", "emails": ["foo@bar.com"]},
+                "comments": [{
+                    "comment": "a comment", "date_created": "1426595224",
+                    "id": 250, "parent": None, "user": user}],
+            }),
+            ('foobar2', {
+                "status": "Open", "title": "foo2", "content": "bar2",
+                "date_created": "1426500263", "user": user, "id": 2,
+                "tags": [], "comments": [],
+            }),
+            ('foobar3', {
+                "status": "Fixed", "title": "foo3", "content": "bar3",
+                "date_created": "1426500263", "user": user, "id": 3,
+                "tags": ["easyfix", "bug"], "blocks": ["1"], "comments": [],
+            }),
+        ]
+
+        self.assertEqual(
+            pagure.lib.git.update_tickets_from_git(
+                self.session, repo, tickets, batch_size=2),
+            3)
+
+        issues = dict((issue.id, issue) for issue in repo.issues)
+        self.assertEqual(sorted(issues), [1, 2, 3])
+        self.assertEqual(issues[1].uid, 'foobar')
+        self.assertEqual(issues[1].tags_text, ['easyfix'])
+        self.assertEqual(issues[1].assignee.user, 'foo')
+        self.assertEqual(sorted(issues[1].depends_text), [2, 3])
+        self.assertEqual(len(issues[1].comments), 1)
+        self.assertEqual(issues[1].comments[0].comment, 'a comment')
+        self.assertEqual(issues[2].blocks_text, [1])
+        self.assertEqual(issues[3].status, 'Fixed')
+        self.assertEqual(sorted(issues[3].tags_text), ['bug', 'easyfix'])
+        self.assertEqual(issues[3].blocks_text, [1])
+
+        # Importing again the first ticket only changes what it describes
+        data = tickets[0][1]
+        data['title'] = 'fake issue for tests'
+        data['tags'] = []
+        data['depends'] = []
+        data['comments'][0]['id'] = issues[1].comments[0].id
+        self.assertEqual(
+            pagure.lib.git.update_tickets_from_git(
+                self.session, repo, [('foobar', data)]),
+            1)
+
+        self.session.expire_all()
+        issue = pagure.lib.search_issues(self.session, repo, issueid=1)
+        self.assertEqual(issue.title, 'fake issue for tests')
+        self.assertEqual(issue.tags_text, [])
+        self.assertEqual(issue.depends_text, [])
+        self.assertEqual(len(issue.comments), 1)
+        issue = pagure.lib.search_issues(self.session, repo, issueid=3)
+        self.assertEqual(issue.blocks_text, [])
+
+    def test_get_changed_files(self):
+        """ Test the get_changed_files method from pagure.lib.git. """
+        gitpath = os.path.join(tests.HERE, 'repos', 'test_ticket_repo.git')
+        pygit2.init_repository(gitpath, bare=True)
+        repo_obj = pygit2.Repository(gitpath)
+
+        pagure.lib.git._commit_files_in_bare_repo(
+            gitpath, {'foo': 'foo', 'bar': 'bar'}, 'Add foo and bar')
+        first = repo_obj.revparse_single('master').oid.hex
+
+        changed = pagure.lib.git.get_changed_files(repo_obj, '0' * 40, first)
+        self.assertEqual(sorted(name for name, _ in changed), ['bar', 'foo'])
+        self.assertEqual(
+            repo_obj[dict(changed)['foo']].data, 'foo')
+
+        pagure.lib.git._commit_files_in_bare_repo(
+            gitpath, {'foo': 'foo2', 'bar': None, 'baz': 'baz'},
+            'Change foo, remove bar')
+        pagure.lib.git._commit_files_in_bare_repo(
+            gitpath, {'baz': None}, 'Remove baz')
+        last = repo_obj.revparse_single('master').oid.hex
+
+        # Only the final state of the files matters
+        changed = pagure.lib.git.get_changed_files(repo_obj, first, last)
+        self.assertEqual([name for name, _ in changed], ['foo'])
+        self.assertEqual(repo_obj[changed[0][1]].data, 'foo2')
+
     def test_update_request_from_git(self):
         """ Test the update_request_from_git method from pagure.lib.git. """
         tests.create_projects(self.session)
@@ -1231,6 +1861,45 @@ index 0000000..60f7480
         self.assertEqual(repo.requests[1].title, 'test request #2')
         self.assertEqual(len(repo.requests[1].comments), 0)
 
+    def test_create_fork_with_alternates(self):
+        """ Test the create_fork_with_alternates, get_disk_usage and
+        dissociate_repo methods of pagure.lib.git. """
+        gitpath = os.path.join(tests.HERE, 'repos', 'test.git')
+        tests.add_content_git_repo(gitpath)
+        gitrepo = pygit2.Repository(gitpath)
+        gitrepo.create_branch('feature', gitrepo.revparse_single('master'))
+
+        forkpath = os.path.join(
+            tests.HERE, 'repos', 'forks', 'foo', 'test.git')
+        fork = pagure.lib.git.create_fork_with_alternates(gitpath, forkpath)
+        self.assertEqual(
+            sorted(fork.listall_branches()), ['feature', 'master'])
+        # The objects used by the fork are never pruned from its parent
+        self.assertEqual(
+            pygit2.Repository(gitpath).config['gc.pruneExpire'], 'never')
+        self.assertEqual(
+            fork.revparse_single('master').oid,
+            gitrepo.revparse_single('master').oid)
+        self.assertEqual(
+            fork.revparse_single('HEAD:sources').data,
+            gitrepo.revparse_single('HEAD:sources').data)
+
+        usage = pagure.lib.git.get_disk_usage(forkpath)
+        self.assertEqual(
+            usage['shared'],
+            pagure.lib.git.get_disk_usage(gitpath)['own'])
+        self.assertTrue(usage['shared'] > 0)
+
+        # Not sharing anything
+        self.assertFalse(pagure.lib.git.dissociate_repo(gitpath))
+
+        self.assertTrue(pagure.lib.git.dissociate_repo(forkpath))
+        shutil.rmtree(gitpath)
+        fork = pygit2.Repository(forkpath)
+        self.assertEqual(
+            fork.revparse_single('feature:sources').data, 'foo\n bar')
+        self.assertEqual(pagure.lib.git.get_disk_usage(forkpath)['shared'], 0)
+
     def test_read_git_lines(self):
         """ Test the read_git_lines method of pagure.lib.git. """
         self.test_update_git()
@@ -1321,6 +1990,231 @@ index 0000000..60f7480
             '0', branch_commit.oid.hex, gitrepo, 'refs/heads/feature')
         self.assertEqual(output4, [branch_commit.oid.hex])
 
+    def test_get_diff_commits(self):
+        """ Test the get_diff_commits method of pagure.lib.git. """
+        parentpath = os.path.join(tests.HERE, 'repos', 'test.git')
+        tests.add_content_git_repo(parentpath)
+        tests.add_commit_git_repo(parentpath, ncommits=5)
+
+        forkpath = os.path.join(tests.HERE, 'forks', 'pingou', 'test.git')
+        pygit2.clone_repository(parentpath, forkpath, bare=True)
+
+        # Both repos diverge: 3 commits in the fork, 2 in the parent
+        tests.add_commit_git_repo(forkpath, ncommits=3, filename='fork')
+        tests.add_commit_git_repo(parentpath, ncommits=2)
+
+        fork_obj = pygit2.Repository(forkpath)
+        parent_obj = pygit2.Repository(parentpath)
+        fork_commit = fork_obj.lookup_branch('master').get_object().hex
+        parent_commit = parent_obj.lookup_branch('master').get_object().hex
+
+        # The tip of the parent is unknown to the fork
+        self.assertFalse(parent_commit in fork_obj)
+        boundary = pagure.lib.git.get_commits_boundary(
+            fork_obj, parent_obj, parent_commit)
+        self.assertEqual(len(boundary), 1)
+
+        output = pagure.lib.git.get_diff_commits(
+            fork_obj, fork_commit, parent_obj, parent_commit)
+        self.assertEqual(len(output), 3)
+        self.assertEqual(output[0].oid.hex, fork_commit)
+        self.assertEqual(
+            [c.message for c in output],
+            ['Add row 2 to fork file', 'Add row 1 to fork file',
+             'Add row 0 to fork file'])
+
+        # Same repo
+        output = pagure.lib.git.get_diff_commits(
+            parent_obj, parent_commit, parent_obj, parent_commit)
+        self.assertEqual(output, [])
+
+        # Nothing to compare against, returns the whole history
+        output = pagure.lib.git.get_diff_commits(fork_obj, fork_commit)
+        self.assertEqual(len(output), 9)
+
+    def test_get_diff_stats(self):
+        """ Test the get_diff_stats method of pagure.lib.git. """
+        gitrepo = os.path.join(tests.HERE, 'test_repo.git')
+        os.makedirs(gitrepo)
+        repo = pygit2.init_repository(gitrepo, bare=True)
+
+        pagure.lib.git._commit_files_in_bare_repo(
+            gitrepo, {'foo': 'foo\nbar\n', 'bar': 'bar\n'}, 'Add foo')
+        first = repo.revparse_single('master')
+        pagure.lib.git._commit_files_in_bare_repo(
+            gitrepo, {'foo': 'foo\nbaz\nqux\n', 'bar': None}, 'Change foo')
+        second = repo.revparse_single('master')
+
+        diff = pagure.lib.git.get_commit_diff(repo, first)
+        self.assertEqual(
+            [(f['fileid'], f['new_path'], f['status'], f['lines_added'])
+             for f in pagure.lib.git.get_diff_stats(diff)],
+            [(1, 'bar', 'A', 1), (2, 'foo', 'A', 2)])
+
+        diff = pagure.lib.git.get_commit_diff(repo, second)
+        stats = pagure.lib.git.get_diff_stats(diff)
+        self.assertEqual(len(stats), 2)
+        self.assertEqual(stats[0]['status'], 'D')
+        self.assertEqual(stats[0]['lines_removed'], 1)
+        self.assertEqual(stats[1]['status'], 'M')
+        self.assertEqual(stats[1]['lines_added'], 2)
+        self.assertEqual(stats[1]['lines_removed'], 1)
+        self.assertFalse(stats[1]['binary'])
+
+        self.assertIsNone(pagure.lib.git.get_diff_file(diff, 0))
+        self.assertIsNone(pagure.lib.git.get_diff_file(diff, 3))
+        file_patch = pagure.lib.git.get_diff_file(diff, 2)
+        self.assertEqual(
+            pagure.lib.git.patch_to_text(file_patch),
+            '@@ -1,2 +1,3 @@\n  foo\n- bar\n+ baz\n+ qux\n')
+
+        # Large diffs are only loaded on demand
+        self.assertFalse(pagure.lib.git.is_diff_file_truncated(stats[1], 2))
+        with patch.dict(pagure.APP.config, {'MAX_DIFF_LINES_RENDERED': 2}):
+            self.assertTrue(
+                pagure.lib.git.is_diff_file_truncated(stats[1], 2))
+        with patch.dict(pagure.APP.config, {'MAX_DIFF_FILES_RENDERED': 1}):
+            self.assertFalse(
+                pagure.lib.git.is_diff_file_truncated(stats[0], 1))
+            self.assertTrue(
+                pagure.lib.git.is_diff_file_truncated(stats[1], 2))
+
+    def test_get_commit_diff_stats(self):
+        """ Test the get_commit_diff_stats method of pagure.lib.git. """
+        gitrepo = os.path.join(tests.HERE, 'test_repo.git')
+        os.makedirs(gitrepo)
+        repo = pygit2.init_repository(gitrepo, bare=True)
+
+        pagure.lib.git._commit_files_in_bare_repo(
+            gitrepo, {'foo': 'foo\nbar\n'}, 'Add foo')
+        pagure.lib.git._commit_files_in_bare_repo(
+            gitrepo, {'foo': 'foo\nbaz\n'}, 'Change foo')
+        commit = repo.revparse_single('master')
+
+        stats = pagure.lib.git.get_commit_diff_stats(repo, commit)
+        self.assertEqual(
+            [(f['new_path'], f['lines_added'], f['lines_removed'])
+             for f in stats],
+            [('foo', 1, 1)])
+        self.assertEqual(
+            pagure.lib.git.summarize_diff_stats(stats),
+            {'files': 1, 'lines_added': 1, 'lines_removed': 1})
+
+        # The second time, the stats come from the cache
+        with patch('pagure.lib.git.get_diff_stats') as get_diff_stats:
+            self.assertEqual(
+                pagure.lib.git.get_commit_diff_stats(repo, commit), stats)
+            self.assertFalse(get_diff_stats.called)
+
+        # The diff already computed is used
+        first = repo.revparse_single('master^')
+        diff = pagure.lib.git.get_commit_diff(repo, first)
+        with patch('pagure.lib.git.get_commit_diff') as get_commit_diff:
+            stats = pagure.lib.git.get_commit_diff_stats(
+                repo, first, diff=diff)
+            self.assertFalse(get_commit_diff.called)
+        self.assertEqual(
+            [(f['new_path'], f['lines_added'], f['lines_removed'])
+             for f in stats],
+            [('foo', 2, 0)])
+
+        # The stats of a pull-request are only computed if asked to
+        request = MagicMock(
+            commit_start=commit.oid.hex, commit_stop=commit.oid.hex)
+        self.assertIsNone(
+            pagure.lib.git.get_pull_request_diff_stats(request))
+        self.assertEqual(
+            pagure.lib.git.get_pull_request_diff_stats(
+                request, repo_obj=repo),
+            stats)
+        self.assertEqual(
+            pagure.lib.git.get_pull_request_diff_stats(request), stats)
+
+    def test_get_commits_count(self):
+        """ Test the get_commits_count method of pagure.lib.git. """
+        gitrepo = os.path.join(tests.HERE, 'repos', 'test.git')
+        tests.add_content_git_repo(gitrepo)
+        tests.add_commit_git_repo(gitrepo, ncommits=5)
+        repo_obj = pygit2.Repository(gitrepo)
+
+        # Nothing cached yet
+        self.assertEqual(
+            pagure.lib.git.get_commits_count(
+                repo_obj, 'master', full_walk=False),
+            None)
+        self.assertEqual(
+            pagure.lib.git.get_commits_count(repo_obj, 'master'), 6)
+        self.assertTrue(os.path.exists(
+            os.path.join(gitrepo, pagure.lib.git.COMMITS_COUNT_FILE)))
+        self.assertEqual(
+            pagure.lib.git.get_commits_count(
+                repo_obj, 'master', full_walk=False),
+            6)
+
+        # The branch moved forward, only the new commits are counted
+        tests.add_commit_git_repo(gitrepo, ncommits=2)
+        repo_obj = pygit2.Repository(gitrepo)
+        self.assertEqual(
+            pagure.lib.git.get_commits_count(
+                repo_obj, 'master', full_walk=False),
+            8)
+
+        # Refreshing from the hook
+        tests.add_commit_git_repo(gitrepo, ncommits=1)
+        pagure.lib.git.refresh_commits_count(gitrepo, 'refs/heads/master')
+        cache = pagure.lib.git._get_commits_count_cache(repo_obj)
+        self.assertEqual(cache['master']['count'], 9)
+
+        # Unknown branch
+        self.assertEqual(
+            pagure.lib.git.get_commits_count(repo_obj, 'foo'), None)
+
+    def test_branches_reachability(self):
+        """ Test the BranchesReachability class of pagure.lib.git. """
+        gitrepo = os.path.join(tests.HERE, 'test_repo.git')
+        os.makedirs(gitrepo)
+        repo = pygit2.init_repository(gitrepo, bare=True)
+
+        first = pagure.lib.git._commit_files_in_bare_repo(
+            gitrepo, {'foo': 'foo'}, 'Add foo').hex
+        second = pagure.lib.git._commit_files_in_bare_repo(
+            gitrepo, {'bar': 'bar'}, 'Add bar').hex
+        # A branch forked at the first commit, with a commit of its own
+        repo.create_branch('feature', repo[first])
+        tree = repo.TreeBuilder(repo[first].tree)
+        tree.insert(
+            'baz', repo.create_blob('baz'), pygit2.GIT_FILEMODE_BLOB)
+        signature = pygit2.Signature('pagure', 'pagure')
+        third = repo.create_commit(
+            'refs/heads/feature', signature, signature, 'Add baz',
+            tree.write(), [first]).hex
+        # A branch pointing at the tip of master
+        repo.create_branch('stable', repo[second])
+
+        expected = {
+            first: ['feature', 'master', 'stable'],
+            second: ['master', 'stable'],
+            third: ['feature'],
+        }
+        reachability = pagure.lib.git.BranchesReachability(repo)
+        self.assertEqual(reachability.default, 'master')
+        self.assertEqual(
+            reachability.get_branches([first, second, third]), expected)
+        self.assertTrue(reachability.in_branch(first, 'master'))
+        self.assertFalse(reachability.in_branch(third, 'master'))
+        self.assertFalse(reachability.in_branch(first, 'foo'))
+        # Nothing was walked for so few commits
+        self.assertEqual(reachability._ahead, {})
+        self.assertEqual(reachability._behind, {})
+
+        # Same answers when walking the differences with the default branch
+        reachability = pagure.lib.git.BranchesReachability(repo)
+        reachability.walk_threshold = 1
+        self.assertEqual(
+            reachability.get_branches([first, second, third]), expected)
+        self.assertEqual(
+            reachability._behind, {'feature': set([second]), 'stable': set()})
+
     def test_get_author(self):
         """ Test the get_author method of pagure.lib.git. """
 
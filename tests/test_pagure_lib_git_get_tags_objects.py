@@ -14,11 +14,13 @@ import os
 import time
 
 import pygit2
+from mock import patch
 
 sys.path.insert(0, os.path.join(os.path.dirname(
     os.path.abspath(__file__)), '..'))
 
 import pagure.lib.git
+import pagure.lib.repo
 import tests
 
 
@@ -103,6 +105,49 @@ class PagureLibGitGetTagstests(tests.Modeltests):
         tags = pagure.lib.git.get_git_tags_objects(project)
         self.assertEqual(exp, get_tag_name(tags))
 
+    def test_get_tags_index(self):
+        """ Test the get_tags_index method of pagure.lib.git. """
+        gitpath = os.path.join(tests.HERE, 'repos', 'test.git')
+        tests.add_readme_git_repo(gitpath)
+        repo = pagure.lib.repo.PagureRepo(gitpath)
+        commit = repo.revparse_single('HEAD')
+
+        # Tags of the same commit are all kept
+        tagger = pygit2.Signature('Alice Doe', 'adoe@example.com', 12347, 0)
+        repo.create_tag(
+            '0.0.1', commit.oid.hex, pygit2.GIT_OBJ_COMMIT, tagger,
+            'Release 0.0.1\n\nFirst release')
+        repo.create_reference('refs/tags/0.0.2', commit.oid)
+
+        tags = pagure.lib.git.get_tags_index(repo)
+        self.assertEqual(get_tag_name(tags), ['0.0.2', '0.0.1'])
+        self.assertEqual(tags[0]['objecttype'], 'commit')
+        self.assertEqual(tags[0]['oid'], commit.oid.hex)
+        self.assertEqual(tags[1]['objecttype'], 'tag')
+        self.assertNotEqual(tags[1]['oid'], commit.oid.hex)
+        self.assertEqual(tags[1]['target'], commit.oid.hex)
+        self.assertEqual(tags[1]['date'], commit.commit_time)
+        self.assertEqual(tags[1]['head_msg'], 'Release 0.0.1')
+        self.assertEqual(tags[1]['body_msg'], '\nFirst release')
+        self.assertTrue(os.path.exists(
+            os.path.join(gitpath, pagure.lib.git.TAGS_INDEX_FILE)))
+
+        # Only the tags moved are read again
+        tests.add_commit_git_repo(gitpath, ncommits=1)
+        commit2 = repo.revparse_single('HEAD')
+        repo.lookup_reference('refs/tags/0.0.2').set_target(commit2.oid)
+        with patch(
+                'pagure.lib.git._index_tag',
+                wraps=pagure.lib.git._index_tag) as index_tag:
+            tags = pagure.lib.git.get_tags_index(repo)
+            self.assertEqual(index_tag.call_count, 1)
+        self.assertEqual(tags[0]['oid'], commit2.oid.hex)
+
+        # Deleted tags are removed
+        repo.lookup_reference('refs/tags/0.0.2').delete()
+        self.assertEqual(
+            get_tag_name(pagure.lib.git.get_tags_index(repo)), ['0.0.1'])
+
 
 if __name__ == '__main__':
     SUITE = unittest.TestLoader().loadTestsFromTestCase(
@@ -107,13 +107,18 @@ class PagureLibLinktests(tests.Modeltests):
                 self.assertEqual(
                     str(link),
                     '[Issue(5, project:test, user:pingou, title:foo)]')
-            elif idx == 5:
-                self.assertEqual(
-                    str(link),
-                    '[Issue(6, project:test, user:pingou, title:another foo)]')
             else:
+                # The URL in COMMENTS[5] is of an issue of tests2
                 self.assertEqual(link, [])
 
+        link = pagure.lib.link.get_relation(
+            self.session, 'test', None,
+            'Could this be related to https://fedorahosted.org/test/issue/6',
+            'relates')
+        self.assertEqual(
+            str(link),
+            '[Issue(6, project:test, user:pingou, title:another foo)]')
+
     def test_get_relation_fixes(self):
         """ Test the get_relation function of pagure.lib.link with fixes.
         """
@@ -158,6 +163,91 @@ class PagureLibLinktests(tests.Modeltests):
             else:
                 self.assertEqual(link, [])
 
+    def test_get_references(self):
+        """ Test the get_references function of pagure.lib.link. """
+        self.assertEqual(
+            pagure.lib.link.get_references(COMMENTS[0], 'relates'), [])
+        self.assertEqual(
+            pagure.lib.link.get_references(COMMENTS[2], 'fixes'),
+            [(None, 3)])
+        self.assertEqual(
+            pagure.lib.link.get_references(COMMENTS[4], 'relates'),
+            [(None, 5)])
+        self.assertEqual(
+            pagure.lib.link.get_references(COMMENTS[5], 'relates'),
+            [('tests2', 6)])
+        self.assertEqual(
+            pagure.lib.link.get_references(
+                'Fixes https://pagure.io/test/pull-request/7', 'fixes'),
+            [('test', 7)])
+        self.assertEqual(
+            pagure.lib.link.get_references(COMMENTS[4], 'fixes'), [])
+
+    @patch('pagure.lib.notify.send_email')
+    def test_get_relations(self, mockemail):
+        """ Test the get_relations function of pagure.lib.link. """
+        mockemail.return_value = True
+        tests.create_projects(self.session)
+        repo = pagure.lib.get_project(self.session, 'test')
+
+        self.assertEqual(
+            pagure.lib.link.get_relations(self.session, repo, []), {})
+        self.assertEqual(
+            pagure.lib.link.get_relations(
+                self.session, repo, [(None, 1), (None, 2)]),
+            {})
+
+        pagure.lib.new_issue(
+            self.session,
+            repo,
+            title='issue 1',
+            content='content issue 1',
+            user='pingou',
+            ticketfolder=None,
+            issue_id=1,
+            notify=False)
+        req = pagure.lib.new_pull_request(
+            session=self.session,
+            repo_from=repo,
+            branch_from='feature',
+            repo_to=repo,
+            branch_to='master',
+            title='test pull-request',
+            user='pingou',
+            requestfolder=None,
+        )
+        self.session.commit()
+
+        references = [(None, 1), ('test', req.id), (None, 42)]
+        relations = pagure.lib.link.get_relations(
+            self.session, repo, references)
+        self.assertEqual(relations.keys(), [1])
+        self.assertEqual(relations[1].title, 'issue 1')
+
+        relations = pagure.lib.link.get_relations(
+            self.session, repo, references, include_prs=True)
+        self.assertEqual(sorted(relations.keys()), [1, req.id])
+        self.assertEqual(relations[req.id].isa, 'pull-request')
+
+        # References naming another project are ignored
+        relations = pagure.lib.link.get_relations(
+            self.session, repo, [('test2', 1), ('test2', req.id)],
+            include_prs=True)
+        self.assertEqual(relations, {})
+        self.assertEqual(
+            pagure.lib.link.get_relation(
+                self.session, 'test', None,
+                'Fixes https://pagure.io/test2/issue/1', 'fixes'),
+            [])
+
+        # Only the relations of the project are returned
+        repo2 = pagure.lib.get_project(self.session, 'test2')
+        self.assertEqual(
+            pagure.lib.link.get_relations(
+                self.session, repo2, [(None, 1), (None, req.id)],
+                include_prs=True),
+            {})
+
     def test_relates_regex(self):
         ''' Test the relates regex present in pagure.lib.link. '''
         text = 'relates  to   http://localhost/fork/pingou/test/issue/1'
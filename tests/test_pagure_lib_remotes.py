@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+
+"""
+ (c) 2016 - Copyright Red Hat Inc
+
+ Authors:
+   Pierre-Yves Chibon <pingou@pingoured.fr>
+
+"""
+
+__requires__ = ['SQLAlchemy >= 0.8']
+import pkg_resources
+
+import unittest
+import shutil
+import sys
+import os
+
+import pygit2
+from mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(
+    os.path.abspath(__file__)), '..'))
+
+import pagure.exceptions
+import pagure.lib.git
+import pagure.lib.remotes
+import tests
+
+
+class PagureLibRemotestests(tests.Modeltests):
+    """ Tests for pagure.lib.remotes """
+
+    def setUp(self):
+        """ Set up the environnment, ran before every tests. """
+        super(PagureLibRemotestests, self).setUp()
+
+        self.remotes = os.path.join(tests.HERE, 'remotes')
+        if os.path.exists(self.remotes):
+            shutil.rmtree(self.remotes)
+        pagure.APP.config['REMOTE_GIT_FOLDER'] = self.remotes
+        # The tests fetch local repositories
+        self.protocols = pagure.APP.config.get('REMOTE_GIT_PROTOCOLS')
+        pagure.APP.config['REMOTE_GIT_PROTOCOLS'] = [
+            'http', 'https', 'git', 'ssh', 'file']
+
+    def tearDown(self):
+        """ Remove the mirrors, ran after every tests. """
+        super(PagureLibRemotestests, self).tearDown()
+        shutil.rmtree(self.remotes, ignore_errors=True)
+        pagure.APP.config['REMOTE_GIT_PROTOCOLS'] = self.protocols
+
+    def test_get_protocol(self):
+        """ Test the get_protocol method of pagure.lib.remotes. """
+        for remote_git, protocol in [
+                ('https://pagure.io/pagure.git', 'https'),
+                ('HTTP://pagure.io/pagure.git', 'http'),
+                ('git://pagure.io/pagure.git', 'git'),
+                ('ssh://git@pagure.io/pagure.git', 'ssh'),
+                ('git+ssh://git@pagure.io/pagure.git', 'ssh'),
+                ('git@pagure.io:pagure.git', 'ssh'),
+                ('/srv/git/pagure.git', 'file'),
+                ('file:///srv/git/pagure.git', 'file'),
+                ('./pagure:git', 'file'),
+                ('ext::sh -c touch% /tmp/pwned', 'ext'),
+                ('fd::17', 'fd'),
+        ]:
+            self.assertEqual(
+                pagure.lib.remotes.get_protocol(remote_git), protocol)
+
+    def test_check_remote_git(self):
+        """ Test the check_remote_git method of pagure.lib.remotes. """
+        pagure.APP.config['REMOTE_GIT_PROTOCOLS'] = ['https', 'ssh']
+        pagure.lib.remotes.check_remote_git('https://pagure.io/pagure.git')
+        pagure.lib.remotes.check_remote_git('git@pagure.io:pagure.git')
+        for remote_git in [
+                'ext::sh -c touch% /tmp/pwned',
+                'git://pagure.io/pagure.git',
+                '/srv/git/pagure.git',
+                '--upload-pack=touch /tmp/pwned',
+        ]:
+            self.assertRaises(
+                pagure.exceptions.PagureException,
+                pagure.lib.remotes.check_remote_git,
+                remote_git
+            )
+
+        # Nothing is run nor created for the transports not allowed
+        self.assertRaises(
+            pagure.exceptions.PagureException,
+            pagure.lib.remotes.get_mirror,
+            'ext::sh -c touch% /tmp/pwned', 'master'
+        )
+        self.assertFalse(os.path.exists(self.remotes))
+
+    def test_get_mirror(self):
+        """ Test the get_mirror method of pagure.lib.remotes. """
+        gitpath = os.path.join(tests.HERE, 'repos', 'test.git')
+        tests.add_content_git_repo(gitpath)
+        gitrepo = pygit2.Repository(gitpath)
+        gitrepo.create_branch('feature', gitrepo.revparse_single('master'))
+
+        self.assertRaises(
+            pagure.exceptions.PagureException,
+            pagure.lib.remotes.get_mirror,
+            gitpath, 'foo'
+        )
+        self.assertFalse(os.path.exists(
+            pagure.lib.remotes.get_mirror_path(gitpath, 'foo')))
+
+        repopath = pagure.lib.remotes.get_mirror(gitpath, 'feature')
+        self.assertEqual(
+            repopath, pagure.lib.remotes.get_mirror_path(gitpath, 'feature'))
+        mirror = pygit2.Repository(repopath)
+        self.assertTrue(mirror.is_bare)
+        # Only the branch asked for is fetched
+        self.assertEqual(mirror.listall_branches(), ['feature'])
+        self.assertEqual(
+            mirror.head.target, gitrepo.revparse_single('feature').oid)
+        self.assertTrue(pagure.lib.remotes.get_last_fetch(repopath))
+
+        # The branch moves on
+        pagure.lib.git._commit_files_in_bare_repo(
+            gitpath, {'foo': 'bar'}, 'Add foo')
+        gitrepo.lookup_reference('refs/heads/feature').set_target(
+            gitrepo.revparse_single('master').oid)
+
+        # The mirror is recent enough
+        pagure.lib.remotes.get_mirror(gitpath, 'feature')
+        self.assertNotEqual(
+            pygit2.Repository(repopath).revparse_single('feature').oid,
+            gitrepo.revparse_single('feature').oid)
+
+        # Asking for a fresh mirror
+        pagure.lib.remotes.get_mirror(gitpath, 'feature', fresh=True)
+        self.assertEqual(
+            pygit2.Repository(repopath).revparse_single('feature').oid,
+            gitrepo.revparse_single('feature').oid)
+
+    def test_fetch_in_background(self):
+        """ Test the fetch_in_background method of pagure.lib.remotes. """
+        gitpath = os.path.join(tests.HERE, 'repos', 'test.git')
+        tests.add_content_git_repo(gitpath)
+        gitrepo = pygit2.Repository(gitpath)
+        repopath = pagure.lib.remotes.get_mirror(gitpath, 'master')
+
+        pagure.lib.git._commit_files_in_bare_repo(
+            gitpath, {'foo': 'bar'}, 'Add foo')
+
+        thread = pagure.lib.remotes.fetch_in_background(gitpath, 'master')
+        thread.join()
+        self.assertEqual(
+            pygit2.Repository(repopath).revparse_single('master').oid,
+            gitrepo.revparse_single('master').oid)
+
+        # The stale mirror is returned and refreshed in the background
+        with patch.dict(pagure.APP.config, {'REMOTE_GIT_TTL': 0}):
+            with patch('pagure.lib.remotes.fetch_in_background') as fetch:
+                self.assertEqual(
+                    pagure.lib.remotes.get_mirror(gitpath, 'master'),
+                    repopath)
+                fetch.assert_called_with(gitpath, 'master')
+
+    def test_clean_mirrors(self):
+        """ Test the clean_mirrors method of pagure.lib.remotes. """
+        self.assertEqual(pagure.lib.remotes.clean_mirrors(), [])
+
+        gitpath = os.path.join(tests.HERE, 'repos', 'test.git')
+        tests.add_content_git_repo(gitpath)
+        repopath = pagure.lib.remotes.get_mirror(gitpath, 'master')
+
+        self.assertEqual(pagure.lib.remotes.clean_mirrors(), [])
+        self.assertEqual(
+            pagure.lib.remotes.clean_mirrors(max_age=-1), [repopath])
+        self.assertFalse(os.path.exists(repopath))
+
+
+if __name__ == '__main__':
+    SUITE = unittest.TestLoader().loadTestsFromTestCase(
+        PagureLibRemotestests)
+    unittest.TextTestRunner(verbosity=2).run(SUITE)
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+
+"""
+ (c) 2016 - Copyright Red Hat Inc
+
+ Authors:
+   Pierre-Yves Chibon <pingou@pingoured.fr>
+
+"""
+
+__requires__ = ['SQLAlchemy >= 0.8']
+import pkg_resources
+
+import unittest
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(
+    os.path.abspath(__file__)), '..'))
+
+import pagure.lib.repo
+import tests
+
+
+class PagureLibRepotests(tests.Modeltests):
+    """ Tests for pagure.lib.repo """
+
+    def test_repo_pool(self):
+        """ Test the RepoPool object of pagure.lib.repo. """
+        tests.create_projects_git(tests.HERE, bare=True)
+        gitrepo = os.path.join(tests.HERE, 'test.git')
+        gitrepo2 = os.path.join(tests.HERE, 'test2.git')
+
+        pool = pagure.lib.repo.RepoPool(size=1)
+        repo_obj = pool.get(gitrepo)
+        self.assertTrue(isinstance(repo_obj, pagure.lib.repo.PagureRepo))
+        self.assertTrue(pool.get(gitrepo) is repo_obj)
+        self.assertEqual(pool.stats['misses'], 1)
+        self.assertEqual(pool.stats['hits'], 1)
+
+        # The hooks mark the repository as changed
+        pagure.lib.repo.bump_generation(gitrepo)
+        repo_obj2 = pool.get(gitrepo)
+        self.assertFalse(repo_obj2 is repo_obj)
+        self.assertEqual(pool.stats['invalidations'], 1)
+
+        # New content is pushed
+        tests.add_content_git_repo(gitrepo)
+        repo_obj3 = pool.get(gitrepo)
+        self.assertFalse(repo_obj3 is repo_obj2)
+        self.assertFalse(repo_obj3.is_empty)
+        self.assertEqual(pool.stats['invalidations'], 2)
+
+        # Only one repository is kept open
+        pool.get(gitrepo2)
+        self.assertEqual(len(pool), 1)
+        self.assertFalse(pool.get(gitrepo) is repo_obj3)
+        self.assertEqual(pool.stats['misses'], 3)
+
+        pool.clear()
+        self.assertEqual(len(pool), 0)
+
+        # Nothing is kept open
+        pool = pagure.lib.repo.RepoPool(size=0)
+        self.assertFalse(pool.get(gitrepo) is pool.get(gitrepo))
+        self.assertEqual(len(pool), 0)
+
+
+if __name__ == '__main__':
+    SUITE = unittest.TestLoader().loadTestsFromTestCase(PagureLibRepotests)
+    unittest.TextTestRunner(verbosity=2).run(SUITE)